@@ -1,38 +1,115 @@
+import os
+import sys
+import argparse
 import cv2
 import numpy as np
 import serial
 import time
 from camera import Camera
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from motion_gate import MotionGate
+from decision import DecisionSmoother
+from display import Display
+from link_setup import resolve_link
+
+def contour_stats(contours):
+    """
+    一次性计算全部轮廓的面积和边界框
+    面积用鞋带公式（与cv2.contourArea一致），边界框与cv2.boundingRect一致
+    :return: (areas, boxes)，boxes为N x 4的int32数组 [x, y, w, h]
+    """
+    lengths = np.array([len(c) for c in contours])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    
+    # 每个点的下一个点，轮廓最后一个点回到该轮廓起点
+    next_index = np.arange(1, len(points) + 1)
+    next_index[starts + lengths - 1] = starts
+    x, y = points[:, 0], points[:, 1]
+    cross = x * y[next_index] - x[next_index] * y
+    areas = np.abs(np.add.reduceat(cross, starts)) / 2.0
+    
+    mins = np.minimum.reduceat(points, starts)
+    maxs = np.maximum.reduceat(points, starts)
+    boxes = np.concatenate([mins, maxs - mins + 1], axis=1).astype(np.int32)
+    return areas, boxes
+
+def classify_objects(frame, work_width=320, min_area=1000):
+    """
+    在缩小后的金字塔层上检测轮廓，并按宽高比分类全部物体
+    :param work_width: 金字塔层的最小宽度
+    :param min_area: 原图上的轮廓面积阈值
+    :return: [(类型, (x, y, w, h)), ...]，坐标为原图坐标，按面积从大到小排列
+    """
+    # 转换为灰度图并逐级pyrDown，取宽度不小于work_width的最小一层
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = 1
+    while gray.shape[1] // 2 >= work_width:
+        gray = cv2.pyrDown(gray)
+        scale *= 2
+    # pyrDown已包含高斯平滑；未缩小时与原流程一样做高斯模糊
+    if scale == 1:
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    # 边缘检测：阶跃边缘的Sobel响应与缩放无关，Canny阈值保持不变
+    edges = cv2.Canny(gray, 50, 150)
+    # 查找轮廓
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return []
+    
+    # 面积阈值按缩放比例的平方换算到当前层
+    areas, boxes = contour_stats(contours)
+    keep = areas > min_area / float(scale * scale)
+    areas, boxes = areas[keep], boxes[keep]
+    
+    # 根据宽高比判断物体类型：近似正方形为A，长方形为B
+    ratios = boxes[:, 2] / boxes[:, 3].astype(np.float64)
+    types = np.full(len(ratios), 'N')
+    types[(ratios > 0.8) & (ratios < 1.2)] = 'A'
+    types[ratios > 1.5] = 'B'
+    
+    classified = np.flatnonzero(types != 'N')
+    order = classified[np.lexsort((boxes[classified, 1], boxes[classified, 0], -areas[classified]))]
+    return [(str(types[i]), tuple(int(v) * scale for v in boxes[i])) for i in order]
+
 class ObjectDetector:
-    def __init__(self, port='COM3', baudrate=115200):
+    def __init__(self, port='COM3', baudrate=115200, motion_gate=True, work_width=320, min_area=1000,
+                 headless=False):
         self.camera = Camera()
+        # headless模式下不显示图像，通过SIGINT/SIGTERM退出
+        self.headless = headless
+        # 在宽度约为work_width的金字塔层上做轮廓检测，min_area为原图上的面积阈值
+        self.work_width = work_width
+        self.min_area = min_area
         self.serial = serial.Serial(port, baudrate, timeout=1)
+        # 运动门控：画面无变化时复用上次的检测结果
+        self.gate = MotionGate() if motion_gate else None
+        self.last_object_type = 'N'
+        # 决策平滑：只在平滑后的状态变化时发送，避免每帧阻塞等待串口响应
+        self.smoother = DecisionSmoother()
+        self.last_sent = None
+        self.sent_count = 0
         time.sleep(2)  # 等待串口初始化
         
     def detect_objects(self, frame):
-        # 转换为灰度图
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # 高斯模糊
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        # 边缘检测
-        edges = cv2.Canny(blurred, 50, 150)
-        # 查找轮廓
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 分析轮廓
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 1000:  # 面积阈值
-                # 获取轮廓的边界框
-                x, y, w, h = cv2.boundingRect(contour)
-                # 根据宽高比判断物体类型
-                ratio = w / float(h)
-                if 0.8 < ratio < 1.2:  # 近似正方形
-                    return 'A'
-                elif ratio > 1.5:  # 长方形
-                    return 'B'
-        return 'N'
+        """
+        返回发送给STM32的单字符命令：取面积最大的已分类物体的类型，没有则为'N'
+        结果与轮廓顺序无关
+        """
+        objects = classify_objects(frame, self.work_width, self.min_area)
+        return objects[0][0] if objects else 'N'
+    
+    def detect_gated(self, frame):
+        """经过运动门控的检测，无变化时不运行Canny和轮廓查找"""
+        if self.gate is None:
+            return self.detect_objects(frame)
+        changed, _ = self.gate.check(frame)
+        if changed:
+            start_time = time.perf_counter()
+            self.last_object_type = self.detect_objects(frame)
+            self.gate.record_inference(time.perf_counter() - start_time)
+        return self.last_object_type
     
     def send_command(self, command):
         try:
@@ -43,28 +120,43 @@ class ObjectDetector:
             print(f"串口通信错误: {e}")
     
     def run(self):
+        display = Display('Object Detection', headless=self.headless)
         try:
-            while True:
+            while not display.stopped:
                 frame = self.camera.get_frame()
                 if frame is None:
                     continue
                 
-                # 显示图像
-                cv2.imshow('Object Detection', frame)
+                # 显示图像，按'q'退出
+                display.show(frame)
                 
                 # 检测物体并发送命令
-                object_type = self.detect_objects(frame)
-                self.send_command(object_type)
-                
-                # 按'q'退出
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                object_type = self.smoother.update(self.detect_gated(frame))
+                if object_type != self.last_sent:
+                    self.send_command(object_type)
+                    self.last_sent = object_type
+                    self.sent_count += 1
                     
         finally:
+            if self.gate is not None:
+                print(f"运动门控统计: {self.gate.metrics()}")
+            metrics = self.smoother.metrics()
+            print(f"决策平滑: 处理{metrics['frames']}帧（原先每帧发送一条）, 原始状态变化{metrics['raw_changes']}次, "
+                  f"实际发送{self.sent_count}条")
             self.camera.release()
-            cv2.destroyAllWindows()
+            display.close()
             self.serial.close()
 
 if __name__ == '__main__':
-    detector = ObjectDetector()
+    parser = argparse.ArgumentParser(description='轮廓分类与串口通信')
+    parser.add_argument('--port', default='COM3', help='串口端口')
+    parser.add_argument('--baud', type=int, default=115200,
+                        help='波特率，0表示自动（使用link_profile.json中的记录，没有记录时协商）')
+    parser.add_argument('--headless', action='store_true', help='无窗口模式：不显示图像，通过SIGINT/SIGTERM退出')
+    args = parser.parse_args()
+    if args.baud == 0:
+        profile = resolve_link(args.port, 0)
+        args.baud = profile.baudrate if profile is not None else 115200
+        print(f"使用波特率: {args.baud}")
+    detector = ObjectDetector(port=args.port, baudrate=args.baud, headless=args.headless)
     detector.run() 
\ No newline at end of file
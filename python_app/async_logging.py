@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非阻塞日志：调用线程只把LogRecord放进有界缓冲区，格式化和写文件/终端由后台线程完成
+- 缓冲区满时丢弃并计数，不会阻塞串口收发
+- 带sample标记的高频日志（如每条命令一条）按标记限速，省略的条数定期汇总输出
+用法：logger.info("发送命令: %s", cmd, extra={'sample': 'send'})，
+使用%参数而不是f-string，消息在后台线程中才拼接
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from metrics import REGISTRY
+
+LOG_DROPPED = REGISTRY.counter('log_records_dropped_total', '没有写出的日志条数', ('reason',))
+
+SAMPLE_ATTR = 'sample'
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class SamplingFilter(logging.Filter):
+    """
+    按record.sample分组的令牌桶限速，没有sample标记的日志全部通过
+    每组先放行burst条，之后每秒最多rate条
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 5):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        # 标记 -> [令牌数, 上次补充时间, 本周期写出条数, 本周期省略条数]
+        self._buckets: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, SAMPLE_ATTR, None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0, 0]
+            tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                bucket[2] += 1
+                return True
+            bucket[0] = tokens
+            bucket[3] += 1
+            return False
+
+    def collect(self) -> Dict[str, tuple]:
+        """
+        取出并清零本周期的计数
+        :return: {标记: (写出条数, 省略条数)}，只包含有省略的标记
+        """
+        with self._lock:
+            summary = {key: (bucket[2], bucket[3]) for key, bucket in self._buckets.items() if bucket[3]}
+            for bucket in self._buckets.values():
+                bucket[2] = bucket[3] = 0
+        suppressed = sum(skipped for _, skipped in summary.values())
+        if suppressed:
+            LOG_DROPPED.inc(suppressed, reason='sampled')
+        return summary
+
+class AsyncLogHandler(logging.Handler):
+    """
+    把日志转交给后台线程写出的Handler
+    - emit()只做一次deque.append：不加锁、不唤醒线程，超过容量时丢弃并计数
+    - 后台线程每flush_interval秒取走积累的日志，调用各目标Handler（文件、终端）格式化并写出，
+      并每summary_interval秒输出一次采样与丢弃汇总
+    """
+
+    def __init__(self, handlers: Sequence[logging.Handler], capacity: int = 10000,
+                 sampler: Optional[SamplingFilter] = None, summary_interval: float = 10.0,
+                 flush_interval: float = 0.05):
+        """
+        :param handlers: 实际写出日志的Handler
+        :param capacity: 最多积压的日志条数
+        :param sampler: 采样过滤器，None表示不采样
+        :param summary_interval: 汇总输出间隔（秒）
+        :param flush_interval: 后台线程写出间隔（秒）
+        """
+        super().__init__()
+        self.targets = list(handlers)
+        self.sampler = sampler
+        if sampler is not None:
+            self.addFilter(sampler)
+        self.capacity = capacity
+        self.summary_interval = summary_interval
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._reported_drops = 0
+        self._records = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        if len(self._records) >= self.capacity:
+            self.dropped += 1
+            LOG_DROPPED.inc(reason='queue_full')
+            return
+        self._records.append(record)
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """
+        等待此前提交的日志全部写出（交互提示前调用，避免日志与提示交错）
+        :return: 是否在超时前写完
+        """
+        if self._closed or not self._thread.is_alive():
+            return True
+        marker = threading.Event()
+        self._records.append(marker)
+        self._wake.set()
+        return marker.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        """
+        写出积压的日志并停止后台线程，可重复调用
+        :param timeout: 最长等待时间（秒），到时仍未写出的日志计入丢弃
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # 目标写得太慢：放弃剩余日志，等后台线程写完当前一条后再关闭目标
+            abandoned = len(self._records)
+            self._records.clear()
+            self.dropped += abandoned
+            LOG_DROPPED.inc(abandoned, reason='queue_full')
+            self._thread.join(1.0)
+        for handler in self.targets:
+            handler.close()
+        super().close()
+
+    def _run(self):
+        next_summary = time.monotonic() + self.summary_interval
+        while True:
+            stopping = self._stop.is_set()
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while self._records:
+                try:
+                    item = self._records.popleft()
+                except IndexError:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+                else:
+                    self._write(item)
+            if stopping:
+                break
+            if time.monotonic() >= next_summary:
+                self._write_summary()
+                next_summary = time.monotonic() + self.summary_interval
+        self._write_summary()
+
+    def _write(self, record: logging.LogRecord):
+        for handler in self.targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _write_summary(self):
+        parts = []
+        if self.sampler is not None:
+            for key, (written, skipped) in sorted(self.sampler.collect().items()):
+                parts.append(f"{key} 写出{written}条/省略{skipped}条")
+        drops = self.dropped - self._reported_drops
+        if drops:
+            self._reported_drops += drops
+            parts.append(f"积压过多丢弃{drops}条")
+        if parts:
+            self._write(logging.makeLogRecord({
+                'name': 'async_logging', 'levelno': logging.INFO, 'levelname': 'INFO',
+                'msg': f"日志汇总: {', '.join(parts)}",
+            }))
+
+def setup_async_logging(handlers: Sequence[logging.Handler], logger: Optional[logging.Logger] = None,
+                        level: int = logging.INFO, fmt: str = DEFAULT_FORMAT, capacity: int = 10000,
+                        rate: float = 1.0, burst: int = 5, summary_interval: float = 10.0) -> AsyncLogHandler:
+    """
+    代替logging.basicConfig：把handlers挂到后台线程上
+    :param handlers: 实际写出日志的Handler，没有设置格式的使用fmt
+    :param logger: 要配置的logger，默认为根logger
+    :param capacity: 最多积压的日志条数
+    :param rate: 带sample标记的日志每组每秒最多写出的条数，0表示不采样
+    :param burst: 每组允许连续写出的条数
+    :return: AsyncLogHandler，进程退出时自动关闭
+    """
+    formatter = logging.Formatter(fmt)
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+    sampler = SamplingFilter(rate, burst) if rate > 0 else None
+    async_handler = AsyncLogHandler(handlers, capacity, sampler, summary_interval)
+    logger = logger or logging.getLogger()
+    logger.addHandler(async_handler)
+    logger.setLevel(level)
+    atexit.register(async_handler.close)
+    return async_handler
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量检测：离线处理视频文件和图片目录，不打开窗口，也不按摄像头帧率等待
+- 解码线程池读取视频和图片，并直接缩放到网络输入尺寸（OpenCV解码和缩放会释放GIL，多个线程可以并行）
+- 每N帧合成一个blobFromImages批次，只做一次前向传播；--workers大于0时把批次分给多个推理进程
+- 检测结果按来源写入列式检测日志（或JSONL），结束时报告总帧率和相对实时的倍数
+  python batch_detect.py videos/ images/ --batch 8 --output batch_output
+  python batch_detect.py clip.mp4 --workers 4 --format jsonl
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from model_cache import load_detector
+from detector import YoloDetector, load_class_names, load_yolo_model
+from detection_log import DATA_FILE, INDEX_FILE, META_FILE, DetectionLog
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.webm')
+FORMATS = ('log', 'jsonl')
+FILES_LIST = 'files.txt'
+
+class Source:
+    """一个输入来源：视频文件或图片目录"""
+
+    def __init__(self, source_id: int, path: str, name: str, images: Optional[List[str]] = None):
+        """
+        :param source_id: 来源编号
+        :param path: 视频文件或图片目录路径
+        :param name: 输出名称（检测日志子目录名），各来源不重复
+        :param images: 图片目录中按文件名排序的图片路径，视频为None
+        """
+        self.source_id = source_id
+        self.path = path
+        self.name = name
+        self.images = images
+        self.fps = 0.0
+        self.frames = 0
+        self.failed = 0
+        self.times: Optional[np.ndarray] = None
+        if images is not None:
+            self.frames = len(images)
+            # 图片按文件名排序作为帧顺序，时间取修改时间；检测日志的块索引要求时间不减，所以取累计最大值
+            self.times = np.maximum.accumulate([os.path.getmtime(p) for p in images]) if images else np.zeros(0)
+
+    @property
+    def is_video(self) -> bool:
+        return self.images is None
+
+    @property
+    def duration(self) -> float:
+        """视频时长（秒），图片目录为0"""
+        return self.frames / self.fps if self.is_video and self.fps > 0 else 0.0
+
+def collect_sources(inputs: List[str]) -> List[Source]:
+    """
+    展开输入：目录中的图片作为一个来源、其中的视频各作为一个来源；文件按扩展名判断是图片还是视频
+    :return: 来源列表
+    """
+    sources: List[Source] = []
+    names = set()
+
+    def add(path, images=None):
+        stem = os.path.splitext(os.path.basename(os.path.normpath(path)))[0] or 'source'
+        name, n = stem, 2
+        while name in names:
+            name, n = f'{stem}_{n}', n + 1
+        names.add(name)
+        sources.append(Source(len(sources), path, name, images))
+
+    for path in inputs:
+        if os.path.isdir(path):
+            entries = sorted(glob.glob(os.path.join(path, '*')))
+            images = [p for p in entries if p.lower().endswith(IMAGE_EXTENSIONS)]
+            if images:
+                add(path, images)
+            for video in (p for p in entries if p.lower().endswith(VIDEO_EXTENSIONS)):
+                add(video)
+        elif os.path.isfile(path):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                add(path, [path])
+            else:
+                add(path)
+        else:
+            print(f"警告: 输入不存在: {path}")
+    return sources
+
+class FrameDecoder:
+    """
+    解码线程池：视频每个文件由一个线程顺序解码，图片目录拆成若干段分给各线程
+    解码后的帧缩放到网络输入尺寸放入有界队列：(来源编号, 帧号, 时间, 图像, 原宽, 原高)，
+    读取失败的图片以图像为None占位，保证每个来源的帧号连续
+    """
+
+    def __init__(self, sources: List[Source], input_size, workers: int = 2, chunk: int = 32,
+                 queue_size: int = 64):
+        """
+        :param sources: 来源列表
+        :param input_size: 网络输入尺寸 (宽, 高)
+        :param workers: 解码线程数
+        :param chunk: 图片目录每段的图片数
+        :param queue_size: 已解码帧队列长度，推理跟不上时解码线程等待
+        """
+        self.sources = sources
+        self.input_size = tuple(input_size)
+        self.workers = max(1, workers)
+        self.frames: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._work: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        for source in sources:
+            if source.is_video:
+                self._work.put((source, 0, None))
+            else:
+                for start in range(0, len(source.images), chunk):
+                    self._work.put((source, start, source.images[start:start + chunk]))
+
+    def start(self):
+        """启动解码线程"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._decode_loop, name=f'decode-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def __iter__(self):
+        """依次取出解码后的帧，全部来源解码完成后结束"""
+        finished = 0
+        while finished < self.workers:
+            item = self.frames.get()
+            if item is None:
+                finished += 1
+                continue
+            yield item
+
+    def stop(self):
+        """通知解码线程退出并等待"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(1.0)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        # 与blobFromImages内部相同的缩放方式，推理结果不变，只是缩放在解码线程中并行完成
+        return cv2.resize(frame, self.input_size, interpolation=cv2.INTER_LINEAR), width, height
+
+    def _decode_loop(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    source, start, images = self._work.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if images is None:
+                        self._decode_video(source)
+                    else:
+                        self._decode_images(source, start, images)
+                except Exception as e:
+                    print(f"错误: 解码{source.path}时出错: {e}")
+                    source.failed += 1
+        finally:
+            # 主线程按结束标记计数，解码线程无论如何退出都必须放入
+            self._put(None)
+
+    def _decode_video(self, source: Source):
+        cap = cv2.VideoCapture(source.path)
+        if not cap.isOpened():
+            print(f"错误: 无法打开视频: {source.path}")
+            source.failed += 1
+            return
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            source.fps = fps if fps and fps > 0 else 30.0
+            # 录像文件的修改时间是录制结束时间，减去时长得到第一帧的时间
+            count = max(0.0, cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            start_time = os.path.getmtime(source.path) - count / source.fps
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                image, width, height = self._resize(frame)
+                if not self._put((source.source_id, source.frames, start_time + source.frames / source.fps,
+                                  image, width, height)):
+                    break
+                source.frames += 1
+        finally:
+            cap.release()
+
+    def _decode_images(self, source: Source, start: int, paths: List[str]):
+        for offset, path in enumerate(paths):
+            index = start + offset
+            image, width, height = None, 0, 0
+            try:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    image, width, height = self._resize(frame)
+            except cv2.error as e:
+                print(f"警告: 处理图片{path}时出错: {e}")
+            if image is None:
+                print(f"警告: 无法读取图片: {path}")
+                source.failed += 1
+            # 失败的图片也放入占位，同一来源后面的帧才能按帧号写出
+            if not self._put((source.source_id, index, float(source.times[index]), image, width, height)):
+                return
+
+class ResultWriter:
+    """
+    按来源写出检测结果：log格式每个来源一个列式检测日志子目录，jsonl格式全部写入一个文件
+    图片目录的各段由不同线程解码，结果可能乱序到达，按来源缓存到帧号连续后再写出
+    """
+
+    def __init__(self, output: str, fmt: str, sources: List[Source], classes: List[str], block_frames: int = 300):
+        """
+        :param output: 输出目录；jsonl格式下以.jsonl结尾时作为文件路径；已有的结果被覆盖
+        :param fmt: 'log' 或 'jsonl'
+        :param sources: 来源列表
+        :param classes: 类别名称
+        :param block_frames: 检测日志每块的帧数
+        """
+        self.output = output
+        self.fmt = fmt
+        self.sources = sources
+        self.classes = classes
+        self.block_frames = block_frames
+        self.detections = 0
+        self._logs: Dict[int, DetectionLog] = {}
+        self._jsonl = None
+        self._pending: Dict[int, Dict[int, tuple]] = {source.source_id: {} for source in sources}
+        self._next = {source.source_id: 0 for source in sources}
+
+    @property
+    def path(self) -> str:
+        if self.fmt == 'jsonl':
+            return self.output if self.output.endswith('.jsonl') else os.path.join(self.output, 'detections.jsonl')
+        return self.output
+
+    def start(self) -> bool:
+        """
+        创建输出目录，打开各来源的检测日志或JSONL文件
+        :return: 是否成功
+        """
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)) if self.fmt == 'jsonl' else self.output,
+                        exist_ok=True)
+            if self.fmt == 'jsonl':
+                self._jsonl = open(self.path, 'w', encoding='utf-8')
+                return True
+            for source in self.sources:
+                directory = os.path.join(self.output, source.name)
+                # 与jsonl格式一样覆盖上次的结果：接着追加会出现两份帧号都从0开始的记录，files.txt也对不上
+                existing = [os.path.join(directory, name) for name in (META_FILE, DATA_FILE, INDEX_FILE, FILES_LIST)
+                            if os.path.exists(os.path.join(directory, name))]
+                if existing:
+                    print(f"覆盖已有检测日志: {directory}")
+                    for path in existing:
+                        os.remove(path)
+                # 离线处理不会中途断电，块只按帧数切分；写盘队列放宽，避免处理速度高于写盘时丢块
+                log = DetectionLog(directory, self.classes, block_frames=self.block_frames,
+                                   block_seconds=float('inf'), queue_size=64)
+                if not log.start():
+                    self.close()
+                    return False
+                self._logs[source.source_id] = log
+                if not source.is_video:
+                    with open(os.path.join(directory, FILES_LIST), 'w', encoding='utf-8') as f:
+                        f.writelines(os.path.basename(p) + '\n' for p in source.images)
+        except OSError as e:
+            print(f"错误: 无法创建输出{self.path}: {e}")
+            self.close()
+            return False
+        return True
+
+    def write(self, source_id: int, index: int, timestamp: float, detections):
+        """
+        :param detections: [(x, y, w, h, label, confidence), ...]，None表示该帧读取失败，只跳过帧号
+        """
+        pending = self._pending[source_id]
+        pending[index] = (timestamp, detections)
+        next_index = self._next[source_id]
+        while next_index in pending:
+            timestamp, detections = pending.pop(next_index)
+            if detections is not None:
+                self._write_frame(self.sources[source_id], next_index, timestamp, detections)
+            next_index += 1
+        self._next[source_id] = next_index
+
+    def close(self):
+        for log in self._logs.values():
+            log.close(timeout=60.0)
+        self._logs = {}
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+    def _write_frame(self, source: Source, index: int, timestamp: float, detections):
+        self.detections += len(detections)
+        if self._jsonl is None:
+            self._logs[source.source_id].append(index, detections, timestamp)
+            return
+        record = {
+            'source': source.name,
+            'frame': index,
+            'time': round(timestamp, 6),
+            'detections': [[int(x), int(y), int(w), int(h), label, round(float(confidence), 4)]
+                           for x, y, w, h, label, confidence in detections],
+        }
+        if not source.is_video:
+            record['file'] = os.path.basename(source.images[index])
+        self._jsonl.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+_WORKER_DETECTOR: Optional[YoloDetector] = None
+
+def _init_worker(config_path, weights_path, names_path, confidence_threshold, nms_threshold, threads):
+    """推理进程初始化：各自加载网络并预热"""
+    global _WORKER_DETECTOR
+    cv2.setNumThreads(threads)
+    net, output_layers, classes = load_yolo_model(config_path, weights_path, names_path)
+    if net is None:
+        raise RuntimeError("推理进程加载模型失败")
+    _WORKER_DETECTOR = YoloDetector(net, output_layers, classes, confidence_threshold=confidence_threshold,
+                                    nms_threshold=nms_threshold)
+    _WORKER_DETECTOR.warmup(*_WORKER_DETECTOR.input_size)
+
+def _worker_ready():
+    """返回推理进程中检测器的输入尺寸，解码线程按它提前缩放"""
+    return _WORKER_DETECTOR.input_size
+
+def _detect_in_worker(images: np.ndarray, sizes):
+    """推理进程中检测一个批次，只回传检测结果"""
+    return _WORKER_DETECTOR.detect_batch(list(images), sizes)
+
+class BatchRunner:
+    """
+    把解码后的帧凑成批次做推理：workers为0时在本进程推理（OpenCV使用全部线程），
+    否则提交给推理进程池，最多同时有2倍进程数的批次在途，按提交顺序取回结果
+    """
+
+    def __init__(self, writer: ResultWriter, batch_size: int = 8, detector: Optional[YoloDetector] = None,
+                 executor: Optional[ProcessPoolExecutor] = None, workers: int = 0):
+        self.writer = writer
+        self.batch_size = max(1, batch_size)
+        self.detector = detector
+        self.executor = executor
+        self.max_in_flight = max(1, workers * 2)
+        self.frames = 0
+        self.batches = 0
+        self.inference_time = 0.0
+        self._in_flight = deque()
+
+    def run(self, decoder: FrameDecoder, progress_interval: float = 5.0):
+        """处理解码器产生的全部帧"""
+        batch = []
+        start_time = time.perf_counter()
+        last_report = start_time
+        for item in decoder:
+            if item[3] is None:
+                self.writer.write(item[0], item[1], item[2], None)
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._dispatch(batch)
+                batch = []
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                print(f"已处理 {self.frames} 帧, {self.frames / (now - start_time):.1f} 帧/秒")
+                last_report = now
+        if batch:
+            self._dispatch(batch)
+        while self._in_flight:
+            self._complete_oldest()
+
+    def _dispatch(self, batch):
+        images = [item[3] for item in batch]
+        sizes = [(item[4], item[5]) for item in batch]
+        if self.executor is None:
+            self._complete(batch, self.detector.detect_batch(images, sizes))
+            return
+        while len(self._in_flight) >= self.max_in_flight:
+            self._complete_oldest()
+        self._in_flight.append((batch, self.executor.submit(_detect_in_worker, np.stack(images), sizes)))
+
+    def _complete_oldest(self):
+        batch, future = self._in_flight.popleft()
+        self._complete(batch, future.result())
+
+    def _complete(self, batch, results):
+        detections, inference_time = results
+        self.inference_time += inference_time
+        self.batches += 1
+        self.frames += len(batch)
+        for item, frame_detections in zip(batch, detections):
+            self.writer.write(item[0], item[1], item[2], frame_detections)
+
+def report(sources: List[Source], runner: BatchRunner, writer: ResultWriter, elapsed: float) -> Dict:
+    """打印并返回处理统计"""
+    media_seconds = sum(source.duration for source in sources)
+    fps = runner.frames / elapsed if elapsed > 0 else 0.0
+    print(f"完成: {len(sources)}个来源, {runner.frames}帧, {writer.detections}条检测, "
+          f"耗时{elapsed:.2f}秒, {fps:.1f}帧/秒")
+    if runner.batches:
+        print(f"推理: {runner.batches}批, 平均每批{runner.inference_time / runner.batches * 1000:.1f}ms")
+    if media_seconds > 0:
+        print(f"视频总时长{media_seconds:.1f}秒, 为实时速度的{media_seconds / elapsed:.1f}倍")
+    for source in sources:
+        failed = f", 读取失败{source.failed}" if source.failed else ''
+        print(f"  {source.name}: {source.frames}帧{failed}")
+    print(f"检测结果: {writer.path}")
+    return {
+        'sources': len(sources),
+        'frames': runner.frames,
+        'detections': writer.detections,
+        'elapsed_s': round(elapsed, 3),
+        'fps': round(fps, 2),
+        'media_seconds': round(media_seconds, 3),
+        'realtime_factor': round(media_seconds / elapsed, 2) if elapsed > 0 and media_seconds > 0 else None,
+        'avg_batch_ms': round(runner.inference_time / runner.batches * 1000, 2) if runner.batches else None,
+    }
+
+def parse_arguments():
+    """解析命令行参数"""
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='批量检测视频文件和图片目录')
+    parser.add_argument('inputs', nargs='+', help='视频文件、图片或包含图片/视频的目录')
+    parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
+    parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径')
+    parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--cache-dir', default='.model_cache', help='模型缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用模型缓存')
+    parser.add_argument('--confidence', type=float, default=0.5, help='置信度阈值')
+    parser.add_argument('--nms', type=float, default=0.4, help='非极大值抑制阈值')
+    parser.add_argument('--batch', type=int, default=8, help='每次前向传播的帧数')
+    parser.add_argument('--decode-workers', type=int, default=max(2, min(4, cpu_count)), help='解码线程数')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='推理进程数，0表示在本进程推理（OpenCV使用--threads个线程）')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='OpenCV线程数（推理进程模式下为每个进程的线程数），0表示平分全部核心')
+    parser.add_argument('--output', default='batch_output', help='输出目录（jsonl格式下可以是.jsonl文件）')
+    parser.add_argument('--format', choices=FORMATS, default='log', help='log: 每个来源一个列式检测日志; jsonl: 逐帧JSON')
+    parser.add_argument('--log-frames', type=int, default=300, help='检测日志每块的帧数')
+    parser.add_argument('--report', default=None, help='把处理统计写入JSON文件')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    sources = collect_sources(args.inputs)
+    if not sources:
+        print("错误: 没有找到可处理的视频或图片")
+        sys.exit(1)
+
+    cpu_count = os.cpu_count() or 1
+    detector = None
+    executor = None
+    if args.workers > 0:
+        classes = load_class_names(args.names)
+        if classes is None:
+            sys.exit(1)
+        threads = args.threads or max(1, cpu_count // args.workers)
+        # spawn启动：每个进程独立初始化cv2.dnn，避免fork继承父进程的线程状态
+        executor = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker,
+                                       initargs=(args.config, args.weights, args.names, args.confidence,
+                                                 args.nms, threads))
+        try:
+            # 进程池在提交任务时才启动进程；先提交空任务，让模型加载和预热不计入处理耗时
+            input_sizes = {tuple(future.result())
+                           for future in [executor.submit(_worker_ready) for _ in range(args.workers)]}
+        except Exception as e:
+            print(f"错误: 无法启动推理进程: {e}")
+            executor.shutdown(cancel_futures=True)
+            sys.exit(1)
+        input_size = input_sizes.pop()
+        print(f"推理进程: {args.workers}个, 每个{threads}线程")
+    else:
+        cv2.setNumThreads(args.threads or cpu_count)
+        detector = load_detector(args.config, args.weights, args.names,
+                                 cache_dir=None if args.no_cache else args.cache_dir,
+                                 confidence_threshold=args.confidence, nms_threshold=args.nms)
+        if detector is None:
+            print("错误: 无法加载模型，请检查模型文件路径")
+            sys.exit(1)
+        classes = detector.classes
+        input_size = detector.input_size
+        print(f"本进程推理, OpenCV线程数: {cv2.getNumThreads()}")
+
+    writer = ResultWriter(args.output, args.format, sources, classes, args.log_frames)
+    if not writer.start():
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        sys.exit(1)
+
+    decoder = FrameDecoder(sources, input_size, args.decode_workers,
+                           queue_size=max(args.batch * (max(args.workers, 1) * 2 + 2), 16))
+    runner = BatchRunner(writer, args.batch, detector, executor, args.workers)
+    print(f"开始处理 {len(sources)} 个来源, 每批{args.batch}帧, {decoder.workers}个解码线程")
+    start_time = time.perf_counter()
+    decoder.start()
+    failed = False
+    try:
+        runner.run(decoder)
+    except KeyboardInterrupt:
+        print("用户中断，保存已完成的结果")
+    except Exception as e:
+        print(f"错误: 批量检测失败: {e}")
+        failed = True
+    finally:
+        elapsed = time.perf_counter() - start_time
+        decoder.stop()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.close()
+
+    summary = report(sources, runner, writer, elapsed)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"统计已写入: {args.report}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
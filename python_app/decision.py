@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+VOTE = 'vote'  # 滑动窗口投票：得分为窗口内该状态出现的比例
+EMA = 'ema'    # 指数累积：得分为各状态置信度指数移动平均的占比
+SMOOTHING_MODES = (VOTE, EMA)
+
+class DecisionSmoother:
+    """
+    检测结果与串口协议之间的决策层：对逐帧的原始决策（'A'/'B'/'N'）做时间平滑
+    - 得分：滑动窗口投票或指数置信度累积
+    - 滞回：当前状态得分低于stay_threshold且新状态得分达到enter_threshold时才切换
+    - 最短驻留：切换后至少保持min_dwell秒
+    单帧误检不会再引起 A→N→A 的往返发送
+    """
+
+    def __init__(self, mode: str = VOTE, window: int = 5, alpha: float = 0.3,
+                 enter_threshold: float = 0.6, stay_threshold: float = 0.4, min_dwell: float = 0.5,
+                 initial: str = 'N', clock: Callable[[], float] = time.monotonic):
+        """
+        :param mode: 平滑方式，见SMOOTHING_MODES
+        :param window: 投票窗口帧数
+        :param alpha: 指数累积的系数，越大响应越快
+        :param enter_threshold: 切换到新状态所需的得分
+        :param stay_threshold: 当前状态得分不低于该值时保持不变
+        :param min_dwell: 最短驻留时间（秒）
+        :param initial: 初始状态
+        :param clock: 时间函数，便于离线回放时注入帧时间
+        """
+        if mode not in SMOOTHING_MODES:
+            raise ValueError(f"无效的平滑方式: {mode}")
+        self.mode = mode
+        self.alpha = alpha
+        self.enter_threshold = enter_threshold
+        self.stay_threshold = stay_threshold
+        self.min_dwell = min_dwell
+        self.clock = clock
+
+        self.state = initial
+        self.frames = 0
+        self.raw_changes = 0
+        self.changes = 0
+
+        # 冷启动时窗口和累积得分都按初始状态填满，第一帧误检不会因为分母只有1帧而直接切换
+        self._votes = deque([initial] * window, maxlen=window)
+        self._scores: Dict[str, float] = {initial: 1.0}
+        self._last_raw = initial
+        self._changed_at: Optional[float] = None
+        self._start_time: Optional[float] = None
+
+    def update(self, raw: str, confidence: float = 1.0, now: Optional[float] = None) -> str:
+        """
+        输入一帧的原始决策
+        :param raw: 原始决策
+        :param confidence: 原始决策的置信度（仅指数累积方式使用，'N'可传1.0）
+        :param now: 当前时间，默认取clock()
+        :return: 平滑后的决策
+        """
+        now = self.clock() if now is None else now
+        if self._start_time is None:
+            self._start_time = now
+        self.frames += 1
+        if raw != self._last_raw:
+            self.raw_changes += 1
+            self._last_raw = raw
+
+        scores = self._score(raw, confidence)
+        if self._changed_at is not None and now - self._changed_at < self.min_dwell:
+            return self.state
+        if scores.get(self.state, 0.0) >= self.stay_threshold:
+            return self.state
+
+        if not scores:
+            return self.state
+        candidate = max(scores, key=scores.get)
+        if candidate != self.state and scores[candidate] >= self.enter_threshold:
+            self.state = candidate
+            self.changes += 1
+            self._changed_at = now
+        return self.state
+
+    def metrics(self, now: Optional[float] = None) -> Dict[str, float]:
+        """平滑前后的状态变化次数及对应的消息速率（条/秒）"""
+        now = self.clock() if now is None else now
+        elapsed = now - self._start_time if self._start_time is not None else 0.0
+        return {
+            'frames': self.frames,
+            'raw_changes': self.raw_changes,
+            'changes': self.changes,
+            'raw_rate': self.raw_changes / elapsed if elapsed > 0 else 0.0,
+            'rate': self.changes / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _score(self, raw: str, confidence: float) -> Dict[str, float]:
+        if self.mode == VOTE:
+            self._votes.append(raw)
+            total = float(len(self._votes))
+            return {label: self._votes.count(label) / total for label in set(self._votes)}
+
+        # 置信度只决定各状态的相对权重，归一化后得分与投票方式一样落在 [0, 1]
+        self._scores.setdefault(raw, 0.0)
+        for label in self._scores:
+            value = confidence if label == raw else 0.0
+            self._scores[label] = (1 - self.alpha) * self._scores[label] + self.alpha * value
+        total = sum(self._scores.values())
+        return {label: score / total for label, score in self._scores.items()} if total > 0 else {}
+
+def main():
+    """自检：冷启动时单帧误检不改变状态，持续的新状态在窗口过半后切换"""
+    for mode in SMOOTHING_MODES:
+        smoother = DecisionSmoother(mode=mode)
+        states = [smoother.update('A', 0.9, now=0.0)]
+        states += [smoother.update('N', now=i / 30.0) for i in range(1, 15)]
+        if 'A' in states:
+            print(f"错误: {mode}: 启动时单帧'A'改变了状态: {''.join(states)}")
+            raise SystemExit(1)
+
+        smoother = DecisionSmoother(mode=mode, min_dwell=0.0)
+        states = [smoother.update('A', 0.9, now=i / 30.0) for i in range(10)]
+        if states[-1] != 'A':
+            print(f"错误: {mode}: 持续的'A'没有切换状态: {''.join(states)}")
+            raise SystemExit(1)
+        print(f"{mode}: 单帧误检保持'N'，持续'A'在第{states.index('A') + 1}帧切换")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式检测日志：逐帧检测结果（帧号、时间、类别、检测框、置信度）追加写入目录，供离线分析
+- 检测循环只把结果追加到内存列表，每block_frames帧（或block_seconds秒）交给后台线程整理成一个块写盘
+- 块内按列存放（每列一段连续的定宽数组）；索引为每块一条定宽记录（偏移、行数、帧号与时间范围、类别位图）
+- 读取端用np.memmap映射数据和索引：按索引跳过时间范围或类别不相关的块，只读取需要的列，不解析文本
+
+目录结构：
+  meta.json   版本、列定义和类别名称
+  blocks.bin  数据块依次相接；每块为COLUMNS中各列的数组首尾相接，整块按8字节对齐
+  index.bin   每块一条INDEX_DTYPE记录；块写盘并flush后才追加索引，进程中断时未索引的数据在下次打开时截掉
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+VERSION = 1
+META_FILE = 'meta.json'
+DATA_FILE = 'blocks.bin'
+INDEX_FILE = 'index.bin'
+
+# 按元素宽度从大到小排列，块起点8字节对齐时每列都自然对齐
+COLUMNS = (
+    ('frame', '<u8'),
+    ('time', '<f8'),        # 墙上时间（秒）
+    ('x', '<i4'),
+    ('y', '<i4'),
+    ('w', '<i4'),
+    ('h', '<i4'),
+    ('confidence', '<f4'),
+    ('class_id', '<u2'),
+)
+DETECTION_DTYPE = np.dtype(list(COLUMNS))
+ROW_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS)
+
+# classes为类别位图：第i位表示块中有class_id为i的检测，编号>=127的类别共用第127位
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('rows', '<u4'),
+    ('frames', '<u4'),
+    ('frame_first', '<u8'),
+    ('frame_last', '<u8'),
+    ('time_first', '<f8'),
+    ('time_last', '<f8'),
+    ('classes', '<u8', (2,)),
+])
+_MASK_BITS = 128
+
+def block_bytes(rows: int) -> int:
+    """一个块在数据文件中占用的字节数（含对齐填充）"""
+    return (rows * ROW_BYTES + 7) // 8 * 8
+
+def _class_bit(class_id: int) -> int:
+    return min(int(class_id), _MASK_BITS - 1)
+
+def _class_mask(class_ids: np.ndarray) -> np.ndarray:
+    mask = np.zeros(2, dtype=np.uint64)
+    for class_id in np.unique(class_ids):
+        bit = _class_bit(class_id)
+        mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+    return mask
+
+def _read_meta(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, META_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != VERSION or [tuple(c) for c in meta.get('columns', [])] != list(COLUMNS):
+        raise ValueError(f"检测日志版本或列定义不兼容: {path}")
+    return meta
+
+class DetectionLog:
+    """
+    追加写入的检测日志
+    - append()每帧只追加Python元组，不做numpy转换和磁盘操作
+    - 后台线程把一个块的行转换成各列数组并写盘；待写的块超过queue_size时丢弃新块并计数
+    """
+
+    def __init__(self, directory: str, classes: Sequence[str] = (), block_frames: int = 300,
+                 block_seconds: float = 10.0, queue_size: int = 8):
+        """
+        :param directory: 日志目录，已存在时接着追加
+        :param classes: 类别名称（class_id为其下标），遇到不在列表中的类别时追加到末尾
+        :param block_frames: 每块最多包含的帧数
+        :param block_seconds: 每块最长覆盖的时间（秒），进程中断时最多丢失这么长的数据
+        :param queue_size: 最多等待写盘的块数
+        """
+        self.directory = directory
+        self.classes: List[str] = list(classes)
+        self.block_frames = max(1, block_frames)
+        self.block_seconds = block_seconds
+
+        self.frames = 0
+        self.rows = 0
+        self.blocks = 0
+        self.dropped_blocks = 0
+        self.errors = 0
+        self.frame_base = 0     # 已有日志最后一帧的帧号（新日志为0），调用方据此接着编号，避免多次运行的帧号重复
+
+        self._class_ids = {name: i for i, name in enumerate(self.classes)}
+        self._meta_dirty = False
+        self._rows: List[tuple] = []
+        self._block_frames = 0
+        self._frame_first = 0
+        self._time_first = 0.0
+        self._frame_last = 0
+        self._time_last = 0.0
+        self._data_offset = 0
+        self._data_file = None
+        self._index_file = None
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        打开（或创建）日志目录并启动写盘线程
+        :return: 是否成功
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            meta = _read_meta(self.directory)
+            if meta is not None:
+                # 已有日志的类别编号不能改变，新的类别追加到末尾
+                existing = list(meta['classes'])
+                self.classes = existing + [name for name in self.classes if name not in existing]
+                self._class_ids = {name: i for i, name in enumerate(self.classes)}
+            self._recover()
+            self._data_file = open(os.path.join(self.directory, DATA_FILE), 'ab')
+            self._index_file = open(os.path.join(self.directory, INDEX_FILE), 'ab')
+            self._write_meta()
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法打开检测日志{self.directory}: {e}")
+            return False
+        self._thread = threading.Thread(target=self._write_loop, name='detection-log', daemon=True)
+        self._thread.start()
+        return True
+
+    def append(self, frame_id: int, detections, timestamp: Optional[float] = None):
+        """
+        记录一帧的检测结果（没有检测到物体的帧也要记录，用于统计帧范围）
+        :param frame_id: 帧号
+        :param detections: [(x, y, w, h, label, confidence), ...]
+        :param timestamp: 墙上时间（秒），默认为当前时间
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._block_frames == 0:
+            self._frame_first, self._time_first = frame_id, timestamp
+        self._frame_last, self._time_last = frame_id, timestamp
+        self._block_frames += 1
+        self.frames += 1
+
+        rows = self._rows
+        for x, y, w, h, label, confidence in detections:
+            class_id = self._class_ids.get(label)
+            if class_id is None:
+                class_id = self._add_class(label)
+            rows.append((frame_id, timestamp, x, y, w, h, confidence, class_id))
+
+        if self._block_frames >= self.block_frames or timestamp - self._time_first >= self.block_seconds:
+            self._submit()
+
+    def flush(self):
+        """把未满的块交给写盘线程"""
+        if self._block_frames:
+            self._submit()
+
+    def close(self, timeout: float = 5.0):
+        """写完剩余的块并关闭文件"""
+        if self._thread is None:
+            return
+        self.flush()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._data_file = self._index_file = None
+        try:
+            self._write_meta()
+        except OSError as e:
+            print(f"警告: 无法写入检测日志元数据: {e}")
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            'frames': self.frames,
+            'rows': self.rows,
+            'blocks': self.blocks,
+            'dropped_blocks': self.dropped_blocks,
+            'errors': self.errors,
+        }
+
+    def _add_class(self, label: str) -> int:
+        class_id = len(self.classes)
+        self.classes.append(label)
+        self._class_ids[label] = class_id
+        self._meta_dirty = True
+        return class_id
+
+    def _submit(self):
+        block = (self._rows, self._block_frames, self._frame_first, self._frame_last,
+                 self._time_first, self._time_last, self._meta_dirty)
+        self._rows = []
+        self._block_frames = 0
+        self._meta_dirty = False
+        try:
+            self._queue.put_nowait(block)
+        except queue.Full:
+            self.dropped_blocks += 1
+
+    def _recover(self):
+        """按索引截掉上次中断时写了一半的块和索引记录，并读出最后一块的帧号"""
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        data_path = os.path.join(self.directory, DATA_FILE)
+        index_bytes = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        blocks = index_bytes // INDEX_DTYPE.itemsize
+        if index_bytes != blocks * INDEX_DTYPE.itemsize:
+            os.truncate(index_path, blocks * INDEX_DTYPE.itemsize)
+        end = 0
+        if blocks:
+            last = np.fromfile(index_path, dtype=INDEX_DTYPE, count=1, offset=(blocks - 1) * INDEX_DTYPE.itemsize)[0]
+            end = int(last['offset']) + block_bytes(int(last['rows']))
+            self.frame_base = int(last['frame_last'])
+        if os.path.exists(data_path) and os.path.getsize(data_path) > end:
+            os.truncate(data_path, end)
+        self._data_offset = end
+
+    def _write_meta(self):
+        path = os.path.join(self.directory, META_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'columns': [list(column) for column in COLUMNS],
+                       'classes': list(self.classes)}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _write_loop(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            try:
+                self._write_block(*block)
+            except OSError as e:
+                self.errors += 1
+                print(f"警告: 写入检测日志失败: {e}")
+
+    def _write_block(self, rows, frames, frame_first, frame_last, time_first, time_last, meta_dirty):
+        table = np.array(rows, dtype=DETECTION_DTYPE)
+        payload = b''.join(np.ascontiguousarray(table[name]).tobytes() for name, _ in COLUMNS)
+        payload += bytes(block_bytes(len(table)) - len(payload))
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry['offset'] = self._data_offset
+        entry['rows'] = len(table)
+        entry['frames'] = frames
+        entry['frame_first'] = frame_first
+        entry['frame_last'] = frame_last
+        entry['time_first'] = time_first
+        entry['time_last'] = time_last
+        entry['classes'] = _class_mask(table['class_id'])
+
+        # 先写数据再写索引，读取端只会看到完整的块
+        self._data_file.write(payload)
+        self._data_file.flush()
+        self._index_file.write(entry.tobytes())
+        self._index_file.flush()
+        self._data_offset += len(payload)
+        self.blocks += 1
+        self.rows += len(table)
+        if meta_dirty:
+            self._write_meta()
+
+class DetectionLogReader:
+    """用np.memmap读取检测日志；打开之后写入的块在重新打开前不可见"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.classes: List[str] = []
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._data: Optional[np.memmap] = None
+
+    def open(self) -> bool:
+        try:
+            meta = _read_meta(self.directory)
+            if meta is None:
+                raise ValueError("缺少meta.json")
+            self.classes = list(meta['classes'])
+            index_path = os.path.join(self.directory, INDEX_FILE)
+            data_path = os.path.join(self.directory, DATA_FILE)
+            blocks = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+            if blocks:
+                self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', shape=(blocks,))
+                end = int(self.index[-1]['offset']) + block_bytes(int(self.index[-1]['rows']))
+                if end:
+                    self._data = np.memmap(data_path, dtype=np.uint8, mode='r', shape=(end,))
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取检测日志{self.directory}: {e}")
+            return False
+        return True
+
+    def close(self):
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def class_ids(self, classes: Sequence[Union[str, int]]) -> List[int]:
+        """类别名称或编号转换为编号，未知名称被忽略"""
+        ids = []
+        for name in classes:
+            if isinstance(name, (int, np.integer)):
+                ids.append(int(name))
+            elif name in self.classes:
+                ids.append(self.classes.index(name))
+        return ids
+
+    def select_blocks(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                      class_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        按索引筛选可能包含结果的块
+        :return: 块编号数组
+        """
+        index = self.index
+        keep = index['rows'] > 0
+        if t0 is not None:
+            keep &= index['time_last'] >= t0
+        if t1 is not None:
+            keep &= index['time_first'] <= t1
+        if class_ids is not None:
+            wanted = np.zeros(2, dtype=np.uint64)
+            for class_id in class_ids:
+                bit = _class_bit(class_id)
+                wanted[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+            keep &= ((index['classes'] & wanted) != 0).any(axis=1)
+        return np.flatnonzero(keep)
+
+    def column(self, block: int, name: str) -> np.ndarray:
+        """一个块中某一列的只读视图（不复制）"""
+        entry = self.index[block]
+        rows = int(entry['rows'])
+        start = int(entry['offset'])
+        for column, dtype in COLUMNS:
+            size = rows * np.dtype(dtype).itemsize
+            if column == name:
+                return self._data[start:start + size].view(dtype)
+            start += size
+        raise KeyError(name)
+
+    def query(self, t0: Optional[float] = None, t1: Optional[float] = None,
+              classes: Optional[Sequence[Union[str, int]]] = None, min_confidence: float = 0.0) -> np.ndarray:
+        """
+        查询检测记录，如"t0到t1之间所有person的检测"
+        :param t0: 开始时间（墙上时间，秒），None表示不限
+        :param t1: 结束时间（含），None表示不限
+        :param classes: 类别名称或编号，None表示全部
+        :param min_confidence: 最低置信度
+        :return: DETECTION_DTYPE结构化数组（只复制命中的行）
+        """
+        class_ids = None if classes is None else self.class_ids(classes)
+        if class_ids is not None and not class_ids:
+            return np.zeros(0, dtype=DETECTION_DTYPE)
+        parts = []
+        for block in self.select_blocks(t0, t1, class_ids):
+            # 先只读筛选用到的列，整块不相关时不再读取其他列
+            times = self.column(block, 'time')
+            mask = np.ones(len(times), dtype=bool)
+            if t0 is not None:
+                mask &= times >= t0
+            if t1 is not None:
+                mask &= times <= t1
+            if class_ids is not None:
+                mask &= np.isin(self.column(block, 'class_id'), class_ids)
+            if min_confidence > 0:
+                mask &= self.column(block, 'confidence') >= min_confidence
+            if not mask.any():
+                continue
+            part = np.empty(int(mask.sum()), dtype=DETECTION_DTYPE)
+            for name, _ in COLUMNS:
+                part[name] = self.column(block, name)[mask]
+            parts.append(part)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=DETECTION_DTYPE)
+
+def _parse_time(text: Optional[str]) -> Optional[float]:
+    """时间参数：Unix时间戳或'YYYY-MM-DD HH:MM[:SS]'（本地时间）"""
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='查询列式检测日志')
+    parser.add_argument('directory', help='检测日志目录')
+    parser.add_argument('--class', dest='classes', action='append', default=None, help='类别名称（可重复）')
+    parser.add_argument('--since', default=None, help="开始时间：Unix时间戳或'YYYY-MM-DD HH:MM[:SS]'")
+    parser.add_argument('--until', default=None, help='结束时间，格式同--since')
+    parser.add_argument('--min-confidence', type=float, default=0.0, help='最低置信度')
+    parser.add_argument('--csv', default=None, help='把查询结果导出为CSV文件')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    try:
+        t0, t1 = _parse_time(args.since), _parse_time(args.until)
+    except ValueError as e:
+        print(f"错误: 无效的时间: {e}")
+        sys.exit(1)
+    reader = DetectionLogReader(args.directory)
+    if not reader.open():
+        sys.exit(1)
+    with reader:
+        start_time = time.perf_counter()
+        class_ids = None if args.classes is None else reader.class_ids(args.classes)
+        blocks = reader.select_blocks(t0, t1, class_ids)
+        result = reader.query(t0, t1, args.classes, args.min_confidence)
+        elapsed = time.perf_counter() - start_time
+
+        index = reader.index
+        if len(index):
+            first = datetime.fromtimestamp(float(index['time_first'].min())).strftime('%Y-%m-%d %H:%M:%S')
+            last = datetime.fromtimestamp(float(index['time_last'].max())).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{args.directory}: {len(index)}块, {int(index['frames'].sum())}帧, "
+                  f"{int(index['rows'].sum())}条检测, {first} ~ {last}")
+        print(f"查询: 读取{len(blocks)}/{len(index)}块, 命中{len(result)}条, 耗时{elapsed*1000:.1f}ms")
+        ids, counts = np.unique(result['class_id'], return_counts=True)
+        for class_id, count in zip(ids, counts):
+            name = reader.classes[class_id] if class_id < len(reader.classes) else str(class_id)
+            print(f"  {name}: {count}")
+
+        if args.csv:
+            with open(args.csv, 'w', encoding='utf-8') as f:
+                f.write('frame,time,class,x,y,w,h,confidence\n')
+                for row in result:
+                    class_id = int(row['class_id'])
+                    name = reader.classes[class_id] if class_id < len(reader.classes) else str(class_id)
+                    f.write(f"{row['frame']},{row['time']:.6f},{name},{row['x']},{row['y']},{row['w']},"
+                            f"{row['h']},{row['confidence']:.4f}\n")
+            print(f"结果已写入: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+def load_class_names(names_path) -> Optional[List[str]]:
+    """读取类别名称文件（每行一个），失败时返回None"""
+    try:
+        with open(names_path, 'r') as f:
+            return [line.strip() for line in f.readlines()]
+    except Exception as e:
+        print(f"错误: 无法读取类别文件: {e}")
+        return None
+
+def load_yolo_model(config_path, weights_path, names_path):
+    """加载YOLO模型"""
+    try:
+        # 加载YOLO模型
+        net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+
+        # 获取输出层名称
+        layer_names = net.getLayerNames()
+        try:
+            # OpenCV 4.5.4及更高版本
+            output_layers = [layer_names[i-1] for i in net.getUnconnectedOutLayers()]
+        except:
+            # 旧版本OpenCV
+            output_layers = [layer_names[i[0]-1] for i in net.getUnconnectedOutLayers()]
+
+        # 加载类别名称
+        classes = load_class_names(names_path)
+        if classes is None:
+            return None, None, None
+
+        return net, output_layers, classes
+    except Exception as e:
+        print(f"错误: 无法加载YOLO模型: {e}")
+        return None, None, None
+
+def decode_outputs(outs, width, height, confidence_threshold):
+    """
+    批量解码YOLO输出层结果
+    :param outs: net.forward返回的输出层列表，每行为 [cx, cy, w, h, obj, 各类别得分...]
+    :param width: 原始帧宽度
+    :param height: 原始帧高度
+    :param confidence_threshold: 置信度阈值
+    :return: (boxes, confidences, class_ids)，boxes为N x 4的int32数组 [x, y, w, h]
+    """
+    detections = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outs])
+
+    # 每行取得分最高的类别
+    scores = detections[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    # 置信度过滤
+    mask = confidences > confidence_threshold
+    detections = detections[mask]
+    confidences = confidences[mask]
+    class_ids = class_ids[mask]
+
+    # 中心点坐标转换为左上角坐标（与逐行int截断保持一致）
+    center_x = (detections[:, 0] * width).astype(np.int32)
+    center_y = (detections[:, 1] * height).astype(np.int32)
+    w = (detections[:, 2] * width).astype(np.int32)
+    h = (detections[:, 3] * height).astype(np.int32)
+    x = (center_x - w / 2).astype(np.int32)
+    y = (center_y - h / 2).astype(np.int32)
+    boxes = np.stack([x, y, w, h], axis=1)
+
+    return boxes, confidences.astype(np.float32), class_ids
+
+class YoloDetector:
+    """YOLO检测器，持有cv2.dnn网络、输出层名称和类别列表"""
+
+    def __init__(self, net, output_layers: List[str], classes: List[str],
+                 confidence_threshold: float = 0.5, nms_threshold: float = 0.4,
+                 input_size: Tuple[int, int] = (416, 416)):
+        """
+        :param net: cv2.dnn网络
+        :param output_layers: 输出层名称
+        :param classes: 类别名称列表
+        :param confidence_threshold: 置信度阈值
+        :param nms_threshold: 非极大值抑制阈值
+        :param input_size: 网络输入尺寸 (宽, 高)
+        """
+        self.net = net
+        self.output_layers = output_layers
+        self.classes = classes
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self.input_size = input_size
+
+    @classmethod
+    def from_files(cls, config_path, weights_path, names_path, cache=None, **kwargs) -> Optional['YoloDetector']:
+        """
+        从模型文件创建检测器
+        :param cache: 可选的ModelCache，命中时跳过输出层推导和类别文件读取
+        :return: 检测器，加载失败返回None
+        """
+        loader = cache.load if cache is not None else load_yolo_model
+        net, output_layers, classes = loader(config_path, weights_path, names_path)
+        if net is None or output_layers is None or classes is None:
+            return None
+        return cls(net, output_layers, classes, **kwargs)
+
+    def warmup(self, width: int = 640, height: int = 480, runs: int = 1) -> float:
+        """
+        用空白帧执行前向传播，提前完成网络初始化和内存分配，避免首个真实帧承担这部分开销
+        :return: 预热耗时（秒）
+        """
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        start_time = time.perf_counter()
+        for _ in range(runs):
+            self.infer(self.preprocess([frame]))
+        return time.perf_counter() - start_time
+
+    def preprocess(self, frames: Sequence[np.ndarray]) -> np.ndarray:
+        """将多帧合成一个网络输入blob"""
+        return cv2.dnn.blobFromImages(frames, 1/255.0, self.input_size, swapRB=True, crop=False)
+
+    def infer(self, blob: np.ndarray) -> List[List[np.ndarray]]:
+        """
+        对blob执行一次前向传播
+        :return: 每帧对应的输出层列表
+        """
+        self.net.setInput(blob)
+        outs = self.net.forward(self.output_layers)
+
+        # 批大小为1时输出为二维 (行数, 85)，否则为三维 (批大小, 行数, 85)
+        if outs[0].ndim == 2:
+            return [list(outs)]
+        return [[out[i] for out in outs] for i in range(blob.shape[0])]
+
+    def forward(self, frames: Sequence[np.ndarray]) -> List[List[np.ndarray]]:
+        """
+        对多帧执行一次前向传播
+        :return: 每帧对应的输出层列表
+        """
+        return self.infer(self.preprocess(frames))
+
+    def postprocess(self, outs, width, height):
+        """
+        解码单帧输出并执行非极大值抑制
+        :return: [(x, y, w, h, label, confidence), ...]
+        """
+        boxes, confidences, class_ids = decode_outputs(outs, width, height, self.confidence_threshold)
+        indices = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence_threshold, self.nms_threshold)
+
+        detected_objects = []
+        for i in np.array(indices, dtype=np.int32).flatten():
+            try:
+                x, y, w, h = (int(v) for v in boxes[i])
+                label = str(self.classes[class_ids[i]])
+                confidence = float(confidences[i])
+                detected_objects.append((x, y, w, h, label, confidence))
+            except Exception as e:
+                print(f"警告: 处理检测结果时出错: {e}")
+                continue
+
+        return detected_objects
+
+    def detect(self, frame):
+        """
+        处理单帧图像并检测物体
+        :return: (detections, inference_time)
+        """
+        results, inference_time = self.detect_batch([frame])
+        return (results[0] if results else []), inference_time
+
+    def detect_batch(self, frames: Sequence[np.ndarray], sizes: Optional[Sequence[Tuple[int, int]]] = None):
+        """
+        将多帧合成一个blob，只执行一次前向传播
+        :param frames: BGR图像列表，尺寸可以不同
+        :param sizes: 每帧原图的 (宽, 高)；帧已提前缩放到input_size时传入，检测框按原图坐标输出
+        :return: (每帧的检测结果列表, 整批推理耗时)
+        """
+        if len(frames) == 0:
+            return [], 0
+
+        try:
+            blob = self.preprocess(frames)
+            start_time = time.perf_counter()
+            batch_outs = self.infer(blob)
+            inference_time = time.perf_counter() - start_time
+
+            if sizes is None:
+                sizes = [(frame.shape[1], frame.shape[0]) for frame in frames]
+            results = []
+            for (width, height), outs in zip(sizes, batch_outs):
+                results.append(self.postprocess(outs, width, height))
+            return results, inference_time
+        except Exception as e:
+            print(f"错误: 处理帧时出错: {e}")
+            return [[] for _ in frames], 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import signal
+import threading
+
+import cv2
+
+class Display:
+    """
+    窗口显示与退出控制
+    headless模式下不创建窗口、不调用imshow/waitKey，可以在没有显示器的服务器上运行；
+    两种模式下SIGINT/SIGTERM都只设置退出标志，由主循环在当前帧结束后正常退出并释放资源
+    """
+
+    def __init__(self, window_name: str, headless: bool = False, quit_keys=(ord('q'),)):
+        """
+        :param window_name: 窗口标题
+        :param headless: 是否为无窗口模式
+        :param quit_keys: 窗口模式下触发退出的按键
+        """
+        self.window_name = window_name
+        self.headless = headless
+        self.quit_keys = quit_keys
+        self._stop = threading.Event()
+        self._previous_handlers = {}
+
+        # 信号处理函数只能在主线程注册
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+        if not headless:
+            cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+
+    @property
+    def stopped(self) -> bool:
+        """是否已收到退出信号或按下退出键"""
+        return self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+
+    def show(self, frame) -> int:
+        """
+        显示一帧并处理窗口事件
+        :return: 按键码（& 0xFF），无按键或headless模式返回-1
+        """
+        if self.headless:
+            return -1
+        cv2.imshow(self.window_name, frame)
+        return self.poll()
+
+    def poll(self) -> int:
+        """只处理窗口事件（没有新帧时调用），按下退出键时设置退出标志"""
+        if self.headless:
+            return -1
+        key = cv2.waitKey(1)
+        if key == -1:
+            return -1
+        key &= 0xFF
+        if key in self.quit_keys:
+            self._stop.set()
+        return key
+
+    def close(self):
+        """关闭窗口并恢复原来的信号处理函数"""
+        if not self.headless:
+            cv2.destroyAllWindows()
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_handlers = {}
+
+    def _handle_signal(self, signum, frame):
+        if self._stop.is_set():
+            # 第二次收到信号时不再等待当前帧结束
+            raise KeyboardInterrupt
+        print(f"收到信号 {signum}，正在退出...")
+        self._stop.set()
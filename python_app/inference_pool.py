@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from typing import Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detector import YoloDetector, load_yolo_model
+from pipeline import FramePacket
+
+def _worker_main(shm_name, shape, conn, config_path, weights_path, names_path,
+                 confidence_threshold, nms_threshold, threads):
+    """推理进程入口：各自加载网络，直接在共享内存槽位上做检测，只回传检测结果"""
+    cv2.setNumThreads(threads)
+    net, output_layers, classes = load_yolo_model(config_path, weights_path, names_path)
+    if net is None:
+        conn.send(('failed', os.getpid()))
+        return
+    detector = YoloDetector(net, output_layers, classes, confidence_threshold=confidence_threshold,
+                            nms_threshold=nms_threshold)
+    detector.warmup(shape[2], shape[1])
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    conn.send(('ready', os.getpid()))
+    try:
+        while True:
+            try:
+                item = conn.recv()
+            except EOFError:
+                break
+            if item is None:
+                break
+            slot, frame_id = item
+            detections, inference_time = detector.detect(frames[slot])
+            conn.send(('result', frame_id, slot, detections, inference_time))
+    finally:
+        del frames
+        shm.close()
+
+class InferencePool:
+    """
+    多进程推理：采集循环把帧写入共享内存环形缓冲区，N个推理进程各自持有cv2.dnn网络，
+    直接读取槽位中的帧（不经过pickle复制），只通过各自的管道回传帧ID和检测框
+    get() 按帧ID顺序返回结果；每个进程单独占用一个核心，推理不再受主进程GIL限制
+    每个进程有独立的管道（不共享队列锁），帧交给在途最少的进程；进程意外退出时打印错误并跳过
+    分给它但未完成的帧，其余进程不受影响，全部进程都退出后submit()/get()抛出RuntimeError
+    """
+
+    def __init__(self, config_path: str, weights_path: str, names_path: str, workers: int = 2,
+                 width: int = 640, height: int = 480, slots: Optional[int] = None,
+                 confidence_threshold: float = 0.5, nms_threshold: float = 0.4, threads_per_worker: int = 1):
+        """
+        :param config_path: YOLO配置文件路径
+        :param weights_path: YOLO权重文件路径
+        :param names_path: 类别名称文件路径
+        :param workers: 推理进程数
+        :param width: 帧宽度，尺寸不同的帧会被缩放
+        :param height: 帧高度
+        :param slots: 环形缓冲区槽位数，默认为进程数的2倍
+        :param confidence_threshold: 置信度阈值
+        :param nms_threshold: 非极大值抑制阈值
+        :param threads_per_worker: 每个推理进程的OpenCV线程数，避免多进程之间争抢核心
+        """
+        self.config_path = config_path
+        self.weights_path = weights_path
+        self.names_path = names_path
+        self.workers = workers
+        self.shape = (slots or workers * 2, height, width, 3)
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self.threads_per_worker = threads_per_worker
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.crashed = 0
+
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._frames: Optional[np.ndarray] = None
+        self._free: List[int] = []
+        self._processes: List = []
+        self._conns: List = []
+        self._assigned: List[Deque[Tuple[int, int]]] = []  # 每个进程已分配未完成的 (帧ID, 槽位)
+        self._alive: List[bool] = []
+        self._lost: Dict[int, int] = {}                      # 意外退出的进程未完成的帧ID -> 槽位
+        self._capture_times: Dict[int, float] = {}
+        self._done: Dict[int, Tuple[int, List, float]] = {}
+        self._next_id = 1
+        self._held_slot: Optional[int] = None
+
+    def start(self, timeout: float = 60.0) -> bool:
+        """
+        分配共享内存、启动推理进程并等待全部完成模型加载和预热
+        :return: 是否启动成功
+        """
+        try:
+            self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+            self._frames = np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf)
+            self._free = list(range(self.shape[0]))
+
+            # spawn启动：每个进程独立初始化cv2.dnn，避免fork继承父进程的线程状态
+            context = multiprocessing.get_context('spawn')
+            for i in range(self.workers):
+                conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_worker_main, name=f'inference-{i}', daemon=True,
+                    args=(self._shm.name, self.shape, child_conn, self.config_path, self.weights_path,
+                          self.names_path, self.confidence_threshold, self.nms_threshold, self.threads_per_worker))
+                process.start()
+                child_conn.close()
+                self._processes.append(process)
+                self._conns.append(conn)
+                self._assigned.append(deque())
+                self._alive.append(True)
+
+            deadline = time.monotonic() + timeout
+            for conn in self._conns:
+                if not conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise RuntimeError("等待推理进程加载模型超时")
+                if conn.recv()[0] != 'ready':
+                    raise RuntimeError("推理进程加载模型失败")
+            return True
+        except Exception as e:
+            print(f"错误: 无法启动推理进程池: {e}")
+            self.close()
+            return False
+
+    def submit(self, frame, capture_time: Optional[float] = None, block: bool = False) -> Optional[int]:
+        """
+        把帧写入空闲槽位并交给推理进程
+        :param frame: BGR图像
+        :param capture_time: 采集时间（time.perf_counter()），用于计算端到端延迟
+        :param block: 没有空闲槽位时是否等待推理进程完成；不等待或所有槽位都在等待get()时丢弃该帧
+        :return: 帧ID，丢弃时返回None
+        """
+        self._collect()
+        while not self._free:
+            # 已完成但未被get()取走的帧仍占用槽位，只有还有帧在推理时等待才有意义
+            if not block or self.submitted == self.completed:
+                self.dropped += 1
+                return None
+            self._collect(timeout=0.1)
+
+        slot = self._free.pop()
+        height, width = self.shape[1:3]
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        self._frames[slot] = frame
+
+        self.submitted += 1
+        frame_id = self.submitted
+        self._capture_times[frame_id] = time.perf_counter() if capture_time is None else capture_time
+        worker = min((i for i, alive in enumerate(self._alive) if alive), key=lambda i: len(self._assigned[i]))
+        self._assigned[worker].append((frame_id, slot))
+        try:
+            self._conns[worker].send((slot, frame_id))
+        except OSError:
+            # 进程刚好退出：该帧随它的其他未完成帧一起跳过
+            self._worker_died(worker)
+        return frame_id
+
+    def get(self, timeout: Optional[float] = 0.0) -> Optional[FramePacket]:
+        """
+        按提交顺序取出下一帧的结果
+        返回的frame是共享内存槽位的视图，在下一次调用get()之前有效，可以直接在上面绘制
+        :param timeout: 等待时间（秒），None表示一直等待
+        :return: FramePacket，下一帧尚未完成时返回None
+        """
+        if self._held_slot is not None:
+            self._free.append(self._held_slot)
+            self._held_slot = None
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._collect()
+        while self._next_id not in self._done:
+            if self._next_id in self._lost:
+                # 处理该帧的进程已退出，跳过，后面的帧不再被阻塞
+                self._free.append(self._lost.pop(self._next_id))
+                self._capture_times.pop(self._next_id, None)
+                self._next_id += 1
+                continue
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._collect(timeout=0.1 if remaining is None else min(remaining, 0.1))
+
+        frame_id = self._next_id
+        self._next_id += 1
+        slot, detections, inference_time = self._done.pop(frame_id)
+        self._held_slot = slot
+        return FramePacket(frame_id, self._frames[slot], self._capture_times.pop(frame_id),
+                           detections, inference_time)
+
+    def pending(self) -> int:
+        """已提交但尚未通过get()取走的帧数"""
+        return self.submitted - self._next_id + 1
+
+    def close(self, timeout: float = 5.0):
+        """停止推理进程并释放共享内存"""
+        for conn, alive in zip(self._conns, self._alive):
+            if alive:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            while process.is_alive() and time.monotonic() < deadline:
+                process.join(0.1)
+            if process.is_alive():
+                process.terminate()
+            process.join(1.0)
+        for conn in self._conns:
+            conn.close()
+        self._processes = []
+        self._conns = []
+        self._assigned = []
+        self._alive = []
+        self._frames = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _collect(self, timeout: Optional[float] = None):
+        """接收推理进程回传的结果，先放入重排缓冲区；发现退出的进程时跳过它未完成的帧"""
+        conns = [conn for conn, alive in zip(self._conns, self._alive) if alive]
+        if not self._conns:
+            return
+        if not conns:
+            raise RuntimeError("全部推理进程已退出")
+        while True:
+            ready = wait(conns, 0 if timeout is None else timeout)
+            if not ready:
+                return
+            for conn in ready:
+                worker = self._conns.index(conn)
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_died(worker)
+                    conns.remove(conn)
+                    continue
+                if message[0] == 'result':
+                    _, frame_id, slot, detections, inference_time = message
+                    self._assigned[worker].popleft()
+                    self._done[frame_id] = (slot, detections, inference_time)
+                    self.completed += 1
+            if not conns:
+                raise RuntimeError("全部推理进程已退出")
+            timeout = None
+
+    def _worker_died(self, worker: int):
+        """推理进程意外退出：打印错误，分给它但未完成的帧按丢弃处理"""
+        if not self._alive[worker]:
+            return
+        self._alive[worker] = False
+        self.crashed += 1
+        process = self._processes[worker]
+        process.join(0.1)
+        lost = self._assigned[worker]
+        print(f"错误: 推理进程{process.name}（pid {process.pid}）意外退出，退出码{process.exitcode}，"
+              f"跳过{len(lost)}帧")
+        for frame_id, slot in lost:
+            self._lost[frame_id] = slot
+            self.completed += 1
+            self.dropped += 1
+        lost.clear()
+        if not any(self._alive):
+            raise RuntimeError("全部推理进程已退出")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口链路建立：在候选波特率上探测开发板，选出能通信的最高波特率，
+再测量实际吞吐量（字节/秒）和往返延迟，结果写入JSON供发送方按真实链路容量控制发送速率
+"""
+
+import os
+import json
+import time
+import argparse
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import serial
+
+from protocol import FRAME_ACK, FrameEncoder
+
+# 从高到低尝试；固件Serial_Init默认9600，PC端各工具默认115200
+BAUD_CANDIDATES = (921600, 460800, 230400, 115200, 57600, 38400, 19200, 9600)
+DEFAULT_PROFILE_PATH = 'link_profile.json'
+
+FIRMWARE_ECHO = 'echo'        # Src/main.c：原样回显
+FIRMWARE_COMMAND = 'command'  # 单字符命令协议：无效命令回复ERR
+FIRMWARE_BINARY = 'binary'    # 二进制检测帧协议：有效帧回复ACK
+
+# 不是有效命令的探测字节：回显固件原样返回，命令固件回复ERR，不会改变开发板的LED状态
+PROBE = b'?~'
+
+@dataclass
+class LinkProfile:
+    """一个串口的链路测量结果"""
+    port: str
+    baudrate: int
+    firmware: str
+    rtt_p50_ms: float
+    rtt_p95_ms: float
+    bytes_per_s: float      # PC到开发板实际被处理的字节速率
+    rx_bytes_per_s: float   # 同时段开发板到PC的应答字节速率
+    messages_per_s: float   # 每秒完成的探测往返数（命令固件为命令数，二进制固件为帧数）
+    loss: float             # 吞吐测试中未收到应答的比例
+    measured_at: float
+
+    @property
+    def nominal_bytes_per_s(self) -> float:
+        """8N1下的理论字节速率"""
+        return self.baudrate / 10.0
+
+    def budget(self, message_bytes: int, utilization: float = 0.8) -> float:
+        """
+        按实测容量计算某种消息的发送速率上限
+        :param message_bytes: 单条消息字节数
+        :param utilization: 允许占用的链路比例
+        :return: 每秒最多发送的消息数
+        """
+        return self.bytes_per_s * utilization / max(1, message_bytes)
+
+def find_available_ports() -> List[str]:
+    """查找可用的串口"""
+    import serial.tools.list_ports
+
+    ports = []
+    for port in serial.tools.list_ports.comports():
+        ports.append(port.device)
+
+    return ports
+
+def _binary_probe() -> bytes:
+    """不含对象的检测帧，固件收到后回复ACK（相当于发送'无物体'）"""
+    return bytes(FrameEncoder().encode(0x5A, []))
+
+def _probe_data(firmware: str) -> bytes:
+    return _binary_probe() if firmware == FIRMWARE_BINARY else PROBE
+
+def _reply_unit(firmware: str, data: bytes):
+    """
+    一条探测消息对应的应答片段及数量
+    :return: (可计数的应答片段, 每条消息的应答片段数)
+    """
+    if firmware == FIRMWARE_ECHO:
+        return data, 1
+    if firmware == FIRMWARE_BINARY:
+        return bytes([FRAME_ACK, data[3]]), 1
+    # 命令固件对每个无效字节回复一行ERR
+    return b'ERR', len(data)
+
+def _exchange(ser: serial.Serial, firmware: str, timeout: float) -> int:
+    """
+    发送一条探测消息，等待对应固件的完整应答
+    :return: 应答字节数，没有完整应答时返回0
+    """
+    data = _probe_data(firmware)
+    unit, units = _reply_unit(firmware, data)
+    ser.write(data)
+    deadline = time.perf_counter() + timeout
+    received = bytearray()
+    while time.perf_counter() < deadline:
+        received.extend(ser.read(ser.in_waiting or 1))
+        # 回显固件要求逐字节一致，波特率不匹配时收到的是乱码
+        if firmware == FIRMWARE_ECHO and received.startswith(unit):
+            return len(received)
+        if firmware != FIRMWARE_ECHO and received.count(unit) >= units and received.endswith(
+                b'\n' if firmware == FIRMWARE_COMMAND else unit):
+            return len(received)
+    return 0
+
+def probe_baud(port: str, baudrate: int, timeout: float = 0.2, attempts: int = 2) -> Optional[str]:
+    """
+    在指定波特率下确认开发板能正确应答
+    :return: 固件类型（见FIRMWARE_*），波特率不匹配或无应答时返回None
+    """
+    try:
+        with serial.Serial(port, baudrate, timeout=0.02) as ser:
+            for _ in range(attempts):
+                for firmware in (FIRMWARE_ECHO, FIRMWARE_COMMAND, FIRMWARE_BINARY):
+                    ser.reset_input_buffer()
+                    if _exchange(ser, firmware, timeout):
+                        return firmware
+                    # 丢弃迟到的应答，避免影响下一种探测
+                    time.sleep(0.02)
+    except (serial.SerialException, OSError) as e:
+        print(f"警告: 无法在{baudrate}波特率下打开串口{port}: {e}")
+    return None
+
+def measure_link(port: str, baudrate: int, firmware: str, round_trips: int = 20,
+                 burst_seconds: float = 0.5, timeout: float = 1.0) -> Optional[LinkProfile]:
+    """
+    测量链路的往返延迟和吞吐量
+    :param round_trips: 逐条往返测量的次数
+    :param burst_seconds: 吞吐测试按理论速率发送约这么长时间的数据
+    :return: LinkProfile，测量失败时返回None
+    """
+    data = _probe_data(firmware)
+    try:
+        with serial.Serial(port, baudrate, timeout=0.02) as ser:
+            ser.reset_input_buffer()
+            rtts = []
+            reply_size = len(data)
+            for _ in range(round_trips):
+                start = time.perf_counter()
+                size = _exchange(ser, firmware, timeout)
+                if size:
+                    rtts.append(time.perf_counter() - start)
+                    reply_size = max(reply_size, size)
+            if not rtts:
+                print(f"错误: 串口{port}在{baudrate}波特率下没有有效往返")
+                return None
+
+            # 吞吐测试：连续发送多条探测消息，计算全部应答到达的速率；
+            # 命令固件的应答比命令长，按较长的一方估算约burst_seconds能完成的消息数
+            time.sleep(0.05)
+            ser.reset_input_buffer()
+            count = max(4, int(baudrate / 10.0 * burst_seconds / reply_size))
+            unit, units = _reply_unit(firmware, data)
+            start = time.perf_counter()
+            ser.write(data * count)
+            received = bytearray()
+            found = scan = 0
+            deadline = start + burst_seconds * 4 + timeout
+            last_arrival = start
+            while time.perf_counter() < deadline and found < count * units:
+                chunk = ser.read(ser.in_waiting or 1)
+                if not chunk:
+                    if time.perf_counter() - last_arrival > timeout:
+                        break
+                    continue
+                received.extend(chunk)
+                last_arrival = time.perf_counter()
+                # 增量查找应答片段，只扫描新到达的部分
+                while True:
+                    index = received.find(unit, scan)
+                    if index < 0:
+                        scan = max(scan, len(received) - len(unit) + 1)
+                        break
+                    found += 1
+                    scan = index + len(unit)
+            replies = min(count, found // units)
+            elapsed = max(last_arrival - start, 1e-6)
+    except (serial.SerialException, OSError) as e:
+        print(f"错误: 测量串口{port}时出错: {e}")
+        return None
+
+    rtts.sort()
+    return LinkProfile(
+        port=port,
+        baudrate=baudrate,
+        firmware=firmware,
+        rtt_p50_ms=round(rtts[len(rtts) // 2] * 1000, 3),
+        rtt_p95_ms=round(rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))] * 1000, 3),
+        bytes_per_s=round(replies * len(data) / elapsed, 1),
+        rx_bytes_per_s=round(len(received) / elapsed, 1),
+        messages_per_s=round(replies / elapsed, 1),
+        loss=round(1 - replies / count, 4),
+        measured_at=time.time(),
+    )
+
+def negotiate(port: str, candidates: Sequence[int] = BAUD_CANDIDATES) -> Optional[LinkProfile]:
+    """
+    从高到低探测候选波特率，选出第一个能正确应答的并测量链路
+    :return: LinkProfile，所有波特率都失败时返回None
+    """
+    for baudrate in sorted(candidates, reverse=True):
+        firmware = probe_baud(port, baudrate)
+        if firmware is None:
+            continue
+        print(f"串口{port}: {baudrate}波特率应答正常（{firmware}固件），开始测量链路")
+        profile = measure_link(port, baudrate, firmware)
+        if profile is not None:
+            return profile
+    print(f"错误: 串口{port}在所有候选波特率下均无有效应答")
+    return None
+
+def load_link_profiles(path: str = DEFAULT_PROFILE_PATH) -> Dict[str, LinkProfile]:
+    """读取已记录的链路测量结果，文件不存在或损坏时返回空字典"""
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {port: LinkProfile(**item) for port, item in json.load(f).items()}
+    except (OSError, ValueError, TypeError) as e:
+        print(f"警告: 无法读取链路记录{path}: {e}")
+        return {}
+
+def load_link_profile(port: str, path: str = DEFAULT_PROFILE_PATH) -> Optional[LinkProfile]:
+    return load_link_profiles(path).get(port)
+
+def save_link_profiles(profiles: Sequence[LinkProfile], path: str = DEFAULT_PROFILE_PATH):
+    """按端口合并写入链路测量结果（先写临时文件再替换）"""
+    records = {port: asdict(profile) for port, profile in load_link_profiles(path).items()}
+    records.update({profile.port: asdict(profile) for profile in profiles})
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def resolve_link(port: str, baudrate: int, path: str = DEFAULT_PROFILE_PATH) -> Optional[LinkProfile]:
+    """
+    发送方使用的链路信息
+    :param baudrate: 0表示自动：优先使用已记录的结果，没有记录时协商并记录
+    :return: LinkProfile；指定了波特率时只返回该波特率下的记录，没有记录时返回None
+    """
+    profile = load_link_profile(port, path)
+    if baudrate:
+        return profile if profile is not None and profile.baudrate == baudrate else None
+    if profile is None:
+        profile = negotiate(port)
+        if profile is not None:
+            save_link_profiles([profile], path)
+    return profile
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='串口波特率协商与链路容量测量')
+    parser.add_argument('--ports', nargs='*', default=None, help='要测量的串口，默认为全部可用串口')
+    parser.add_argument('--bauds', type=int, nargs='*', default=list(BAUD_CANDIDATES), help='候选波特率')
+    parser.add_argument('--output', default=DEFAULT_PROFILE_PATH, help='链路记录JSON文件')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    ports = args.ports or find_available_ports()
+    if not ports:
+        print("未找到可用串口，请检查设备连接")
+        return
+
+    profiles = []
+    for port in ports:
+        profile = negotiate(port, args.bauds)
+        if profile is None:
+            continue
+        profiles.append(profile)
+        print(f"串口{port}: {profile.baudrate}波特率, 实测{profile.bytes_per_s:.0f}字节/秒 "
+              f"(理论{profile.nominal_bytes_per_s:.0f}), 应答{profile.rx_bytes_per_s:.0f}字节/秒, "
+              f"{profile.messages_per_s:.0f}条/秒, "
+              f"往返延迟 p50={profile.rtt_p50_ms:.2f}ms p95={profile.rtt_p95_ms:.2f}ms, 丢失{profile.loss*100:.1f}%")
+    if profiles:
+        save_link_profiles(profiles, args.output)
+        print(f"链路记录已写入: {args.output}")
+
+if __name__ == "__main__":
+    main()
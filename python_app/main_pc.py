@@ -1,36 +1,47 @@
 import cv2
+import time
+import argparse
+from display import Display
 
 def main():
+    parser = argparse.ArgumentParser(description='camera viewer')
+    parser.add_argument('--camera', type=int, default=0, help='camera index')
+    parser.add_argument('--headless', action='store_true', help='read frames without a window, stop with SIGINT/SIGTERM')
+    args = parser.parse_args()
+
     # 初始化摄像头，使用默认摄像头（通常为0）
-    cap = cv2.VideoCapture(0)
-    
+    cap = cv2.VideoCapture(args.camera)
+
     # 检查摄像头是否成功打开
     if not cap.isOpened():
         print("error: cannot open camera")
         return
-    
-    # 创建一个窗口用于显示视频
-    cv2.namedWindow("video", cv2.WINDOW_NORMAL)
-    
-    while True:
+
+    # 创建一个窗口用于显示视频（headless模式下不创建）
+    display = Display("video", headless=args.headless)
+
+    frame_count = 0
+    start_time = time.time()
+    while not display.stopped:
         # 读取一帧视频
         ret, frame = cap.read()
-        
+
         # 检查是否成功读取帧
         if not ret:
             print("error: cannot get video frame")
             break
-        
-        # 显示视频帧
-        cv2.imshow("video", frame)
-        
-        # 按下'q'键退出循环
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-    
+        frame_count += 1
+
+        # 显示视频帧，按下'q'键退出循环
+        display.show(frame)
+
     # 释放资源
     cap.release()
-    cv2.destroyAllWindows()
+    display.close()
+
+    elapsed_time = time.time() - start_time
+    if elapsed_time > 0 and frame_count > 0:
+        print(f"frames: {frame_count}, fps: {frame_count/elapsed_time:.2f}")
 
 if __name__ == "__main__":
     main()
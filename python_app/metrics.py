@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 延迟直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class _Metric:
+    """带标签的指标基类，每组标签值对应一个样本"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = '') -> str:
+        parts = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+
+class Counter(_Metric):
+    """只增不减的计数"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        # 无标签的计数从0开始导出，便于监控端区分"未发生"和"未上报"
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, '', value) for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, '', value) for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    """分桶直方图，observe只做一次二分查找和计数"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def quantile(self, q: float, **labels) -> float:
+        """按分桶线性插值估计分位数，超出最大分桶时返回最大分桶上界"""
+        entry = self._values.get(self._key(labels))
+        if entry is None or entry[2] == 0:
+            return 0.0
+        counts, _, total = entry
+        target = q * total
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets + (self.buckets[-1],), counts):
+            if count and cumulative + count >= target:
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = [(key, list(counts), total_sum, count) for key, (counts, total_sum, count) in self._values.items()]
+        for key, counts, total_sum, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                result.append((f'{self.name}_bucket', key, f'le="{bound}"', cumulative))
+            result.append((f'{self.name}_bucket', key, 'le="+Inf"', count))
+            result.append((f'{self.name}_sum', key, '', total_sum))
+            result.append((f'{self.name}_count', key, '', count))
+        return result
+
+class RateMeter(_Metric):
+    """滑动窗口速率（如最近5秒的FPS），只统计窗口内的事件，不受程序运行时长影响"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), window: float = 5.0):
+        super().__init__(name, help_text, labelnames)
+        self.window = window
+        self._events: Dict[Tuple[str, ...], deque] = {}
+
+    def mark(self, now: Optional[float] = None, **labels):
+        now = time.monotonic() if now is None else now
+        key = self._key(labels)
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                events = self._events[key] = deque()
+            events.append(now)
+            self._trim(events, now)
+
+    def rate(self, now: Optional[float] = None, **labels) -> float:
+        """窗口内的平均速率（次/秒）；运行时间不足一个窗口时按实际跨度计算"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = self._events.get(self._key(labels))
+            if not events:
+                return 0.0
+            self._trim(events, now)
+            if len(events) < 2:
+                return 0.0
+            span = min(self.window, now - events[0])
+            return (len(events) - 1) / span if span > 0 else 0.0
+
+    def samples(self):
+        return [(self.name, key, '', self.rate(**dict(zip(self.labelnames, key))))
+                for key in list(self._events)]
+
+    def _trim(self, events: deque, now: float):
+        while events and events[0] < now - self.window:
+            events.popleft()
+
+class MetricsRegistry:
+    """指标注册表：按名称取得或创建指标，导出Prometheus文本格式或JSON快照"""
+
+    def __init__(self, prefix: str = 'detector_'):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = '', labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str = '', labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str = '', labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def rate(self, name: str, help_text: str = '', labelnames: Sequence[str] = (), window: float = 5.0) -> RateMeter:
+        return self._get(RateMeter, name, help_text, labelnames, window=window)
+
+    def render_prometheus(self) -> str:
+        """Prometheus文本格式（version 0.0.4）"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f'{sample_name}{metric._label_text(key, extra)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """JSON友好的快照；直方图给出计数、均值和估计的p50/p95/p99（毫秒）"""
+        result = {'timestamp': time.time()}
+        for metric in list(self._metrics.values()):
+            values = []
+            if isinstance(metric, Histogram):
+                for key, (_, total_sum, count) in list(metric._values.items()):
+                    labels = dict(zip(metric.labelnames, key))
+                    values.append({
+                        'labels': labels, 'count': count,
+                        'mean_ms': total_sum / count * 1000 if count else 0.0,
+                        'p50_ms': metric.quantile(0.5, **labels) * 1000,
+                        'p95_ms': metric.quantile(0.95, **labels) * 1000,
+                        'p99_ms': metric.quantile(0.99, **labels) * 1000,
+                    })
+            else:
+                for _, key, _, value in metric.samples():
+                    values.append({'labels': dict(zip(metric.labelnames, key)), 'value': value})
+            result[metric.name] = values
+        return result
+
+    def _get(self, cls, name, help_text, labelnames, **kwargs):
+        full_name = self.prefix + name
+        metric = self._metrics.get(full_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(full_name)
+                if metric is None:
+                    metric = self._metrics[full_name] = cls(full_name, help_text, labelnames, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"指标 {full_name} 已注册为 {metric.kind}")
+        return metric
+
+# 进程内默认注册表，各模块直接记录到这里
+REGISTRY = MetricsRegistry()
+
+class MetricsServer:
+    """本地HTTP端点：/metrics 输出Prometheus文本，/metrics.json 输出JSON快照"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, port: int = 9108, host: str = '127.0.0.1'):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                elif self.path.startswith('/metrics'):
+                    body = registry.render_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"错误: 无法启动指标HTTP服务: {e}")
+            return False
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+        self._thread.start()
+        print(f"指标端点: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class JsonDumper:
+    """后台线程按固定间隔把JSON快照写入文件（先写临时文件再替换，读取方不会看到半截内容）"""
+
+    def __init__(self, path: str, registry: MetricsRegistry = REGISTRY, interval: float = 10.0):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-dump', daemon=True)
+
+    def start(self) -> bool:
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(self.interval + 1.0)
+        self.dump()
+
+    def dump(self):
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"警告: 无法写入指标文件: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+def start_exporters(port: int = 0, json_path: Optional[str] = None, interval: float = 10.0,
+                    registry: MetricsRegistry = REGISTRY) -> List:
+    """
+    按参数启动HTTP端点和JSON定时导出
+    :param port: HTTP端口，0表示不启动
+    :param json_path: JSON文件路径，None表示不导出
+    :return: 已启动的导出器列表，退出时传给stop_exporters
+    """
+    exporters = []
+    if port:
+        server = MetricsServer(registry, port)
+        if server.start():
+            exporters.append(server)
+    if json_path:
+        dumper = JsonDumper(json_path, registry, interval)
+        dumper.start()
+        exporters.append(dumper)
+    return exporters
+
+def stop_exporters(exporters: List):
+    """停止导出器，JSON导出在停止时会再写一次最终快照"""
+    for exporter in exporters:
+        exporter.stop()
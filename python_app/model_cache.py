@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from detector import YoloDetector, load_yolo_model
+
+class ModelCache:
+    """
+    模型元数据缓存
+    以配置、权重、类别文件的内容哈希为键，缓存输出层名称和类别列表，
+    文件内容哈希本身按 (大小, 修改时间) 记忆，未变化的文件不会被重新读取
+    """
+
+    FINGERPRINT_FILE = 'fingerprints.json'
+
+    def __init__(self, cache_dir: str = '.model_cache'):
+        self.cache_dir = cache_dir
+        self._fingerprints: Optional[Dict[str, Dict]] = None
+
+    def fingerprint(self, path: str) -> str:
+        """返回文件内容的SHA1，文件大小和修改时间未变时直接使用缓存值"""
+        fingerprints = self._load_fingerprints()
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = fingerprints.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha1']
+
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        fingerprints[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1.hexdigest()}
+        self._write_json(self.FINGERPRINT_FILE, fingerprints)
+        return fingerprints[key]['sha1']
+
+    def model_key(self, config_path: str, weights_path: str, names_path: str) -> str:
+        """三个模型文件共同决定的缓存键"""
+        combined = hashlib.sha1()
+        for path in (config_path, weights_path, names_path):
+            combined.update(self.fingerprint(path).encode())
+        return combined.hexdigest()
+
+    def load(self, config_path: str, weights_path: str,
+             names_path: str) -> Tuple[Optional[object], Optional[List[str]], Optional[List[str]]]:
+        """
+        加载YOLO模型，命中缓存时跳过输出层推导和类别文件读取
+        :return: (net, output_layers, classes)，失败时为 (None, None, None)
+        """
+        try:
+            key = self.model_key(config_path, weights_path, names_path)
+        except OSError as e:
+            print(f"警告: 无法计算模型文件哈希，不使用缓存: {e}")
+            return load_yolo_model(config_path, weights_path, names_path)
+
+        meta = self._read_json(f"{key}.json")
+        if meta is not None:
+            try:
+                net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+                return net, meta['output_layers'], meta['classes']
+            except Exception as e:
+                print(f"错误: 无法加载YOLO模型: {e}")
+                return None, None, None
+
+        net, output_layers, classes = load_yolo_model(config_path, weights_path, names_path)
+        if net is not None:
+            self._write_json(f"{key}.json", {
+                'config': os.path.abspath(config_path),
+                'weights': os.path.abspath(weights_path),
+                'names': os.path.abspath(names_path),
+                'output_layers': output_layers,
+                'classes': classes,
+            })
+        return net, output_layers, classes
+
+    def _load_fingerprints(self) -> Dict[str, Dict]:
+        if self._fingerprints is None:
+            self._fingerprints = self._read_json(self.FINGERPRINT_FILE) or {}
+        return self._fingerprints
+
+    def _read_json(self, name: str) -> Optional[Dict]:
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"警告: 模型缓存文件损坏，已忽略: {e}")
+            return None
+
+    def _write_json(self, name: str, data: Dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, name)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"警告: 无法写入模型缓存: {e}")
+
+def load_detector(config_path: str, weights_path: str, names_path: str,
+                  cache_dir: Optional[str] = '.model_cache', warmup: bool = True,
+                  **kwargs) -> Optional[YoloDetector]:
+    """
+    加载检测器并在打开摄像头之前完成预热，打印各步骤耗时
+    :param cache_dir: 模型缓存目录，None表示不使用缓存
+    :param warmup: 是否执行预热
+    :return: 检测器，加载失败返回None
+    """
+    start_time = time.perf_counter()
+    cache = ModelCache(cache_dir) if cache_dir else None
+    detector = YoloDetector.from_files(config_path, weights_path, names_path, cache=cache, **kwargs)
+    if detector is None:
+        return None
+    load_time = time.perf_counter() - start_time
+
+    warmup_time = detector.warmup() if warmup else 0.0
+    print(f"模型加载: {load_time*1000:.1f}ms, 预热: {warmup_time*1000:.1f}ms")
+    return detector
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    运动门控：在缩小的灰度图上与上次推理时的参考帧做差分，
+    画面无变化时跳过检测、复用上次结果
+    与参考帧（而非上一帧）比较，缓慢的累积变化最终也会触发检测
+    """
+
+    def __init__(self, width: int = 160, threshold: int = 25, min_area_ratio: float = 0.002,
+                 max_skip: int = 150, roi_padding: float = 0.1):
+        """
+        :param width: 差分图宽度（像素），高度按比例缩放
+        :param threshold: 像素灰度差阈值
+        :param min_area_ratio: 变化像素占比超过该值视为有运动
+        :param max_skip: 连续跳过的最大帧数，到达后强制检测一次（0表示不限制）
+        :param roi_padding: 运动区域向外扩展的比例
+        """
+        self.width = width
+        self.threshold = threshold
+        self.min_area_ratio = min_area_ratio
+        self.max_skip = max_skip
+        self.roi_padding = roi_padding
+
+        self.frames = 0
+        self.skipped = 0
+        self.gate_time = 0.0
+        self.inference_time = 0.0
+        self.inferred = 0
+
+        self._reference: Optional[np.ndarray] = None
+        self._consecutive_skips = 0
+
+    def check(self, frame) -> Tuple[bool, Optional[Tuple[int, int, int, int]]]:
+        """
+        判断当前帧相对参考帧是否有变化
+        :return: (是否需要检测, 运动区域 (x, y, w, h)，原图坐标；首帧或强制检测时为None)
+        """
+        start_time = time.perf_counter()
+        self.frames += 1
+        height, width = frame.shape[:2]
+        scale = self.width / float(width)
+        small = cv2.resize(frame, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        changed, roi = True, None
+        if self._reference is not None and self._reference.shape == small.shape:
+            _, mask = cv2.threshold(cv2.absdiff(small, self._reference), self.threshold, 255, cv2.THRESH_BINARY)
+            changed = cv2.countNonZero(mask) > self.min_area_ratio * mask.size
+            if changed:
+                roi = self._scale_roi(cv2.boundingRect(cv2.findNonZero(mask)), scale, width, height)
+            elif self.max_skip and self._consecutive_skips >= self.max_skip:
+                changed = True
+
+        if changed:
+            self._reference = small
+            self._consecutive_skips = 0
+        else:
+            self._consecutive_skips += 1
+            self.skipped += 1
+        self.gate_time += time.perf_counter() - start_time
+        return changed, roi
+
+    def record_inference(self, elapsed: float):
+        """记录一次实际检测的耗时，用于估算跳过检测节省的CPU时间"""
+        self.inferred += 1
+        self.inference_time += elapsed
+
+    def metrics(self) -> Dict[str, float]:
+        """门控命中率与节省的CPU时间估算"""
+        avg_inference = self.inference_time / self.inferred if self.inferred else 0.0
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'hit_rate': self.skipped / self.frames if self.frames else 0.0,
+            'gate_ms_avg': self.gate_time / self.frames * 1000 if self.frames else 0.0,
+            'inference_ms_avg': avg_inference * 1000,
+            'cpu_saved_s': max(0.0, self.skipped * avg_inference - self.gate_time),
+        }
+
+    def _scale_roi(self, rect, scale, width, height):
+        """将差分图上的矩形映射回原图并加边距"""
+        x, y, w, h = rect
+        pad_x, pad_y = w * self.roi_padding, h * self.roi_padding
+        x0 = max(0, int((x - pad_x) / scale))
+        y0 = max(0, int((y - pad_y) / scale))
+        x1 = min(width, int((x + w + pad_x) / scale) + 1)
+        y1 = min(height, int((y + h + pad_y) / scale) + 1)
+        return x0, y0, x1 - x0, y1 - y0
+
+class GatedDetector:
+    """
+    在检测函数前加运动门控，接口与YoloDetector.detect一致
+    启用ROI时只对运动区域做检测，区域外沿用上次的检测框
+    """
+
+    def __init__(self, detect: Callable, gate: MotionGate, use_roi: bool = False, max_roi_ratio: float = 0.5):
+        """
+        :param detect: 检测函数，接收帧，返回 (detections, inference_time)
+        :param gate: 运动门控
+        :param use_roi: 是否只对运动区域检测
+        :param max_roi_ratio: 运动区域面积超过整帧该比例时改为整帧检测
+        """
+        self.detect_fn = detect
+        self.gate = gate
+        self.use_roi = use_roi
+        self.max_roi_ratio = max_roi_ratio
+        self._last = ([], 0.0)
+
+    def detect(self, frame):
+        changed, roi = self.gate.check(frame)
+        if not changed:
+            return self._last[0], 0.0
+
+        start_time = time.perf_counter()
+        height, width = frame.shape[:2]
+        if self.use_roi and roi is not None and roi[2] * roi[3] < self.max_roi_ratio * width * height:
+            result = self._detect_roi(frame, roi)
+        else:
+            result = self.detect_fn(frame)
+        self.gate.record_inference(time.perf_counter() - start_time)
+        self._last = result
+        return result
+
+    def _detect_roi(self, frame, roi):
+        """检测运动区域，并与区域外的旧检测框合并"""
+        rx, ry, rw, rh = roi
+        detections, inference_time = self.detect_fn(frame[ry:ry + rh, rx:rx + rw])
+        merged = [(x + rx, y + ry, w, h, label, confidence) for x, y, w, h, label, confidence in detections]
+        for det in self._last[0]:
+            x, y, w, h = det[:4]
+            outside = x + w <= rx or x >= rx + rw or y + h <= ry or y >= ry + rh
+            if outside:
+                merged.append(det)
+        return merged, inference_time
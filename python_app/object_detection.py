@@ -4,7 +4,23 @@ import os
 import sys
 import time
 import argparse
-from datetime import datetime
+import threading
+from model_cache import load_detector
+from detector import load_class_names
+from tracking import KeyframeTracker
+from motion_gate import GatedDetector, MotionGate
+from snapshot_writer import DROP_POLICIES, DROP_OLDEST, SnapshotWriter
+from recorder import VideoRecorder
+from detection_log import DetectionLog
+from pipeline import CaptureThread, InferenceThread, LatestQueue, LatencyStats
+from inference_pool import InferencePool
+from metrics import REGISTRY, start_exporters, stop_exporters
+from display import Display
+from preview import PreviewServer
+
+FRAME_RATE = REGISTRY.rate('fps', '最近5秒的显示帧率')
+STAGE_SECONDS = REGISTRY.histogram('stage_seconds', '各阶段耗时（秒）', ('stage',))
+CAMERA_RECONNECTS = REGISTRY.counter('camera_reconnects_total', '摄像头重连次数')
 
 def parse_arguments():
     """解析命令行参数"""
@@ -12,11 +28,43 @@ def parse_arguments():
     parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
     parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径')
     parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--cache-dir', default='.model_cache', help='模型缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用模型缓存')
     parser.add_argument('--camera', type=int, default=0, help='摄像头索引')
     parser.add_argument('--confidence', type=float, default=0.5, help='置信度阈值')
     parser.add_argument('--nms', type=float, default=0.4, help='非极大值抑制阈值')
     parser.add_argument('--save', action='store_true', help='保存检测结果')
     parser.add_argument('--output', default='output', help='输出文件夹')
+    parser.add_argument('--save-workers', type=int, default=2, help='后台保存线程数')
+    parser.add_argument('--save-queue', type=int, default=16, help='后台保存队列长度')
+    parser.add_argument('--save-policy', choices=DROP_POLICIES, default=DROP_OLDEST, help='保存队列已满时的处理策略')
+    parser.add_argument('--record', action='store_true', help='连续录制标注后的视频（独立编码进程）')
+    parser.add_argument('--record-dir', default='recordings', help='录像文件夹')
+    parser.add_argument('--segment-seconds', type=float, default=300, help='录像分段时长（秒），0表示不按时长分段')
+    parser.add_argument('--segment-mb', type=float, default=0, help='录像分段大小上限（MB），0表示不按大小分段')
+    parser.add_argument('--record-fps', type=float, default=0, help='录像帧率（0表示使用摄像头帧率）')
+    parser.add_argument('--detection-log', default=None,
+                        help='列式检测日志目录，逐帧记录检测结果供离线查询（见detection_log.py）')
+    parser.add_argument('--detection-log-frames', type=int, default=300, help='检测日志每块的帧数')
+    parser.add_argument('--metrics-port', type=int, default=0, help='Prometheus指标HTTP端口（0表示关闭）')
+    parser.add_argument('--metrics-json', default=None, help='定期写入JSON指标快照的文件路径')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='JSON指标快照的写入间隔（秒）')
+    parser.add_argument('--preview-port', type=int, default=0,
+                        help='本机MJPEG预览HTTP端口（0表示关闭），只在有客户端连接时编码')
+    parser.add_argument('--preview-fps', type=float, default=5.0, help='预览帧率上限')
+    parser.add_argument('--preview-width', type=int, default=480, help='预览画面宽度')
+    parser.add_argument('--preview-quality', type=int, default=70, help='预览JPEG质量')
+    parser.add_argument('--headless', action='store_true',
+                        help='无窗口模式：不创建窗口、不显示画面，通过SIGINT/SIGTERM退出')
+    parser.add_argument('--pipeline', action='store_true', help='启用采集/推理/显示流水线模式')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='多进程推理：N个推理进程通过共享内存读取帧（0表示关闭，不能与关键帧/运动门控同时使用）')
+    parser.add_argument('--keyframe', type=int, default=0,
+                        help='关键帧模式：每N帧运行一次检测，中间帧用光流传播检测框（0表示关闭）')
+    parser.add_argument('--fixed-interval', action='store_true', help='关键帧间隔固定为N，不自适应调整')
+    parser.add_argument('--motion-gate', action='store_true', help='画面无变化时跳过检测，复用上次结果')
+    parser.add_argument('--motion-threshold', type=int, default=25, help='运动门控的像素灰度差阈值')
+    parser.add_argument('--motion-roi', action='store_true', help='只对运动区域做检测（不能与关键帧模式同时使用）')
     return parser.parse_args()
 
 def check_files_exist(files):
@@ -27,34 +75,6 @@ def check_files_exist(files):
             return False
     return True
 
-def load_yolo_model(config_path, weights_path, names_path):
-    """加载YOLO模型"""
-    try:
-        # 加载YOLO模型
-        net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
-        
-        # 获取输出层名称
-        layer_names = net.getLayerNames()
-        try:
-            # OpenCV 4.5.4及更高版本
-            output_layers = [layer_names[i-1] for i in net.getUnconnectedOutLayers()]
-        except:
-            # 旧版本OpenCV
-            output_layers = [layer_names[i[0]-1] for i in net.getUnconnectedOutLayers()]
-        
-        # 加载类别名称
-        try:
-            with open(names_path, 'r') as f:
-                classes = [line.strip() for line in f.readlines()]
-        except Exception as e:
-            print(f"错误: 无法读取类别文件: {e}")
-            return None, None, None
-        
-        return net, output_layers, classes
-    except Exception as e:
-        print(f"错误: 无法加载YOLO模型: {e}")
-        return None, None, None
-
 def initialize_camera(camera_index):
     """初始化摄像头"""
     try:
@@ -67,72 +87,43 @@ def initialize_camera(camera_index):
         print(f"错误: 初始化摄像头时出错: {e}")
         return None
 
-def process_frame(frame, net, output_layers, classes, confidence_threshold, nms_threshold):
-    """处理单帧图像并检测物体"""
-    try:
-        height, width, _ = frame.shape
-        
-        # 预处理图像
-        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
-        net.setInput(blob)
-        
-        # 前向传播
-        start_time = time.time()
-        outs = net.forward(output_layers)
-        end_time = time.time()
-        inference_time = end_time - start_time
-        
-        # 处理检测结果
-        class_ids = []
-        confidences = []
-        boxes = []
-        
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                if confidence > confidence_threshold:
-                    # 物体位置
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    # 矩形坐标
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        
-        # 非极大值抑制
-        indices = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, nms_threshold)
-        
-        detected_objects = []
-        if len(indices) > 0:
-            try:
-                indices = indices.flatten()
-            except:
-                pass  # 版本兼容处理
-                
-            for i in indices:
-                try:
-                    i = i
-                    x, y, w, h = boxes[i]
-                    label = str(classes[class_ids[i]])
-                    confidence = confidences[i]
-                    detected_objects.append((x, y, w, h, label, confidence))
-                except Exception as e:
-                    print(f"警告: 处理检测结果时出错: {e}")
-                    continue
-        
-        return detected_objects, inference_time
-    except Exception as e:
-        print(f"错误: 处理帧时出错: {e}")
-        return [], 0
+def reconnect_camera(camera_index):
+    """重新打开摄像头并计数"""
+    CAMERA_RECONNECTS.inc()
+    return initialize_camera(camera_index)
+
+def record_frame(inference_time, capture_time=None, latency=None):
+    """
+    记录一帧的指标
+    :param inference_time: 推理耗时（秒），跳过检测的帧为0，不计入直方图
+    :param capture_time: 读取摄像头耗时（秒）
+    :param latency: 端到端延迟（秒）
+    :return: 最近5秒的FPS，样本不足时为None
+    """
+    FRAME_RATE.mark()
+    if inference_time > 0:
+        STAGE_SECONDS.observe(inference_time, stage='inference')
+    if capture_time is not None:
+        STAGE_SECONDS.observe(capture_time, stage='capture')
+    if latency is not None:
+        STAGE_SECONDS.observe(latency, stage='end_to_end')
+    return FRAME_RATE.rate() or None
+
+def needs_overlay(args):
+    """只有窗口显示、保存或录像需要标注后的画面，headless且不输出图像时跳过绘制（预览按帧单独判断）"""
+    return not args.headless or args.save or args.record
+
+def start_preview(args):
+    """按参数启动MJPEG预览服务，未启用或启动失败时返回None"""
+    if not args.preview_port:
+        return None
+    preview = PreviewServer(args.preview_port, fps=args.preview_fps, width=args.preview_width,
+                            quality=args.preview_quality)
+    return preview if preview.start() else None
+
+def stop_preview(preview):
+    if preview is not None:
+        preview.stop()
 
 def draw_detections(frame, detections, colors):
     """在帧上绘制检测结果"""
@@ -160,22 +151,247 @@ def draw_detections(frame, detections, colors):
     
     return frame
 
-def save_detection_result(frame, output_dir):
-    """保存检测结果"""
+def draw_status(frame, current_fps, inference_time, num_detections, latency=None):
+    """在帧左上角绘制FPS、推理时间、物体数量及（可选）端到端延迟"""
+    if current_fps is not None:
+        cv2.putText(frame, f"FPS: {current_fps:.1f}", (10, 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    cv2.putText(frame, f"推理时间: {inference_time*1000:.1f}ms", (10, 60), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    cv2.putText(frame, f"检测到: {num_detections}个物体", (10, 90), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    if latency is not None:
+        cv2.putText(frame, f"延迟: {latency*1000:.1f}ms", (10, 120), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    return frame
+
+def run_pipeline(args, cap, detect, colors, startup_time, writer, recorder, display, preview, detection_log):
+    """
+    流水线模式：采集线程、推理线程与显示（主线程）通过"最新帧优先"队列连接
+    HighGUI必须在主线程调用，因此绘制与显示留在主线程
+    """
+    stop_event = threading.Event()
+    frame_queue = LatestQueue(maxsize=1)
+    result_queue = LatestQueue(maxsize=1)
+    
+    capture_thread = CaptureThread(cap, lambda: reconnect_camera(args.camera), frame_queue, stop_event)
+    inference_thread = InferenceThread(detect, frame_queue, result_queue, stop_event)
+    latency = LatencyStats()
+    annotate = needs_overlay(args)
+    
+    rendered_count = 0
+    saved_count = 0
+    start_time = time.time()
+    
+    capture_thread.start()
+    inference_thread.start()
+    
     try:
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        while not stop_event.is_set() and not display.stopped:
+            packet = result_queue.get(timeout=0.1)
+            if packet is None:
+                # 无新结果时仍需处理窗口事件
+                display.poll()
+                continue
+            
+            rendered_count += 1
+            if rendered_count == 1:
+                report_first_detection(startup_time)
+            frame = packet.frame
+            draw = annotate or (preview is not None and preview.wants_frame())
+            if draw:
+                frame = draw_detections(frame, packet.detections, colors)
+            if recorder is not None:
+                recorder.write(frame, packet.detections)
+            if detection_log is not None:
+                detection_log.append(detection_log.frame_base + packet.frame_id, packet.detections,
+                                     time.time() - (time.perf_counter() - packet.capture_time))
+            
+            latency.add(time.perf_counter() - packet.capture_time)
+            current_fps = record_frame(packet.inference_time, latency=latency.last)
+            if draw:
+                draw_status(frame, current_fps, packet.inference_time, len(packet.detections), latency.last)
+            if preview is not None:
+                preview.offer(frame)
+            
+            key = display.show(frame)
+            if display.stopped:
+                break
+            elif key == ord('s') and args.save:
+                if save_detection_result(writer, frame):
+                    saved_count += 1
+            
+            if args.save and len(packet.detections) > 0 and packet.frame_id % 30 == 0:
+                if save_detection_result(writer, frame):
+                    saved_count += 1
+    
+    except KeyboardInterrupt:
+        print("程序被用户中断")
+    except Exception as e:
+        print(f"错误: 程序异常: {e}")
+    finally:
+        stop_event.set()
+        frame_queue.close()
+        capture_thread.join(timeout=2.0)
+        inference_thread.join(timeout=2.0)
+        display.close()
+        close_writer(writer)
+        close_recorder(recorder)
+        close_detection_log(detection_log)
         
-        filename = os.path.join(output_dir, f"detection_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-        cv2.imwrite(filename, frame)
-        print(f"已保存检测结果到: {filename}")
-        return True
+        elapsed_time = time.time() - start_time
+        if elapsed_time > 0 and rendered_count > 0:
+            print(f"总运行时间: {elapsed_time:.2f}秒")
+            print(f"采集帧数: {capture_thread.frame_count}, 推理帧数: {inference_thread.frame_count}, "
+                  f"显示帧数: {rendered_count}")
+            print(f"丢弃帧数: 采集{frame_queue.dropped}, 显示{result_queue.dropped}")
+            print(f"平均FPS: {rendered_count/elapsed_time:.2f}")
+            print(f"端到端延迟: p50={latency.percentile(50)*1000:.1f}ms, "
+                  f"p95={latency.percentile(95)*1000:.1f}ms")
+            if args.save:
+                print(f"保存的检测结果: {saved_count}张")
+
+def run_workers(args, cap, pool, colors, startup_time, writer, recorder, display, preview, detection_log):
+    """
+    多进程推理模式：主线程采集帧写入共享内存环形缓冲区，推理进程池并行检测，
+    结果按帧顺序取回后在主线程绘制和显示；推理进程全忙时丢弃新帧
+    """
+    latency = LatencyStats()
+    annotate = needs_overlay(args)
+    rendered_count = 0
+    saved_count = 0
+    start_time = time.time()
+    
+    try:
+        while not display.stopped:
+            ret, frame = cap.read()
+            if not ret:
+                print("警告: 无法获取视频帧，尝试重新连接...")
+                cap.release()
+                cap = reconnect_camera(args.camera)
+                if cap is None:
+                    break
+                continue
+            pool.submit(frame, time.perf_counter())
+            
+            packet = pool.get(timeout=0)
+            while packet is not None:
+                rendered_count += 1
+                if rendered_count == 1:
+                    report_first_detection(startup_time)
+                frame = packet.frame
+                draw = annotate or (preview is not None and preview.wants_frame())
+                if draw:
+                    frame = draw_detections(frame, packet.detections, colors)
+                if recorder is not None:
+                    recorder.write(frame, packet.detections)
+                if detection_log is not None:
+                    detection_log.append(detection_log.frame_base + packet.frame_id, packet.detections,
+                                         time.time() - (time.perf_counter() - packet.capture_time))
+                
+                latency.add(time.perf_counter() - packet.capture_time)
+                current_fps = record_frame(packet.inference_time, latency=latency.last)
+                if draw:
+                    draw_status(frame, current_fps, packet.inference_time, len(packet.detections), latency.last)
+                if preview is not None:
+                    preview.offer(frame)
+                
+                key = display.show(frame)
+                if display.stopped:
+                    break
+                elif key == ord('s') and args.save:
+                    if save_detection_result(writer, frame, copy=True):
+                        saved_count += 1
+                
+                if args.save and len(packet.detections) > 0 and packet.frame_id % 30 == 0:
+                    if save_detection_result(writer, frame, copy=True):
+                        saved_count += 1
+                packet = pool.get(timeout=0)
+    
+    except KeyboardInterrupt:
+        print("程序被用户中断")
     except Exception as e:
-        print(f"错误: 无法保存检测结果: {e}")
+        print(f"错误: 程序异常: {e}")
+    finally:
+        if cap is not None:
+            cap.release()
+        display.close()
+        close_writer(writer)
+        close_recorder(recorder)
+        close_detection_log(detection_log)
+        pool.close()
+        
+        elapsed_time = time.time() - start_time
+        if elapsed_time > 0 and rendered_count > 0:
+            print(f"总运行时间: {elapsed_time:.2f}秒")
+            print(f"推理进程: {args.workers}个, 提交帧数: {pool.submitted}, 丢弃帧数: {pool.dropped}, "
+                  f"显示帧数: {rendered_count}")
+            print(f"平均FPS: {rendered_count/elapsed_time:.2f}")
+            print(f"端到端延迟: p50={latency.percentile(50)*1000:.1f}ms, "
+                  f"p95={latency.percentile(95)*1000:.1f}ms")
+            if args.save:
+                print(f"保存的检测结果: {saved_count}张")
+
+def save_detection_result(writer, frame, copy=False):
+    """将检测结果交给后台写入器保存，不阻塞检测循环"""
+    if writer.submit(frame, copy=copy) is None:
+        print("警告: 保存队列已满，丢弃本次保存")
         return False
+    return True
+
+def close_writer(writer):
+    """等待后台写入完成并打印保存统计"""
+    if writer is None:
+        return
+    writer.close()
+    metrics = writer.metrics()
+    print(f"已写入: {metrics['saved']}张, 丢弃: {metrics['dropped']}张, 失败: {metrics['errors']}张, "
+          f"平均编码写盘耗时: {metrics['encode_ms_avg']:.1f}ms")
+
+def close_recorder(recorder):
+    """等待录像进程写完剩余帧并打印录像统计"""
+    if recorder is None:
+        return
+    recorder.close()
+    metrics = recorder.metrics()
+    print(f"录像: 写入{metrics['written']}/{metrics['frames']}帧, 丢弃{metrics['dropped']}帧, "
+          f"分段{metrics['segments']}个, 编码延迟 平均{metrics['lag_ms_avg']:.1f}ms / "
+          f"最大{metrics['lag_ms_max']:.1f}ms")
+
+def start_detection_log(args, classes):
+    """按参数打开列式检测日志，未启用或打开失败时返回None"""
+    if not args.detection_log:
+        return None
+    detection_log = DetectionLog(args.detection_log, classes, block_frames=args.detection_log_frames)
+    if not detection_log.start():
+        return None
+    if detection_log.frame_base:
+        print(f"检测日志: {args.detection_log}（接着已有日志，帧号从{detection_log.frame_base + 1}开始）")
+    else:
+        print(f"检测日志: {args.detection_log}")
+    return detection_log
+
+def close_detection_log(detection_log):
+    """写完剩余的块并打印检测日志统计"""
+    if detection_log is None:
+        return
+    detection_log.close()
+    metrics = detection_log.metrics()
+    print(f"检测日志: {metrics['frames']}帧, {metrics['rows']}条检测, 写入{metrics['blocks']}块, "
+          f"丢弃{metrics['dropped_blocks']}块")
+
+def report_first_detection(startup_time):
+    """打印从程序启动到第一帧检测完成的耗时"""
+    print(f"首次检测耗时: {time.perf_counter() - startup_time:.3f}秒（启动到第一帧检测完成）")
 
 def main():
     """主函数"""
+    startup_time = time.perf_counter()
+    
     # 解析命令行参数
     args = parse_arguments()
     
@@ -184,11 +400,33 @@ def main():
     if not check_files_exist(required_files):
         sys.exit(1)
     
-    # 加载YOLO模型
-    net, output_layers, classes = load_yolo_model(args.config, args.weights, args.names)
-    if net is None or output_layers is None or classes is None:
-        print("错误: 模型加载失败")
-        sys.exit(1)
+    # 加载YOLO模型；多进程推理模式下由各推理进程自行加载
+    detector = None
+    detect = None
+    if args.workers > 0:
+        if args.keyframe > 0 or args.motion_gate:
+            print("警告: 多进程推理模式不支持关键帧和运动门控，已忽略")
+            args.keyframe, args.motion_gate = 0, False
+    else:
+        detector = load_detector(args.config, args.weights, args.names,
+                                 cache_dir=None if args.no_cache else args.cache_dir,
+                                 confidence_threshold=args.confidence, nms_threshold=args.nms)
+        if detector is None:
+            print("错误: 模型加载失败")
+            sys.exit(1)
+        detect = detector.detect
+    
+    # 关键帧模式下用跟踪器替代逐帧检测
+    tracker = None
+    if args.keyframe > 0:
+        tracker = KeyframeTracker(detector, interval=args.keyframe, adaptive=not args.fixed_interval)
+        detect = tracker.process
+    
+    # 运动门控
+    gate = None
+    if args.motion_gate:
+        gate = MotionGate(threshold=args.motion_threshold)
+        detect = GatedDetector(detect, gate, use_roi=args.motion_roi and tracker is None).detect
     
     # 设置随机颜色
     colors = np.random.uniform(0, 255, size=(100, 3))
@@ -201,6 +439,12 @@ def main():
             print(f"错误: 无法创建输出目录: {e}")
             args.save = False
     
+    # 后台保存线程
+    writer = None
+    if args.save:
+        writer = SnapshotWriter(args.output, workers=args.save_workers, queue_size=args.save_queue,
+                                drop_policy=args.save_policy)
+    
     # 初始化摄像头
     cap = initialize_camera(args.camera)
     if cap is None:
@@ -212,22 +456,67 @@ def main():
     frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     print(f"摄像头分辨率: {frame_width}x{frame_height}, FPS: {fps}")
     
-    # 创建窗口
-    cv2.namedWindow("物体检测", cv2.WINDOW_NORMAL)
+    # 录像编码进程
+    recorder = None
+    if args.record:
+        recorder = VideoRecorder(args.record_dir, fps=args.record_fps or fps or 30.0,
+                                 segment_seconds=args.segment_seconds,
+                                 segment_bytes=int(args.segment_mb * 1024 * 1024))
+        if frame_width > 0 and frame_height > 0:
+            recorder.start(frame_width, frame_height)
+    
+    # 列式检测日志；类别编号与类别文件一致
+    classes = detector.classes if detector is not None else load_class_names(args.names)
+    detection_log = start_detection_log(args, classes or ())
+    
+    # 创建窗口（headless模式下只注册退出信号）
+    display = Display("物体检测", headless=args.headless)
+    annotate = needs_overlay(args)
+    
+    # 指标导出与预览
+    exporters = start_exporters(args.metrics_port, args.metrics_json, args.metrics_interval)
+    preview = start_preview(args)
+    
+    if args.workers > 0:
+        pool = InferencePool(args.config, args.weights, args.names, workers=args.workers,
+                             width=frame_width or 640, height=frame_height or 480,
+                             confidence_threshold=args.confidence, nms_threshold=args.nms)
+        if not pool.start():
+            cap.release()
+            display.close()
+            close_writer(writer)
+            close_recorder(recorder)
+            close_detection_log(detection_log)
+            stop_preview(preview)
+            stop_exporters(exporters)
+            sys.exit(1)
+        run_workers(args, cap, pool, colors, startup_time, writer, recorder, display, preview, detection_log)
+        stop_preview(preview)
+        stop_exporters(exporters)
+        return
+    
+    if args.pipeline:
+        run_pipeline(args, cap, detect, colors, startup_time, writer, recorder, display, preview, detection_log)
+        stop_preview(preview)
+        stop_exporters(exporters)
+        return
     
     frame_count = 0
     start_time = time.time()
     saved_count = 0
     
     try:
-        while True:
+        while not display.stopped:
             # 读取一帧
+            read_start = time.perf_counter()
             ret, frame = cap.read()
+            capture_time = time.perf_counter() - read_start
+            frame_time = time.time()
             if not ret:
                 print("警告: 无法获取视频帧，尝试重新连接...")
                 # 尝试重新连接摄像头
                 cap.release()
-                cap = initialize_camera(args.camera)
+                cap = reconnect_camera(args.camera)
                 if cap is None:
                     break
                 continue
@@ -235,44 +524,38 @@ def main():
             frame_count += 1
             
             # 处理帧
-            detections, inference_time = process_frame(
-                frame, net, output_layers, classes, 
-                args.confidence, args.nms
-            )
+            detections, inference_time = detect(frame)
+            if frame_count == 1:
+                report_first_detection(startup_time)
             
             # 绘制检测结果
-            frame = draw_detections(frame, detections, colors)
-            
-            # 计算和显示FPS
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0:
-                current_fps = frame_count / elapsed_time
-                cv2.putText(frame, f"FPS: {current_fps:.1f}", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # 显示推理时间
-            cv2.putText(frame, f"推理时间: {inference_time*1000:.1f}ms", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # 显示检测到的物体数量
-            cv2.putText(frame, f"检测到: {len(detections)}个物体", (10, 90), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            draw = annotate or (preview is not None and preview.wants_frame())
+            if draw:
+                frame = draw_detections(frame, detections, colors)
+            if recorder is not None:
+                recorder.write(frame, detections)
+            if detection_log is not None:
+                detection_log.append(detection_log.frame_base + frame_count, detections, frame_time)
             
-            # 显示结果
-            cv2.imshow("物体检测", frame)
+            # 计算和显示FPS（最近5秒）、推理时间、物体数量
+            current_fps = record_frame(inference_time, capture_time)
+            if draw:
+                draw_status(frame, current_fps, inference_time, len(detections))
+            if preview is not None:
+                preview.offer(frame)
             
-            # 按键处理
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):  # 按'q'退出
+            # 显示结果并处理按键
+            key = display.show(frame)
+            if display.stopped:  # 按'q'或收到退出信号
                 break
             elif key == ord('s') and args.save:  # 按's'保存当前帧
-                save_detection_result(frame, args.output)
-                saved_count += 1
+                if save_detection_result(writer, frame):
+                    saved_count += 1
             
             # 自动保存检测结果（如果启用）
             if args.save and len(detections) > 0 and frame_count % 30 == 0:
-                save_detection_result(frame, args.output)
-                saved_count += 1
+                if save_detection_result(writer, frame):
+                    saved_count += 1
     
     except KeyboardInterrupt:
         print("程序被用户中断")
@@ -282,7 +565,12 @@ def main():
         # 释放资源
         if cap is not None:
             cap.release()
-        cv2.destroyAllWindows()
+        display.close()
+        close_writer(writer)
+        close_recorder(recorder)
+        close_detection_log(detection_log)
+        stop_preview(preview)
+        stop_exporters(exporters)
         
         # 打印统计信息
         elapsed_time = time.time() - start_time
@@ -292,6 +580,14 @@ def main():
             print(f"平均FPS: {frame_count/elapsed_time:.2f}")
             if args.save:
                 print(f"保存的检测结果: {saved_count}张")
+            if tracker is not None:
+                print(f"关键帧: {tracker.keyframes}, 光流传播帧: {tracker.tracked_frames}, "
+                      f"当前间隔N: {tracker.interval}")
+            if gate is not None:
+                metrics = gate.metrics()
+                print(f"运动门控: 跳过{metrics['skipped']}/{metrics['frames']}帧 "
+                      f"(命中率{metrics['hit_rate']*100:.1f}%), 门控耗时{metrics['gate_ms_avg']:.2f}ms/帧, "
+                      f"估计节省CPU {metrics['cpu_saved_s']:.1f}秒")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
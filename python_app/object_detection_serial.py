@@ -1,9 +1,18 @@
 import cv2
-import numpy as np
 import os
 import time
 import argparse
-from protocol import CommunicationProtocol
+from protocol import normalize_detections
+from serial_pool import SerialPool, parse_routes
+from link_setup import DEFAULT_PROFILE_PATH, resolve_link
+from serial_capture import SerialCapture
+from decision import DecisionSmoother, SMOOTHING_MODES, VOTE
+from model_cache import load_detector
+from motion_gate import GatedDetector, MotionGate
+from object_detection import (close_detection_log, reconnect_camera, record_frame, report_first_detection,
+                              start_detection_log)
+from metrics import start_exporters, stop_exporters
+from display import Display
 
 def parse_arguments():
     """解析命令行参数"""
@@ -11,42 +20,46 @@ def parse_arguments():
     parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
     parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径')
     parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--cache-dir', default='.model_cache', help='模型缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用模型缓存')
     parser.add_argument('--camera', type=int, default=0, help='摄像头索引')
     parser.add_argument('--confidence', type=float, default=0.5, help='置信度阈值')
-    parser.add_argument('--port', default='COM3', help='串口端口')
-    parser.add_argument('--baud', type=int, default=115200, help='波特率')
+    parser.add_argument('--nms', type=float, default=0.4, help='非极大值抑制阈值')
+    parser.add_argument('--port', default='COM3', help='串口端口，多块开发板用逗号分隔（如 COM3,COM4）')
+    parser.add_argument('--route', action='append', default=[],
+                        help='路由规则 端口=命令（如 COM4=A），该端口只显示自己负责的状态；未配置的端口镜像全部状态')
+    parser.add_argument('--baud', type=int, default=115200,
+                        help='波特率，0表示自动（使用链路记录，没有记录时协商并记录）')
+    parser.add_argument('--link-profile', default=DEFAULT_PROFILE_PATH, help='链路测量记录文件（见link_setup.py）')
+    parser.add_argument('--link-utilization', type=float, default=0.8,
+                        help='按实测链路容量限速时允许占用的比例（0表示不限速）')
     parser.add_argument('--objectA', default='person', help='要检测的物体A')
     parser.add_argument('--objectB', default='car', help='要检测的物体B')
+    parser.add_argument('--in-flight', type=int, default=4, help='最多同时等待ACK的命令数')
+    parser.add_argument('--ack-timeout', type=float, default=1.0, help='等待ACK的超时时间（秒）')
+    parser.add_argument('--smoothing', choices=SMOOTHING_MODES + ('off',), default=VOTE,
+                        help='决策平滑方式：滑动窗口投票 / 指数置信度累积 / 关闭')
+    parser.add_argument('--window', type=int, default=5, help='投票窗口帧数')
+    parser.add_argument('--alpha', type=float, default=0.3, help='指数累积系数')
+    parser.add_argument('--enter', type=float, default=0.6, help='切换到新状态所需的得分')
+    parser.add_argument('--stay', type=float, default=0.4, help='当前状态得分不低于该值时保持不变')
+    parser.add_argument('--dwell', type=float, default=0.5, help='状态切换后的最短驻留时间（秒）')
+    parser.add_argument('--metrics-port', type=int, default=0, help='Prometheus指标HTTP端口（0表示关闭）')
+    parser.add_argument('--metrics-json', default=None, help='定期写入JSON指标快照的文件路径')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='JSON指标快照的写入间隔（秒）')
+    parser.add_argument('--motion-gate', action='store_true', help='画面无变化时跳过检测，复用上次结果')
+    parser.add_argument('--motion-threshold', type=int, default=25, help='运动门控的像素灰度差阈值')
+    parser.add_argument('--motion-roi', action='store_true', help='只对运动区域做检测，区域外沿用上次的检测框')
+    parser.add_argument('--binary', action='store_true', help='使用二进制帧协议发送完整检测结果')
+    parser.add_argument('--detection-log', default=None,
+                        help='列式检测日志目录，逐帧记录检测结果供离线查询（见detection_log.py）')
+    parser.add_argument('--detection-log-frames', type=int, default=300, help='检测日志每块的帧数')
+    parser.add_argument('--capture', default=None,
+                        help='串口抓包文件，记录所有端口收发的字节（见serial_capture.py、scripts/replay_capture.py）')
+    parser.add_argument('--headless', action='store_true',
+                        help='无窗口模式：不显示画面、不绘制状态文字，通过SIGINT/SIGTERM退出')
     return parser.parse_args()
 
-def load_yolo_model(config_path, weights_path, names_path):
-    """加载YOLO模型"""
-    try:
-        # 加载YOLO模型
-        net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
-        
-        # 获取输出层名称
-        layer_names = net.getLayerNames()
-        try:
-            # OpenCV 4.5.4及更高版本
-            output_layers = [layer_names[i-1] for i in net.getUnconnectedOutLayers()]
-        except:
-            # 旧版本OpenCV
-            output_layers = [layer_names[i[0]-1] for i in net.getUnconnectedOutLayers()]
-        
-        # 加载类别名称
-        try:
-            with open(names_path, 'r') as f:
-                classes = [line.strip() for line in f.readlines()]
-        except Exception as e:
-            print(f"错误: 无法读取类别文件: {e}")
-            return None, None, None
-        
-        return net, output_layers, classes
-    except Exception as e:
-        print(f"错误: 无法加载YOLO模型: {e}")
-        return None, None, None
-
 def initialize_camera(camera_index):
     """初始化摄像头"""
     try:
@@ -59,115 +72,139 @@ def initialize_camera(camera_index):
         print(f"错误: 初始化摄像头时出错: {e}")
         return None
 
-def process_frame(frame, net, output_layers, classes, confidence_threshold):
-    """处理单帧图像并检测物体"""
-    try:
-        height, width, _ = frame.shape
-        
-        # 预处理图像
-        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
-        net.setInput(blob)
-        
-        # 前向传播
-        outs = net.forward(output_layers)
-        
-        # 处理检测结果
-        class_ids = []
-        confidences = []
-        boxes = []
-        
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                if confidence > confidence_threshold:
-                    # 物体位置
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    # 矩形坐标
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        
-        # 非极大值抑制
-        indices = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, 0.4)
-        
-        detected_objects = []
-        if len(indices) > 0:
-            try:
-                indices = indices.flatten()
-            except:
-                pass  # 版本兼容处理
-                
-            for i in indices:
-                try:
-                    i = i
-                    label = str(classes[class_ids[i]])
-                    confidence = confidences[i]
-                    detected_objects.append(label)
-                except Exception as e:
-                    print(f"警告: 处理检测结果时出错: {e}")
-                    continue
-        
-        return detected_objects
-    except Exception as e:
-        print(f"错误: 处理帧时出错: {e}")
-        return []
+def report_send_result(command):
+    """返回用于打印发送结果的回调，参数为(端口, Future)"""
+    def callback(port, future):
+        if future.result():
+            print(f"已发送: {command} -> {port}")
+        else:
+            print(f"发送失败: {command} -> {port}")
+    return callback
+
+def resolve_links(ports, baudrate, profile_path, utilization):
+    """
+    确定各端口的波特率和发送字节预算
+    :param baudrate: 0表示自动，没有记录也协商失败时使用115200
+    :return: ({端口: 波特率}, {端口: 字节/秒上限})
+    """
+    baudrates = {}
+    budgets = {}
+    for port in ports:
+        profile = resolve_link(port, baudrate, profile_path)
+        if profile is None:
+            if not baudrate:
+                print(f"警告: 串口{port}无法确定波特率，使用115200")
+            baudrates[port] = baudrate or 115200
+            continue
+        baudrates[port] = profile.baudrate
+        if utilization > 0:
+            budgets[port] = profile.bytes_per_s * utilization
+        print(f"串口{port}: {profile.baudrate}波特率, 实测{profile.bytes_per_s:.0f}字节/秒, "
+              f"往返延迟p50 {profile.rtt_p50_ms:.1f}ms")
+    return baudrates, budgets
 
 def main():
+    startup_time = time.perf_counter()
+    
     # 解析命令行参数
     args = parse_arguments()
     
     # 加载YOLO模型
-    net, output_layers, classes = load_yolo_model(args.config, args.weights, args.names)
-    if net is None or output_layers is None or classes is None:
+    detector = load_detector(args.config, args.weights, args.names,
+                             cache_dir=None if args.no_cache else args.cache_dir,
+                             confidence_threshold=args.confidence, nms_threshold=args.nms)
+    if detector is None:
         print("错误: 模型加载失败")
         return
+    detect = detector.detect
+    
+    # 运动门控：传送带静止时跳过检测，复用上次结果
+    gate = None
+    if args.motion_gate:
+        gate = MotionGate(threshold=args.motion_threshold)
+        detect = GatedDetector(detect, gate, use_roi=args.motion_roi).detect
     
     # 初始化摄像头
     cap = initialize_camera(args.camera)
     if cap is None:
         return
     
-    # 初始化通信协议
-    protocol = CommunicationProtocol(port=args.port, baudrate=args.baud)
-    if not protocol.connect():
+    # 链路信息：自动波特率，并按实测容量限制发送速率
+    ports = [port.strip() for port in args.port.split(',') if port.strip()]
+    baudrates, budgets = resolve_links(ports, args.baud, args.link_profile, args.link_utilization)
+    
+    # 可选的串口抓包，所有端口写入同一个文件
+    capture = None
+    if args.capture:
+        capture = SerialCapture(args.capture)
+        if not capture.start():
+            cap.release()
+            return
+    
+    # 初始化串口连接池：每块开发板独立收发，断开的端口在后台重连
+    try:
+        pool = SerialPool(ports, routes=parse_routes(args.route), max_in_flight=args.in_flight,
+                          ack_timeout=args.ack_timeout, binary=args.binary, baudrates=baudrates, budgets=budgets,
+                          capture=capture)
+    except ValueError as e:
+        print(f"错误: {e}")
+        if capture is not None:
+            capture.close()
+        cap.release()
+        return
+    if not pool.start():
+        print("错误: 所有串口均连接失败")
+        pool.close()
+        if capture is not None:
+            capture.close()
         cap.release()
         return
     
-    # 创建窗口
-    cv2.namedWindow("物体检测与串口通信", cv2.WINDOW_NORMAL)
+    # 创建窗口（headless模式下只注册退出信号），按ESC键退出
+    display = Display("物体检测与串口通信", headless=args.headless, quit_keys=(27,))
+    
+    # 指标导出
+    exporters = start_exporters(args.metrics_port, args.metrics_json, args.metrics_interval)
     
-    last_sent = 'N'  # 上一次发送的状态，初始为'N'
+    smoother = None
+    if args.smoothing != 'off':
+        smoother = DecisionSmoother(mode=args.smoothing, window=args.window, alpha=args.alpha,
+                                    enter_threshold=args.enter, stay_threshold=args.stay,
+                                    min_dwell=args.dwell)
+    first_detection = True
+    class_ids = {name: i for i, name in enumerate(detector.classes)}
+    detection_log = start_detection_log(args, detector.classes)
+    frame_count = 0
     
     try:
-        while True:
+        while not display.stopped:
             # 读取一帧
             ret, frame = cap.read()
             if not ret:
                 print("警告: 无法获取视频帧，尝试重新连接...")
                 # 尝试重新连接摄像头
                 cap.release()
-                cap = initialize_camera(args.camera)
+                cap = reconnect_camera(args.camera)
                 if cap is None:
                     break
                 continue
             
+            frame_count += 1
+            frame_time = time.time()
+            
             # 处理帧并检测物体
-            detected_objects = process_frame(
-                frame, net, output_layers, classes, args.confidence
-            )
+            detections, inference_time = detect(frame)
+            record_frame(inference_time)
+            if detection_log is not None:
+                detection_log.append(detection_log.frame_base + frame_count, detections, frame_time)
+            if first_detection:
+                report_first_detection(startup_time)
+                first_detection = False
+            detected_objects = [label for _, _, _, _, label, _ in detections]
             
             # 根据检测结果发送串口信息
             to_send = 'N'  # 默认发送'N'表示未检测到指定物体
+            confidence = 1.0
             
             # 检查是否检测到物体A
             if args.objectA in detected_objects:
@@ -175,14 +212,24 @@ def main():
             # 如果已经检测到物体A，就不再检查物体B
             elif args.objectB in detected_objects:
                 to_send = 'B'
+            if to_send != 'N':
+                target = args.objectA if to_send == 'A' else args.objectB
+                confidence = max(conf for _, _, _, _, label, conf in detections if label == target)
+            
+            # 时间平滑：单帧误检不触发发送
+            if smoother is not None:
+                to_send = smoother.update(to_send, confidence)
             
-            # 只有当检测状态变化时才发送
-            if to_send != last_sent:
-                if protocol.send_object_detected(to_send):
-                    last_sent = to_send
-                    print(f"已发送: {to_send}")
-                else:
-                    print(f"发送失败: {to_send}")
+            if args.binary:
+                # 二进制协议向所有开发板发送完整检测结果；某个链路忙时只跳过该链路的本帧
+                height, width = frame.shape[:2]
+                pool.send_detections(normalize_detections(detections, width, height, class_ids))
+            # 每个端口只在自己的命令变化时发送（重连后重新发送），异步提交，不等待串口响应
+            else:
+                pool.send_state(to_send, report_send_result(to_send))
+            
+            if args.headless:
+                continue
             
             # 在帧上显示当前状态
             status_text = f"已检测到: {', '.join(detected_objects)}" if detected_objects else "未检测到目标物体"
@@ -191,20 +238,38 @@ def main():
             cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
             cv2.putText(frame, send_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
             
-            # 显示帧
-            cv2.imshow("物体检测与串口通信", frame)
-            
-            # 按ESC键退出
-            if cv2.waitKey(1) == 27:
-                break
+            # 显示帧并处理按键
+            display.show(frame)
     
     except KeyboardInterrupt:
         print("程序被用户中断")
     finally:
+        # 打印平滑前后的消息速率
+        if smoother is not None:
+            metrics = smoother.metrics()
+            print(f"决策平滑: 原始状态变化{metrics['raw_changes']}次 ({metrics['raw_rate']:.2f}条/秒) -> "
+                  f"发送{metrics['changes']}次 ({metrics['rate']:.2f}条/秒)")
+        if gate is not None:
+            metrics = gate.metrics()
+            print(f"运动门控: 跳过{metrics['skipped']}/{metrics['frames']}帧 "
+                  f"(命中率{metrics['hit_rate']*100:.1f}%), 门控耗时{metrics['gate_ms_avg']:.2f}ms/帧, "
+                  f"估计节省CPU {metrics['cpu_saved_s']:.1f}秒")
+        
+        # 打印各串口的健康状态与往返延迟统计
+        for port, health in pool.health().items():
+            print(f"串口 {port}: {health}")
+        for port, commands in pool.latency_stats().items():
+            for command, stats in commands.items():
+                print(f"串口 {port} 命令 {command}: {stats}")
+        
         # 释放资源
-        protocol.disconnect()
+        stop_exporters(exporters)
+        pool.close()
+        if capture is not None:
+            capture.close()
+        close_detection_log(detection_log)
         cap.release()
-        cv2.destroyAllWindows()
+        display.close()
         print("程序已退出")
 
 if __name__ == "__main__":
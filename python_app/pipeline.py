@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+@dataclass
+class FramePacket:
+    """在流水线各阶段之间传递的帧数据"""
+    frame_id: int
+    frame: Any
+    capture_time: float
+    detections: List = field(default_factory=list)
+    inference_time: float = 0.0
+
+class LatestQueue:
+    """有界队列，队满时丢弃最旧的元素，保证消费者总是拿到最新帧"""
+
+    def __init__(self, maxsize: int = 1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> bool:
+        """
+        放入元素
+        :return: 是否因队满丢弃了旧元素
+        """
+        with self._cond:
+            dropped = len(self._items) == self._items.maxlen
+            if dropped:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        取出最旧的元素
+        :param timeout: 超时时间（秒），None表示一直等待
+        :return: 元素，超时或队列已关闭返回None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """关闭队列并唤醒所有等待者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class CaptureThread(threading.Thread):
+    """采集线程：持续读取摄像头，只保留最新帧"""
+
+    def __init__(self, cap, reopen: Callable, out_queue: LatestQueue, stop_event: threading.Event):
+        """
+        :param cap: 已打开的cv2.VideoCapture
+        :param reopen: 读帧失败时用于重新打开摄像头的函数，返回新的VideoCapture或None
+        :param out_queue: 输出队列
+        :param stop_event: 停止信号
+        """
+        super().__init__(name='capture', daemon=True)
+        self.cap = cap
+        self.reopen = reopen
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.frame_count = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    print("警告: 无法获取视频帧，尝试重新连接...")
+                    self.cap.release()
+                    self.cap = self.reopen()
+                    if self.cap is None:
+                        break
+                    continue
+
+                self.frame_count += 1
+                self.out_queue.put(FramePacket(self.frame_count, frame, time.perf_counter()))
+        finally:
+            if self.cap is not None:
+                self.cap.release()
+            self.stop_event.set()
+            self.out_queue.close()
+
+class InferenceThread(threading.Thread):
+    """推理线程：总是处理输入队列中最新的帧"""
+
+    def __init__(self, detect: Callable, in_queue: LatestQueue, out_queue: LatestQueue,
+                 stop_event: threading.Event):
+        """
+        :param detect: 检测函数，接收帧，返回 (detections, inference_time)
+        :param in_queue: 输入队列
+        :param out_queue: 输出队列
+        :param stop_event: 停止信号
+        """
+        super().__init__(name='inference', daemon=True)
+        self.detect = detect
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.frame_count = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                packet = self.in_queue.get(timeout=0.1)
+                if packet is None:
+                    continue
+
+                packet.detections, packet.inference_time = self.detect(packet.frame)
+                self.frame_count += 1
+                self.out_queue.put(packet)
+        finally:
+            self.out_queue.close()
+
+class LatencyStats:
+    """记录每帧端到端延迟"""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.last = 0.0
+
+    def add(self, latency: float):
+        self.last = latency
+        self.samples.append(latency)
+
+    def percentile(self, p: float) -> float:
+        """返回最近窗口内延迟的百分位数（秒）"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import select
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import cv2
+
+from metrics import REGISTRY
+
+PREVIEW_CLIENTS = REGISTRY.gauge('preview_clients', '已连接的预览客户端数')
+PREVIEW_FRAMES = REGISTRY.counter('preview_frames_total', '预览编码的JPEG帧数')
+PREVIEW_ENCODE_SECONDS = REGISTRY.histogram('preview_encode_seconds', '预览帧JPEG编码耗时（秒）')
+
+BOUNDARY = 'frame'
+
+INDEX_PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>preview</title></head>
+<body style="margin:0;background:#000"><img src="/preview.mjpg" style="max-width:100%"></body></html>
+"""
+
+class PreviewServer:
+    """
+    本地HTTP MJPEG预览：/preview.mjpg 为连续画面，/preview.jpg 为最新一帧
+    - 检测循环调用offer()，只有客户端在线且距上一帧超过1/fps时才缩小并复制画面，其余情况立即返回
+    - 独立的编码线程把最新画面编码成一份JPEG，所有客户端共享同一份数据
+    - 每个客户端在各自的线程中发送，慢客户端只会跳过中间帧，不会阻塞检测循环和其他客户端
+    """
+
+    def __init__(self, port: int = 8090, host: str = '127.0.0.1', fps: float = 5.0, width: int = 480,
+                 quality: int = 70):
+        """
+        :param port: HTTP端口，0表示由系统分配
+        :param host: 监听地址，默认只允许本机访问
+        :param fps: 预览帧率上限
+        :param width: 预览画面宽度，原图更窄时不放大
+        :param quality: JPEG质量（0-100）
+        """
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.width = width
+        self.quality = quality
+
+        self.offered = 0
+        self.encoded = 0
+
+        self._clients = 0
+        self._pending = None
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_time = 0.0
+        self._sequence = 0
+        self._last_offer = 0.0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._encoder = threading.Thread(target=self._encode_loop, name='preview-encoder', daemon=True)
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    def start(self) -> bool:
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/preview.mjpg'):
+                    preview._stream(self)
+                elif self.path.startswith('/preview.jpg'):
+                    preview._snapshot(self)
+                elif self.path == '/' or self.path.startswith('/index'):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(INDEX_PAGE)))
+                    self.end_headers()
+                    self.wfile.write(INDEX_PAGE)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"错误: 无法启动预览HTTP服务: {e}")
+            return False
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='preview-http', daemon=True).start()
+        self._encoder.start()
+        print(f"预览画面: http://{self.host}:{self.port}/")
+        return True
+
+    def wants_frame(self, now: Optional[float] = None) -> bool:
+        """是否需要下一帧预览画面（有客户端且已到发送时间），可用于决定是否绘制标注"""
+        if self._clients == 0:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self._last_offer >= self.interval
+
+    def offer(self, frame) -> bool:
+        """
+        提交一帧（已绘制标注的）画面，不需要时立即返回
+        :return: 是否被采用
+        """
+        now = time.monotonic()
+        if not self.wants_frame(now):
+            return False
+        self._last_offer = now
+
+        # 缩小同时完成复制，调用方之后可以继续修改或复用原帧
+        height, width = frame.shape[:2]
+        if width > self.width:
+            small = cv2.resize(frame, (self.width, height * self.width // width), interpolation=cv2.INTER_LINEAR)
+        else:
+            small = frame.copy()
+        with self._condition:
+            # 编码线程还没取走上一帧时直接覆盖，只编码最新画面
+            self._pending = small
+            self._condition.notify_all()
+        self.offered += 1
+        return True
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._encoder.is_alive():
+            self._encoder.join(1.0)
+        print(f"预览: 编码{self.encoded}帧")
+
+    def _encode_loop(self):
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        while not self._stop.is_set():
+            with self._condition:
+                while self._pending is None and not self._stop.is_set():
+                    self._condition.wait(0.5)
+                frame, self._pending = self._pending, None
+            if frame is None:
+                continue
+
+            start_time = time.perf_counter()
+            ok, buffer = cv2.imencode('.jpg', frame, params)
+            if not ok:
+                print("警告: 预览帧编码失败")
+                continue
+            PREVIEW_ENCODE_SECONDS.observe(time.perf_counter() - start_time)
+            PREVIEW_FRAMES.inc()
+            self.encoded += 1
+
+            with self._condition:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_time = time.monotonic()
+                self._sequence += 1
+                self._condition.notify_all()
+
+    def _next_jpeg(self, last_sequence: int, timeout: Optional[float] = None):
+        """
+        等待比last_sequence更新的JPEG
+        :param timeout: 最长等待时间（秒），None表示一直等到新帧或退出
+        :return: (序号, 数据)，超时或退出时数据为None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._sequence == last_sequence and not self._stop.is_set():
+                remaining = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if self._stop.is_set() or self._sequence == last_sequence:
+                return last_sequence, None
+            return self._sequence, self._jpeg
+
+    def _set_clients(self, delta: int):
+        with self._condition:
+            self._clients += delta
+            PREVIEW_CLIENTS.set(self._clients)
+
+    def _stream(self, handler: BaseHTTPRequestHandler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.end_headers()
+
+        self._set_clients(1)
+        try:
+            sequence = 0
+            while not self._stop.is_set():
+                sequence, jpeg = self._next_jpeg(sequence, timeout=0.5)
+                if jpeg is None:
+                    # 等待期间检查客户端是否已断开，断开后不再为它请求新画面
+                    if _peer_closed(handler.connection):
+                        break
+                    continue
+                handler.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                    f'Content-Length: {len(jpeg)}\r\n\r\n'.encode('ascii'))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b'\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self._set_clients(-1)
+
+    def _snapshot(self, handler: BaseHTTPRequestHandler):
+        # 单帧请求也算作一个短暂的客户端；没有客户端时不编码，缓存的画面可能已经很旧，
+        # 超过2个发送间隔就等待新帧（最多5秒），等不到时返回503而不是旧画面
+        self._set_clients(1)
+        try:
+            with self._condition:
+                sequence, jpeg, jpeg_time = self._sequence, self._jpeg, self._jpeg_time
+            if jpeg is None or time.monotonic() - jpeg_time > 2 * self.interval:
+                _, jpeg = self._next_jpeg(sequence, timeout=5.0)
+        finally:
+            self._set_clients(-1)
+        if jpeg is None:
+            handler.send_error(503)
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'image/jpeg')
+        handler.send_header('Content-Length', str(len(jpeg)))
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+def _peer_closed(connection) -> bool:
+    """客户端是否已关闭连接（可读且读到EOF）"""
+    try:
+        readable, _, _ = select.select([connection], [], [], 0)
+        return bool(readable) and connection.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
@@ -3,8 +3,488 @@
 
 import serial
 import time
+import queue
+import struct
 import logging
-from typing import Optional
+import binascii
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import REGISTRY
+from async_logging import setup_async_logging
+
+# 二进制帧格式（版本1），多字节字段为小端序：
+#   | SYNC 0xA5 | LEN | VER<<4 | TYPE | SEQ | COUNT | COUNT x (CLASS, X, Y, W, H, CONF) | CRC16 |
+#   LEN   = 从VER/TYPE字节到最后一个对象字节的长度
+#   X/Y/W/H 为相对帧尺寸量化到0-255的值，CONF为置信度量化到0-255
+#   CRC16 = CRC-16/CCITT-FALSE（多项式0x1021，初值0xFFFF），覆盖LEN到最后一个对象字节
+# 应答为2字节：ACK 0x06 SEQ，NAK 0x15 SEQ（CRC错误或无法解析）
+FRAME_SYNC = 0xA5
+FRAME_VERSION = 1
+FRAME_TYPE_DETECTIONS = 0x1
+FRAME_ACK = 0x06
+FRAME_NAK = 0x15
+MAX_FRAME_OBJECTS = 32
+
+_FRAME_HEADER = struct.Struct('<BBBBB')  # SYNC, LEN, VER/TYPE, SEQ, COUNT
+_FRAME_OBJECT = struct.Struct('<BBBBBB')  # CLASS, X, Y, W, H, CONF
+_FRAME_CRC = struct.Struct('<H')
+_FRAME_MIN_SIZE = _FRAME_HEADER.size + _FRAME_CRC.size
+_FRAME_MAX_LENGTH = _FRAME_HEADER.size - 2 + MAX_FRAME_OBJECTS * _FRAME_OBJECT.size
+
+def crc16(data, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE，binascii在C层实现，可直接传入memoryview"""
+    return binascii.crc_hqx(data, crc)
+
+def frame_size(count: int) -> int:
+    """包含count个对象（超出上限的部分被截断）的检测帧字节数"""
+    return _FRAME_MIN_SIZE + min(count, MAX_FRAME_OBJECTS) * _FRAME_OBJECT.size
+
+def _quantize(value: float) -> int:
+    """将0-1之间的值量化为0-255"""
+    return min(255, max(0, int(value * 255 + 0.5)))
+
+def normalize_detections(detections, width: int, height: int,
+                         class_ids: Dict[str, int]) -> List[Tuple[int, float, float, float, float, float]]:
+    """
+    将检测结果 (x, y, w, h, label, confidence) 转换为帧编码所需的归一化对象
+    :param detections: YoloDetector返回的检测结果
+    :param width: 帧宽度
+    :param height: 帧高度
+    :param class_ids: 类别名称到类别ID的映射，不在映射中的类别被忽略
+    :return: [(class_id, x, y, w, h, confidence), ...]，坐标为0-1之间的相对值
+    """
+    objects = []
+    for x, y, w, h, label, confidence in detections:
+        class_id = class_ids.get(label)
+        if class_id is None:
+            continue
+        objects.append((class_id, x / width, y / height, w / width, h / height, confidence))
+    return objects
+
+@dataclass
+class DetectionFrame:
+    """解码后的检测帧，objects中各字段均为量化后的0-255整数"""
+    version: int
+    seq: int
+    objects: List[Tuple[int, int, int, int, int, int]]
+
+class FrameEncoder:
+    """二进制检测帧编码器，复用内部缓冲区，struct.pack_into直接写入，不产生中间对象"""
+
+    def __init__(self, max_objects: int = MAX_FRAME_OBJECTS):
+        self.max_objects = min(max_objects, MAX_FRAME_OBJECTS)
+        self._buffer = bytearray(_FRAME_MIN_SIZE + self.max_objects * _FRAME_OBJECT.size)
+        self._view = memoryview(self._buffer)
+
+    def encode(self, seq: int, objects: Sequence) -> memoryview:
+        """
+        编码一帧
+        :param seq: 序号（0-255）
+        :param objects: [(class_id, x, y, w, h, confidence), ...]，坐标为0-1之间的相对值，超出上限的部分被截断
+        :return: 指向内部缓冲区的memoryview，下次调用encode前有效
+        """
+        count = min(len(objects), self.max_objects)
+        body_end = _FRAME_HEADER.size + count * _FRAME_OBJECT.size
+        _FRAME_HEADER.pack_into(self._buffer, 0, FRAME_SYNC, body_end - 2,
+                                (FRAME_VERSION << 4) | FRAME_TYPE_DETECTIONS, seq & 0xFF, count)
+        offset = _FRAME_HEADER.size
+        for class_id, x, y, w, h, confidence in objects[:count]:
+            _FRAME_OBJECT.pack_into(self._buffer, offset, class_id & 0xFF, _quantize(x), _quantize(y),
+                                    _quantize(w), _quantize(h), _quantize(confidence))
+            offset += _FRAME_OBJECT.size
+        _FRAME_CRC.pack_into(self._buffer, body_end, crc16(self._view[1:body_end]))
+        return self._view[:body_end + _FRAME_CRC.size]
+
+class FrameDecoder:
+    """二进制检测帧增量解码器，可按任意分片喂入数据，遇到错误自动重新同步"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.discarded = 0  # 重新同步时丢弃的字节数
+
+    def feed(self, data) -> List[DetectionFrame]:
+        """
+        喂入新收到的数据
+        :return: 本次解析出的完整帧
+        """
+        self._buffer.extend(data)
+        frames = []
+        view = memoryview(self._buffer)
+        pos = 0
+        try:
+            while len(view) - pos >= _FRAME_MIN_SIZE:
+                if view[pos] != FRAME_SYNC:
+                    pos += 1
+                    self.discarded += 1
+                    continue
+
+                length = view[pos + 1]
+                end = pos + 2 + length + _FRAME_CRC.size
+                # 长度不可能合法时立即重新同步，避免一个错误的长度字节让解码器空等
+                if length < 3 or length > _FRAME_MAX_LENGTH or (length - 3) % _FRAME_OBJECT.size:
+                    pos += 1
+                    self.discarded += 1
+                    continue
+                if end > len(view):
+                    break
+
+                (crc,) = _FRAME_CRC.unpack_from(view, end - _FRAME_CRC.size)
+                if crc != crc16(view[pos + 1:end - _FRAME_CRC.size]):
+                    self.crc_errors += 1
+                    pos += 1
+                    self.discarded += 1
+                    continue
+
+                frame = self._parse(view[pos:end - _FRAME_CRC.size])
+                if frame is not None:
+                    frames.append(frame)
+                    self.frames += 1
+                pos = end
+        finally:
+            view.release()
+        del self._buffer[:pos]
+        return frames
+
+    @staticmethod
+    def _parse(body) -> Optional[DetectionFrame]:
+        """解析已通过CRC校验的帧，版本或类型不支持时返回None"""
+        _, length, ver_type, seq, count = _FRAME_HEADER.unpack_from(body)
+        if ver_type >> 4 != FRAME_VERSION or ver_type & 0x0F != FRAME_TYPE_DETECTIONS:
+            return None
+        if length != _FRAME_HEADER.size - 2 + count * _FRAME_OBJECT.size:
+            return None
+        objects = list(_FRAME_OBJECT.iter_unpack(body[_FRAME_HEADER.size:]))
+        return DetectionFrame(ver_type >> 4, seq, objects)
+
+class LegacyCodec:
+    """旧版协议：单字符命令，文本行应答（ACK_A / ERR...）"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def encode(self, command: str) -> Tuple[Any, str, bytes]:
+        """
+        :return: (匹配键, 统计标签, 待发送数据)
+        """
+        return command, command, command.encode()
+
+    def feed(self, data) -> List[Tuple[str, Any]]:
+        """
+        解析收到的数据
+        :return: [('ack', 命令) / ('err', None), ...]
+        """
+        self._buffer.extend(data)
+        responses = []
+        while b'\n' in self._buffer:
+            line, _, rest = self._buffer.partition(b'\n')
+            self._buffer = bytearray(rest)
+            line = line.decode(errors='replace').strip()
+            if line.startswith(CommunicationProtocol.ACK_PREFIX):
+                responses.append(('ack', line[len(CommunicationProtocol.ACK_PREFIX):]))
+            elif line.startswith("ERR"):
+                responses.append(('err', None))
+        return responses
+
+class BinaryCodec:
+    """二进制协议：带序号和CRC的检测帧，2字节ACK/NAK应答"""
+
+    LABEL = 'DET'
+
+    def __init__(self, max_objects: int = MAX_FRAME_OBJECTS):
+        self.encoder = FrameEncoder(max_objects)
+        self._seq = 0
+        self._buffer = bytearray()
+
+    def encode(self, objects: Sequence) -> Tuple[Any, str, memoryview]:
+        """
+        :param objects: [(class_id, x, y, w, h, confidence), ...]，坐标为0-1之间的相对值
+        :return: (序号, 统计标签, 待发送数据)
+        """
+        seq = self._seq
+        self._seq = (self._seq + 1) & 0xFF
+        return seq, self.LABEL, self.encoder.encode(seq, objects)
+
+    def feed(self, data) -> List[Tuple[str, Any]]:
+        """
+        解析收到的ACK/NAK
+        :return: [('ack', 序号) / ('nak', 序号), ...]
+        """
+        self._buffer.extend(data)
+        responses = []
+        pos = 0
+        while len(self._buffer) - pos >= 2:
+            kind = self._buffer[pos]
+            if kind == FRAME_ACK:
+                responses.append(('ack', self._buffer[pos + 1]))
+                pos += 2
+            elif kind == FRAME_NAK:
+                responses.append(('nak', self._buffer[pos + 1]))
+                pos += 2
+            else:
+                pos += 1
+        del self._buffer[:pos]
+        return responses
+
+class RoundTripStats:
+    """单个命令的往返延迟与结果统计"""
+
+    def __init__(self, window: int = 1000):
+        self.sent = 0
+        self.acked = 0
+        self.unacked = 0    # 后续命令已确认但本命令未收到ACK（如仅状态变化才ACK的固件）
+        self.timeouts = 0
+        self.errors = 0
+        self.dropped = 0    # 发送队列已满被丢弃
+        self.rtts = deque(maxlen=window)
+
+    def summary(self) -> Dict[str, float]:
+        """返回统计摘要，延迟单位为毫秒"""
+        result = {
+            'sent': self.sent, 'acked': self.acked, 'unacked': self.unacked,
+            'timeouts': self.timeouts, 'errors': self.errors, 'dropped': self.dropped,
+        }
+        if self.rtts:
+            ordered = sorted(self.rtts)
+            result.update({
+                'rtt_avg_ms': sum(ordered) / len(ordered) * 1000,
+                'rtt_p50_ms': ordered[len(ordered) // 2] * 1000,
+                'rtt_p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'rtt_max_ms': ordered[-1] * 1000,
+            })
+        return result
+
+PROBE_LABEL = 'PROBE'   # 链路探测在统计中的标签
+
+class _PendingCommand:
+    """已发送、等待ACK的命令"""
+    __slots__ = ('key', 'label', 'future', 'send_time', 'replies')
+
+    def __init__(self, key, label: str, future: Future, send_time: float, replies: int = 0):
+        self.key = key
+        self.label = label
+        self.future = future
+        self.send_time = send_time
+        self.replies = replies  # 链路探测还需等待的ERR行数，0表示普通命令
+
+class SerialTransport:
+    """
+    异步串口传输：写队列 + 后台读线程
+    发送线程按顺序编码并写出命令，读线程将应答按先后顺序与未确认的命令匹配，
+    调用方通过Future（结果为True/False）或回调获知是否确认，不会阻塞在串口上
+    """
+
+    def __init__(self, ser: serial.Serial, max_in_flight: int = 4, ack_timeout: float = 1.0,
+                 queue_size: int = 64, logger: Optional[logging.Logger] = None, codec=None):
+        """
+        :param ser: 已打开的串口
+        :param max_in_flight: 最多同时等待ACK的命令数
+        :param ack_timeout: 单个命令等待ACK的超时时间（秒）
+        :param queue_size: 发送队列长度，队满时新命令直接失败
+        :param logger: 日志记录器
+        :param codec: 编解码器（LegacyCodec或BinaryCodec），默认为LegacyCodec
+        """
+        self.serial = ser
+        self.ack_timeout = ack_timeout
+        self.logger = logger or logging.getLogger('SerialTransport')
+        self.codec = codec or LegacyCodec()
+        self.stats: Dict[str, RoundTripStats] = {}
+        self._results = REGISTRY.counter('serial_commands_total', '串口命令按结果计数', ('command', 'result'))
+        self._rtt = REGISTRY.histogram('serial_rtt_seconds', '串口命令往返延迟（秒）', ('command',))
+
+        self._send_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = threading.Semaphore(max_in_flight)
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._reader: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动读写线程"""
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._write_loop, name='serial-writer', daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, name='serial-reader', daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def stop(self, timeout: float = 1.0):
+        """停止读写线程，未确认的命令全部以失败结束"""
+        self._stop.set()
+        for thread in (self._writer, self._reader):
+            if thread is not None:
+                thread.join(timeout)
+        with self._lock:
+            while self._pending:
+                self._resolve(self._pending.popleft(), False)
+        while True:
+            try:
+                payload, future, _ = self._send_queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_result(False)
+
+    def submit(self, payload, callback: Optional[Callable[[Future], None]] = None,
+               label: Optional[str] = None, probe: bool = False) -> Future:
+        """
+        提交命令，立即返回
+        :param payload: 由编解码器编码的内容（旧版协议为命令字符，二进制协议为对象列表）
+        :param callback: 确认或失败时调用，参数为Future
+        :param label: 统计标签，用于队满丢弃时计数
+        :param probe: payload为原样发送的无效命令字节（旧版协议），固件对每个字节回复一行ERR，
+                      收到全部ERR即为成功，用于在不改变开发板状态的情况下确认链路正常
+        :return: Future，结果为是否收到ACK（探测为是否收到应答）
+        """
+        future: Future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        try:
+            self._send_queue.put_nowait((payload, future, probe))
+        except queue.Full:
+            self._record(label or str(payload), 'dropped')
+            future.set_result(False)
+        return future
+
+    def backlog(self) -> int:
+        """排队和等待ACK的命令总数"""
+        return self._send_queue.qsize() + len(self._pending)
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """每个命令的往返延迟统计"""
+        return {label: stats.summary() for label, stats in self.stats.items()}
+
+    def _stats_for(self, label: str) -> RoundTripStats:
+        stats = self.stats.get(label)
+        if stats is None:
+            stats = self.stats.setdefault(label, RoundTripStats())
+        return stats
+
+    def _record(self, label: str, result: str, rtt: Optional[float] = None):
+        """累加命令统计，并同步记录到指标注册表"""
+        stats = self._stats_for(label)
+        setattr(stats, result, getattr(stats, result) + 1)
+        self._results.inc(command=label, result=result)
+        if rtt is not None:
+            stats.rtts.append(rtt)
+            self._rtt.observe(rtt, command=label)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            try:
+                payload, future, probe = self._send_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # 等待空闲的在途名额
+            while not self._in_flight.acquire(timeout=0.1):
+                if self._stop.is_set():
+                    future.set_result(False)
+                    return
+
+            pending = None
+            try:
+                if probe:
+                    key, label, data = None, PROBE_LABEL, bytes(payload)
+                else:
+                    key, label, data = self.codec.encode(payload)
+                pending = _PendingCommand(key, label, future, time.perf_counter(), len(data) if probe else 0)
+                with self._lock:
+                    self._pending.append(pending)
+                self.serial.write(data)
+                self._record(label, 'sent')
+                self.logger.debug("发送命令: %s (%s)", label, key)
+            except Exception as e:
+                self.logger.error(f"发送命令失败: {e}")
+                with self._lock:
+                    if pending is None:
+                        self._in_flight.release()
+                        future.set_result(False)
+                    elif pending in self._pending:
+                        self._pending.remove(pending)
+                        self._record(pending.label, 'errors')
+                        self._resolve(pending, False)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except Exception as e:
+                self.logger.error(f"读取响应失败: {e}")
+                time.sleep(0.1)
+                data = b''
+
+            if data:
+                for kind, key in self.codec.feed(data):
+                    self._handle_response(kind, key)
+
+            self._expire_pending()
+
+    def _handle_response(self, kind: str, key):
+        """将一个应答与等待中的命令匹配"""
+        now = time.perf_counter()
+        with self._lock:
+            if kind == 'err' and key is None:
+                probe = next((p for p in self._pending if p.replies), None)
+                if probe is not None:
+                    # 有效命令不会收到ERR，ERR属于最早的探测；排在它前面的命令没有应答（仅状态变化时ACK的固件）
+                    while self._pending[0] is not probe:
+                        pending = self._pending.popleft()
+                        self._record(pending.label, 'unacked')
+                        self._resolve(pending, False)
+                    probe.replies -= 1
+                    if not probe.replies:
+                        self._pending.popleft()
+                        self._record(probe.label, 'acked', now - probe.send_time)
+                        self._resolve(probe, True)
+                    return
+                # 旧版协议的ERR不带命令，对应最早的未确认命令
+                if self._pending:
+                    pending = self._pending.popleft()
+                    self._record(pending.label, 'errors')
+                    self._resolve(pending, False)
+                self.logger.warning("收到错误响应", extra={'sample': 'err'})
+                return
+
+            match = next((p for p in self._pending if p.key == key), None)
+            if match is None:
+                self.logger.debug("收到无对应命令的响应: %s %s", kind, key)
+                return
+            # 串口按顺序处理，排在前面仍未确认的命令不会再收到ACK
+            while self._pending:
+                pending = self._pending.popleft()
+                if pending is match:
+                    break
+                self._record(pending.label, 'unacked')
+                self._resolve(pending, False)
+
+            if kind == 'ack':
+                self._record(match.label, 'acked', now - match.send_time)
+                self._resolve(match, True)
+                self.logger.debug("命令%s已确认", match.label)
+            else:
+                self._record(match.label, 'errors')
+                self._resolve(match, False)
+                self.logger.warning("命令%s被拒绝", match.label, extra={'sample': 'rejected'})
+
+    def _expire_pending(self):
+        """超时未确认的命令以失败结束"""
+        deadline = time.perf_counter() - self.ack_timeout
+        with self._lock:
+            while self._pending and self._pending[0].send_time < deadline:
+                pending = self._pending.popleft()
+                self._record(pending.label, 'timeouts')
+                self._resolve(pending, False)
+
+    def _resolve(self, pending: _PendingCommand, result: bool):
+        """结束一个在途命令并释放名额（调用方需持有锁或已停止线程）"""
+        self._in_flight.release()
+        if not pending.future.done():
+            pending.future.set_result(result)
 
 class CommunicationProtocol:
     """通信协议类，处理与STM32的串口通信"""
@@ -18,28 +498,44 @@ class CommunicationProtocol:
     ACK_PREFIX = "ACK_"
     ERR_PREFIX = "ERR:"
     
-    def __init__(self, port: str = 'COM3', baudrate: int = 115200):
+    def __init__(self, port: str = 'COM3', baudrate: int = 115200,
+                 max_in_flight: int = 4, ack_timeout: float = 1.0, binary: bool = False, capture=None,
+                 queue_size: int = 64):
         """
         初始化通信协议
         :param port: 串口号
         :param baudrate: 波特率
+        :param max_in_flight: 异步模式下最多同时等待ACK的命令数
+        :param ack_timeout: 等待ACK的超时时间（秒）
+        :param binary: 是否使用二进制帧协议，False时使用旧版单字符协议
+        :param capture: SerialCapture，记录串口收发的所有字节，None表示不抓包
+        :param queue_size: 异步模式发送队列长度，队满时新命令直接失败
         """
         self.port = port
         self.baudrate = baudrate
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.binary = binary
+        self.capture = capture
+        self.queue_size = queue_size
         self.serial: Optional[serial.Serial] = None
+        self.transport: Optional[SerialTransport] = None
+        self.last_state: Optional[str] = None   # 最近提交的状态命令
+        self.state_failed = False               # 该命令是否超时或被拒绝
+        self.state_retries = 0                  # 该命令失败后已重新发送的次数
+        self._state_future: Optional[Future] = None
+        self._state_lock = threading.Lock()
+        self._results = REGISTRY.counter('serial_commands_total', '串口命令按结果计数', ('command', 'result'))
+        self._rtt = REGISTRY.histogram('serial_rtt_seconds', '串口命令往返延迟（秒）', ('command',))
         self._setup_logging()
     
     def _setup_logging(self):
         """配置日志"""
         self.logger = logging.getLogger('CommunicationProtocol')
         if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO)
+            # 终端输出在后台线程完成，逐条命令的确认日志按类别限速
+            setup_async_logging([logging.StreamHandler()], logger=self.logger,
+                                fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
     def connect(self) -> bool:
         """
@@ -52,6 +548,8 @@ class CommunicationProtocol:
                 baudrate=self.baudrate,
                 timeout=1.0
             )
+            if self.capture is not None:
+                self.serial = self.capture.tap(self.serial, self.port, self.baudrate)
             self.logger.info(f"成功连接到串口 {self.port}")
             return True
         except Exception as e:
@@ -60,6 +558,10 @@ class CommunicationProtocol:
     
     def disconnect(self):
         """断开串口连接"""
+        self.reset_state()
+        if self.transport is not None:
+            self.transport.stop()
+            self.transport = None
         if self.serial and self.serial.is_open:
             self.serial.close()
             self.logger.info("串口连接已关闭")
@@ -76,7 +578,7 @@ class CommunicationProtocol:
         
         try:
             self.serial.write(command.encode())
-            self.logger.debug(f"发送命令: {command}")
+            self.logger.debug("发送命令: %s", command)
             return True
         except Exception as e:
             self.logger.error(f"发送命令失败: {e}")
@@ -96,7 +598,7 @@ class CommunicationProtocol:
             self.serial.timeout = timeout
             response = self.serial.readline().decode().strip()
             if response:
-                self.logger.debug(f"收到响应: {response}")
+                self.logger.debug("收到响应: %s", response)
                 return response
             return None
         except Exception as e:
@@ -112,19 +614,154 @@ class CommunicationProtocol:
         if object_type not in [self.CMD_OBJECT_A, self.CMD_OBJECT_B, self.CMD_NO_OBJECT]:
             self.logger.error(f"无效的物体类型: {object_type}")
             return False
+        if self.binary:
+            self.logger.error("二进制协议模式下请使用send_detections")
+            return False
+        
+        if self.transport is not None:
+            # 异步传输已启动时由读线程负责读取响应
+            return self.send_object_detected_async(object_type).result()
         
+        send_time = time.perf_counter()
         success = self.send_command(object_type)
         if success:
+            self._results.inc(command=object_type, result='sent')
             # 等待并验证响应
             response = self.read_response()
             if response and response.startswith(self.ACK_PREFIX):
-                self.logger.info(f"物体{object_type}检测命令已确认")
+                self._results.inc(command=object_type, result='acked')
+                self._rtt.observe(time.perf_counter() - send_time, command=object_type)
+                self.logger.info("物体%s检测命令已确认", object_type, extra={'sample': 'confirmed'})
                 return True
             else:
-                self.logger.warning("未收到有效确认")
+                self._results.inc(command=object_type, result='errors' if response else 'timeouts')
+                self.logger.warning("未收到有效确认", extra={'sample': 'unconfirmed'})
                 return False
         return False
     
+    def start_async(self) -> bool:
+        """
+        启动异步传输，之后读取响应由后台线程完成
+        :return: 是否启动成功
+        """
+        if not self.serial or not self.serial.is_open:
+            self.logger.error("串口未连接")
+            return False
+        if self.transport is None:
+            self.serial.timeout = 0.05
+            codec = BinaryCodec() if self.binary else LegacyCodec()
+            self.transport = SerialTransport(self.serial, self.max_in_flight, self.ack_timeout,
+                                             queue_size=self.queue_size, logger=self.logger, codec=codec)
+            self.transport.start()
+        return True
+    
+    def send_object_detected_async(self, object_type: str,
+                                   callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
+        """
+        异步发送物体检测结果，立即返回
+        :param object_type: 'A' 或 'B' 或 'N'
+        :param callback: 确认或失败时调用，参数为Future
+        :return: Future（结果为是否收到ACK），参数无效或未连接时返回None
+        """
+        if object_type not in [self.CMD_OBJECT_A, self.CMD_OBJECT_B, self.CMD_NO_OBJECT]:
+            self.logger.error(f"无效的物体类型: {object_type}")
+            return None
+        if self.binary:
+            self.logger.error("二进制协议模式下请使用send_detections")
+            return None
+        if not self.start_async():
+            return None
+        return self.transport.submit(object_type, callback)
+    
+    def send_state_async(self, object_type: str,
+                         callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
+        """
+        异步发送检测状态，只在状态变化时发送；上次提交的命令超时或被拒绝后，再次调用时重新发送
+        （与同步版本一样，失败的状态在下一帧重试）
+        :param object_type: 'A' 或 'B' 或 'N'
+        :param callback: 确认或失败时调用，参数为Future
+        :return: Future（结果为是否收到ACK），状态未变化、参数无效或未连接时返回None
+        """
+        with self._state_lock:
+            if object_type == self.last_state and not self.state_failed:
+                return None
+            retry = object_type == self.last_state
+        future = self.send_object_detected_async(object_type, callback)
+        if future is None:
+            return None
+        with self._state_lock:
+            self.state_retries = self.state_retries + 1 if retry else 0
+            self.last_state = object_type
+            self.state_failed = False
+            self._state_future = future
+        future.add_done_callback(self._on_state_done)
+        return future
+
+    def reset_state(self):
+        """忘记已发送的状态（重新连接后对端状态未知），下一次状态必须发送"""
+        with self._state_lock:
+            self.last_state = None
+            self.state_failed = False
+            self.state_retries = 0
+            self._state_future = None
+
+    def _on_state_done(self, future: Future):
+        """最新的状态命令失败时记录下来，下一次调用send_state_async时重新发送"""
+        with self._state_lock:
+            if future is self._state_future and not future.result():
+                self.state_failed = True
+
+    def send_probe_async(self, data: bytes,
+                         callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
+        """
+        异步发送链路探测（旧版协议）：固件对无效命令的每个字节回复ERR，不改变开发板状态
+        :param data: 探测字节，不能包含有效命令字符（见link_setup.PROBE）
+        :param callback: 收到全部应答或超时时调用，参数为Future
+        :return: Future（结果为是否收到应答），二进制模式或未连接时返回None
+        """
+        if self.binary:
+            self.logger.error("二进制协议模式下不支持链路探测")
+            return None
+        if not self.start_async():
+            return None
+        return self.transport.submit(data, callback, label=PROBE_LABEL, probe=True)
+
+    def send_detections(self, objects: Sequence) -> bool:
+        """
+        发送完整检测结果（二进制协议），等待确认
+        :param objects: [(class_id, x, y, w, h, confidence), ...]，坐标为0-1之间的相对值，见normalize_detections
+        :return: 是否收到ACK
+        """
+        future = self.send_detections_async(objects)
+        return future is not None and future.result()
+    
+    def send_detections_async(self, objects: Sequence,
+                              callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
+        """
+        异步发送完整检测结果（二进制协议），立即返回
+        :param objects: [(class_id, x, y, w, h, confidence), ...]，坐标为0-1之间的相对值，见normalize_detections
+        :param callback: 确认或失败时调用，参数为Future
+        :return: Future（结果为是否收到ACK），非二进制模式或未连接时返回None
+        """
+        if not self.binary:
+            self.logger.error("旧版协议不支持发送完整检测结果")
+            return None
+        if not self.start_async():
+            return None
+        return self.transport.submit(list(objects), callback, label=BinaryCodec.LABEL)
+    
+    def backlog(self) -> int:
+        """排队和等待ACK的命令总数（仅异步模式）"""
+        if self.transport is None:
+            return 0
+        return self.transport.backlog()
+    
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """每个命令的往返延迟统计（仅异步模式）"""
+        if self.transport is None:
+            return {}
+        return self.transport.latency_stats()
+    
     def __enter__(self):
         """上下文管理器入口"""
         self.connect()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import queue
+import multiprocessing
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+INDEX_FILE = 'index.jsonl'
+
+class _Segment:
+    """一个录像分段：视频文件 + 同名的检测结果索引（每帧一行JSON）"""
+
+    def __init__(self, output_dir, prefix, extension, fourcc, fps, size, start_time):
+        stem = f"{prefix}_{datetime.fromtimestamp(start_time).strftime('%Y%m%d_%H%M%S_%f')}"
+        self.video_path = os.path.join(output_dir, stem + extension)
+        self.sidecar_path = os.path.join(output_dir, stem + '.jsonl')
+        self.start_time = start_time
+        self.end_time = start_time
+        self.frames = 0
+
+        self._writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self._writer.isOpened():
+            raise RuntimeError(f"无法创建视频文件 {self.video_path}（编码器 {fourcc}）")
+        self._sidecar = open(self.sidecar_path, 'w', encoding='utf-8')
+
+    def write(self, frame, timestamp, detections):
+        self._writer.write(frame)
+        record = {
+            'frame': self.frames,
+            'time': round(timestamp, 6),
+            'detections': [[int(x), int(y), int(w), int(h), label, round(float(confidence), 4)]
+                           for x, y, w, h, label, confidence in detections],
+        }
+        self._sidecar.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.frames += 1
+        self.end_time = timestamp
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.video_path)
+        except OSError:
+            return 0
+
+    def close(self) -> Dict:
+        """关闭分段，返回写入总索引的记录"""
+        self._writer.release()
+        self._sidecar.close()
+        return {
+            'video': os.path.basename(self.video_path),
+            'sidecar': os.path.basename(self.sidecar_path),
+            'start': round(self.start_time, 6),
+            'end': round(self.end_time, 6),
+            'frames': self.frames,
+            'bytes': self.size(),
+        }
+
+def _encoder_main(shm_name, shape, work_queue, done_queue, output_dir, fps, segment_seconds,
+                  segment_bytes, fourcc, extension, prefix):
+    """编码进程入口：从共享内存槽位取帧写入视频分段，写完后归还槽位"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    size = (shape[2], shape[1])
+    segment = None
+    segments = 0
+    done_queue.put(('ready',))
+
+    def rotate(timestamp):
+        nonlocal segment, segments
+        if segment is not None:
+            closing, segment = segment, None
+            _append_index(output_dir, closing.close())
+        segment = _Segment(output_dir, prefix, extension, fourcc, fps, size, timestamp)
+        segments += 1
+
+    def finalize():
+        """出错后关闭当前分段并写入总索引，已写入的帧仍可通过seek()找到"""
+        nonlocal segment
+        if segment is None:
+            return
+        closing, segment = segment, None
+        try:
+            _append_index(output_dir, closing.close())
+        except Exception as e:
+            print(f"错误: 关闭录像分段失败: {e}")
+
+    try:
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            slot, timestamp, submit_time, detections = item
+            ok = True
+            try:
+                # 按时长或文件大小切换分段；文件大小每30帧检查一次，避免频繁stat
+                if (segment is None
+                        or (segment_seconds and timestamp - segment.start_time >= segment_seconds)
+                        or (segment_bytes and segment.frames % 30 == 0 and segment.size() >= segment_bytes)):
+                    rotate(timestamp)
+                segment.write(frames[slot], timestamp, detections)
+            except Exception as e:
+                ok = False
+                print(f"错误: 录像写入失败: {e}")
+                finalize()
+            done_queue.put(('done', slot, time.monotonic() - submit_time, ok))
+    finally:
+        finalize()
+        del frames
+        shm.close()
+        done_queue.put(('closed', segments))
+
+def _append_index(output_dir, record):
+    with open(os.path.join(output_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def seek(output_dir: str, timestamp: float) -> Optional[Tuple[str, int]]:
+    """
+    根据时间戳定位录像
+    :param output_dir: 录像目录
+    :param timestamp: Unix时间戳（秒）
+    :return: (视频文件路径, 帧序号)，可配合 cap.set(cv2.CAP_PROP_POS_FRAMES, 帧序号) 使用；找不到返回None
+    """
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        segments = sorted((json.loads(line) for line in f if line.strip()), key=lambda s: s['start'])
+    if not segments or timestamp < segments[0]['start'] or timestamp > segments[-1]['end']:
+        return None
+
+    # 分段的end是最后一帧的时间，与下一分段的第一帧之间有间隔；按 [start, 下一分段start) 匹配，
+    # 落在间隔中的时间定位到前一分段的最后一帧
+    segment = next(s for s in reversed(segments) if s['start'] <= timestamp)
+    frame_index = 0
+    with open(os.path.join(output_dir, segment['sidecar']), 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record['time'] > timestamp:
+                break
+            frame_index = record['frame']
+    return os.path.join(output_dir, segment['video']), frame_index
+
+class VideoRecorder:
+    """
+    连续录像：标注后的帧拷贝到共享内存槽位，由独立的编码进程写入cv2.VideoWriter分段，
+    编码不占用主进程的GIL和主线程；槽位用尽时丢弃当前帧，不阻塞检测循环
+    分段按时长或文件大小切换，每个分段附带检测结果索引，总索引 index.jsonl 记录各分段的时间范围
+    """
+
+    def __init__(self, output_dir: str, fps: float = 30.0, segment_seconds: float = 300.0,
+                 segment_bytes: int = 0, slots: int = 8, fourcc: str = 'mp4v', extension: str = '.mp4',
+                 prefix: str = 'record'):
+        """
+        :param output_dir: 录像目录
+        :param fps: 视频帧率（写入文件头，实际时间以索引中的时间戳为准）
+        :param segment_seconds: 分段时长（秒），0表示不按时长切换
+        :param segment_bytes: 分段大小上限（字节），0表示不按大小切换
+        :param slots: 共享内存中的帧槽位数，即编码进程最多可落后的帧数
+        :param fourcc: 视频编码FourCC
+        :param extension: 视频文件扩展名
+        :param prefix: 文件名前缀
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.slots = slots
+        self.fourcc = fourcc
+        self.extension = extension
+        self.prefix = prefix
+
+        self.frames = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.segments = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+        self.shape: Optional[Tuple[int, int, int, int]] = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._frames: Optional[np.ndarray] = None
+        self._free: List[int] = []
+        self._process = None
+        self._work_queue = None
+        self._done_queue = None
+
+    def start(self, width: int, height: int) -> bool:
+        """
+        分配共享内存并启动编码进程；未显式调用时在写入第一帧时按帧尺寸自动启动
+        :return: 是否启动成功
+        """
+        if self._process is not None:
+            return True
+        try:
+            self.shape = (self.slots, height, width, 3)
+            self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+            self._frames = np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf)
+            self._free = list(range(self.slots))
+
+            # spawn启动：避免fork继承cv2/DNN的线程状态
+            context = multiprocessing.get_context('spawn')
+            self._work_queue = context.Queue()
+            self._done_queue = context.Queue()
+            self._process = context.Process(
+                target=_encoder_main, name='video-encoder', daemon=True,
+                args=(self._shm.name, self.shape, self._work_queue, self._done_queue, self.output_dir,
+                      self.fps, self.segment_seconds, self.segment_bytes, self.fourcc, self.extension,
+                      self.prefix))
+            self._process.start()
+
+            # 等待编码进程完成导入并连接共享内存，避免开头的帧因进程未就绪被丢弃
+            if self._done_queue.get(timeout=30.0)[0] != 'ready':
+                raise RuntimeError("编码进程启动失败")
+            return True
+        except Exception as e:
+            print(f"错误: 无法启动录像进程: {e}")
+            if self._process is not None and self._process.is_alive():
+                self._process.terminate()
+            self._release_shm()
+            self._process = None
+            return False
+
+    def write(self, frame, detections, timestamp: Optional[float] = None) -> bool:
+        """
+        提交一帧标注后的图像，只做一次内存拷贝，立即返回
+        :param frame: BGR图像，尺寸与录像不同时会缩放
+        :param detections: 该帧的检测结果，写入索引
+        :param timestamp: 帧时间（Unix时间戳），默认为当前时间
+        :return: 是否已提交，编码进程落后导致槽位用尽时返回False
+        """
+        if self._process is None:
+            height, width = frame.shape[:2]
+            if not self.start(width, height):
+                return False
+
+        self.frames += 1
+        self._collect()
+        if not self._free or not self._process.is_alive():
+            self.dropped += 1
+            return False
+
+        slot = self._free.pop()
+        height, width = self.shape[1:3]
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        self._frames[slot] = frame
+        self._work_queue.put((slot, time.time() if timestamp is None else timestamp, time.monotonic(),
+                              list(detections)))
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """等待已提交的帧编码完成，关闭当前分段并释放共享内存"""
+        if self._process is None:
+            return
+        self._work_queue.put(None)
+        deadline = time.monotonic() + timeout
+        while self._process.is_alive() and time.monotonic() < deadline:
+            self._collect(timeout=0.1)
+        if self._process.is_alive():
+            print("警告: 录像进程未能按时退出，强制结束")
+            self._process.terminate()
+        self._process.join(1.0)
+        self._collect()
+        self._release_shm()
+
+    def metrics(self) -> Dict[str, float]:
+        """提交/写入/丢弃帧数、编码延迟（提交到写入完成）及分段数"""
+        return {
+            'frames': self.frames,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'segments': self.segments,
+            'pending': self.slots - len(self._free) if self._process is not None else 0,
+            'lag_ms_avg': self.lag_total / self.written * 1000 if self.written else 0.0,
+            'lag_ms_max': self.lag_max * 1000,
+        }
+
+    def _collect(self, timeout: Optional[float] = None):
+        """回收编码进程归还的槽位并累计编码延迟"""
+        while True:
+            try:
+                if timeout is None:
+                    message = self._done_queue.get_nowait()
+                else:
+                    message = self._done_queue.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if message[0] == 'done':
+                _, slot, lag, ok = message
+                self._free.append(slot)
+                if not ok:
+                    self.errors += 1
+                    continue
+                self.written += 1
+                self.lag_total += lag
+                self.lag_max = max(self.lag_max, lag)
+            elif message[0] == 'closed':
+                _, self.segments = message
+            timeout = None
+
+    def _release_shm(self):
+        self._frames = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
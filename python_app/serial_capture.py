@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口抓包：把每次收发的字节块连同单调时钟时间戳追加写入紧凑的二进制文件，
+读取端用mmap逐条遍历，scripts/replay_capture.py可按原速或加速重放
+
+文件格式（小端序）：
+  文件头 16字节: MAGIC b'SCAP' | VERSION u8 | 保留3字节 | 抓包开始时的墙上时间 float64（秒）
+  记录头  7字节: DELTA u32 | KIND u8 | LEN u16，之后是LEN字节数据
+    DELTA = 距上一条记录的微秒数（第一条为距文件开始），间隔超过u32时先写入空的GAP记录
+    KIND  = 通道号<<2 | 类型，类型见KIND_*；OPEN记录的数据为"端口 波特率"
+连续到达的字节块（如按in_waiting逐字节读取的一行应答）合并为一条记录，单字节命令每条记录只占8字节；
+文件超过max_bytes时轮换为.1、.2……，新文件开头重新写入各通道的OPEN记录
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+MAGIC = b'SCAP'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3xd')
+RECORD_HEADER = struct.Struct('<IBH')
+
+KIND_TX = 0    # PC发出
+KIND_RX = 1    # PC收到
+KIND_OPEN = 2  # 通道（串口）打开或重新连接
+KIND_GAP = 3   # 只用于延长时间间隔
+KIND_NAMES = {KIND_TX: 'TX', KIND_RX: 'RX', KIND_OPEN: 'OPEN', KIND_GAP: 'GAP'}
+
+MAX_CHANNELS = 64
+_MAX_DELTA = 0xFFFFFFFF
+_MAX_CHUNK = 0xFFFF
+_FLUSH_BYTES = 64 * 1024          # 缓冲区超过这个大小时提前唤醒写入线程
+_MAX_PENDING = 8 * 1024 * 1024    # 写盘跟不上时内存中最多积压的字节数，超过后丢弃记录并计数
+_LEN_FIELD = struct.Struct('<H')  # 记录头中的LEN字段，合并记录时原地改写
+_LEN_OFFSET = 5
+MERGE_SECONDS = 0.001             # 同一通道同一方向的字节块间隔小于这个时间时合并为一条记录
+
+class CaptureRecord(NamedTuple):
+    time: float      # 距文件开始的秒数
+    channel: int
+    kind: int
+    data: bytes
+
+class SerialCapture:
+    """
+    追加写入的抓包文件，可同时记录多个串口（通道）
+    - record()只在内存缓冲区中追加记录，写盘和轮换由后台线程在锁外完成，串口读写线程不等待磁盘
+    - 读线程按in_waiting逐字节读取时，同一通道同一方向、间隔不超过MERGE_SECONDS
+      （低波特率下为3个字节时间）的字节块合并为一条记录，时间为第一个字节到达的时间
+    - 多个线程（写线程、读线程）可以同时记录
+    """
+
+    def __init__(self, path: str, max_bytes: int = 16 * 1024 * 1024, backups: int = 3,
+                 flush_interval: float = 1.0):
+        """
+        :param path: 抓包文件路径
+        :param max_bytes: 单个文件的大小上限，超过时轮换，0表示不轮换
+        :param backups: 保留的历史文件数
+        :param flush_interval: 写入文件的间隔（秒）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self.records = 0
+        self.payload_bytes = 0
+        self.rotations = 0
+        self.dropped = 0
+
+        self._channels: Dict[str, Tuple[int, int]] = {}  # 端口 -> (通道号, 波特率)
+        self._merge_us: Dict[int, int] = {}              # 通道号 -> 合并间隔（微秒）
+        self._active = False
+        self._file = None
+        self._file_bytes = 0                 # 当前文件的字节数（含尚未写盘的部分），决定何时轮换
+        self._buffer = bytearray()
+        self._sealed: List[bytes] = []       # 已写满的文件内容，写盘后轮换
+        self._sealed_bytes = 0
+        self._tail: Optional[Tuple[int, int, int]] = None  # 缓冲区中最后一条收发记录：(偏移, KIND字节, 最后追加时间)
+        self._start = 0.0
+        self._last_us = 0
+        self._lock = threading.Lock()        # 保护缓冲区，只在内存中追加时持有
+        self._io_lock = threading.Lock()     # 串行化写盘与轮换
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        创建抓包文件（已存在时先轮换）并启动写入线程
+        :return: 是否成功
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with self._io_lock:
+                if os.path.exists(self.path):
+                    self._rotate_files()
+                self._file = open(self.path, 'wb')
+        except OSError as e:
+            print(f"错误: 无法创建抓包文件{self.path}: {e}")
+            return False
+        with self._lock:
+            self._active = True
+            self._begin_file_locked()
+        self._flusher = threading.Thread(target=self._flush_loop, name='serial-capture', daemon=True)
+        self._flusher.start()
+        print(f"串口抓包: {self.path}")
+        return True
+
+    def close(self):
+        """写入剩余数据并关闭文件"""
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(2.0)
+            self._flusher = None
+        with self._lock:
+            active, self._active = self._active, False
+        if not active:
+            return
+        try:
+            self._flush()
+        except OSError as e:
+            print(f"警告: 写入抓包文件失败: {e}")
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        dropped = f", 积压丢弃{self.dropped}条" if self.dropped else ''
+        print(f"串口抓包: {self.records}条记录, 数据{self.payload_bytes}字节, 轮换{self.rotations}次{dropped}")
+
+    def channel(self, port: str, baudrate: int) -> int:
+        """
+        登记一个串口并写入OPEN记录，同一端口重复登记（如重连）时沿用原通道号
+        :return: 通道号
+        """
+        with self._lock:
+            if port in self._channels:
+                channel = self._channels[port][0]
+            else:
+                channel = len(self._channels)
+                if channel >= MAX_CHANNELS:
+                    raise ValueError(f"抓包通道数超过上限{MAX_CHANNELS}")
+            self._channels[port] = (channel, baudrate)
+            # 每字节10位；低波特率下字节间隔超过1ms，按3个字节时间合并
+            byte_us = 10 * 1e6 / baudrate if baudrate > 0 else 0
+            self._merge_us[channel] = int(max(MERGE_SECONDS * 1e6, 3 * byte_us))
+            if self._active:
+                self._append_locked(channel, KIND_OPEN, f"{port} {baudrate}".encode('utf-8'))
+        return channel
+
+    def tap(self, ser, port: str, baudrate: int) -> 'CapturedSerial':
+        """包装一个已打开的串口，之后经过它的收发都会被记录"""
+        return CapturedSerial(ser, self, self.channel(port, baudrate))
+
+    def record(self, channel: int, kind: int, data: bytes):
+        """记录一个字节块"""
+        if not data:
+            return
+        with self._lock:
+            if not self._active:
+                return
+            for offset in range(0, len(data), _MAX_CHUNK):
+                self._append_locked(channel, kind, data[offset:offset + _MAX_CHUNK])
+            wake = len(self._buffer) >= _FLUSH_BYTES or self._sealed
+        if wake:
+            self._wake.set()
+
+    def _append_locked(self, channel: int, kind: int, data: bytes):
+        now_us = int((time.perf_counter() - self._start) * 1e6)
+        key = channel << 2 | kind
+        tail = self._tail
+        if tail is not None and tail[1] == key and now_us - tail[2] <= self._merge_us.get(channel, 0):
+            offset = tail[0]
+            length = _LEN_FIELD.unpack_from(self._buffer, offset + _LEN_OFFSET)[0]
+            if length + len(data) <= _MAX_CHUNK:
+                _LEN_FIELD.pack_into(self._buffer, offset + _LEN_OFFSET, length + len(data))
+                self._buffer += data
+                self._file_bytes += len(data)
+                self.payload_bytes += len(data)
+                self._tail = (offset, key, now_us)
+                return
+
+        size = RECORD_HEADER.size + len(data)
+        if kind != KIND_OPEN and self._sealed_bytes + len(self._buffer) + size > _MAX_PENDING:
+            self.dropped += 1
+            return
+        if self.max_bytes and self._file_bytes + size > self.max_bytes:
+            # 当前文件的内容交给写入线程，写盘后轮换；新文件的内容从文件头开始
+            self._sealed.append(bytes(self._buffer))
+            self._sealed_bytes += len(self._buffer)
+            self._buffer.clear()
+            self.rotations += 1
+            self._begin_file_locked()
+            now_us = int((time.perf_counter() - self._start) * 1e6)
+
+        delta = max(0, now_us - self._last_us)
+        while delta > _MAX_DELTA:
+            self._buffer += RECORD_HEADER.pack(_MAX_DELTA, channel << 2 | KIND_GAP, 0)
+            self._file_bytes += RECORD_HEADER.size
+            delta -= _MAX_DELTA
+        offset = len(self._buffer)
+        self._buffer += RECORD_HEADER.pack(delta, key, len(data))
+        self._buffer += data
+        self._file_bytes += size
+        self._last_us += delta
+        if kind in (KIND_TX, KIND_RX):
+            self.records += 1
+            self.payload_bytes += len(data)
+            self._tail = (offset, key, now_us)
+        else:
+            self._tail = None
+
+    def _begin_file_locked(self):
+        """新文件的内容：文件头，时间基准从此刻开始，再重新写入各通道的OPEN记录"""
+        self._buffer += FILE_HEADER.pack(MAGIC, VERSION, time.time())
+        self._file_bytes = FILE_HEADER.size
+        self._start = time.perf_counter()
+        self._last_us = 0
+        self._tail = None
+        for port, (channel, baudrate) in self._channels.items():
+            self._append_locked(channel, KIND_OPEN, f"{port} {baudrate}".encode('utf-8'))
+
+    def _rotate_files(self):
+        if self.backups <= 0:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _flush(self):
+        """在锁内换出缓冲区，写盘、轮换和flush都在锁外完成"""
+        with self._io_lock:
+            with self._lock:
+                sealed, self._sealed, self._sealed_bytes = self._sealed, [], 0
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                self._tail = None
+            if self._file is None:
+                return
+            for content in sealed:
+                self._file.write(content)
+                self._file.close()
+                self._file = None
+                self._rotate_files()
+                self._file = open(self.path, 'wb')
+            if data:
+                self._file.write(data)
+            self._file.flush()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._flush()
+            except OSError as e:
+                print(f"警告: 写入抓包文件失败: {e}")
+
+class CapturedSerial:
+    """serial.Serial的包装：经过write/read/readline的字节块被记录，其余属性和方法直接转发"""
+
+    def __init__(self, ser, capture: SerialCapture, channel: int):
+        object.__setattr__(self, '_serial', ser)
+        object.__setattr__(self, '_capture', capture)
+        object.__setattr__(self, '_channel', channel)
+
+    def write(self, data) -> Optional[int]:
+        written = self._serial.write(data)
+        data = bytes(data)
+        self._capture.record(self._channel, KIND_TX, data if written is None else data[:written])
+        return written
+
+    def read(self, size: int = 1) -> bytes:
+        data = self._serial.read(size)
+        self._capture.record(self._channel, KIND_RX, data)
+        return data
+
+    def readline(self, *args, **kwargs) -> bytes:
+        data = self._serial.readline(*args, **kwargs)
+        self._capture.record(self._channel, KIND_RX, data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._serial, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._serial, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._serial.close()
+
+class CaptureReader:
+    """用mmap读取抓包文件；文件末尾不完整的记录（进程被强制结束时）会被忽略"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start_time = 0.0
+        self.truncated = False
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._channels: Optional[Dict[int, Tuple[str, int]]] = None
+
+    def open(self) -> bool:
+        try:
+            self._file = open(self.path, 'rb')
+            size = os.fstat(self._file.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise ValueError("文件过短")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.start_time = FILE_HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是抓包文件或版本不支持（{magic!r} v{version}）")
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取抓包文件{self.path}: {e}")
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def channels(self) -> Dict[int, Tuple[str, int]]:
+        """{通道号: (端口, 波特率)}，以文件中最后一次OPEN记录为准"""
+        if self._channels is None:
+            self._channels = {}
+            for _ in self.records(kinds=()):
+                pass
+        return self._channels
+
+    def channel_of(self, port: str) -> Optional[int]:
+        return next((channel for channel, (name, _) in self.channels.items() if name == port), None)
+
+    def records(self, channel: Optional[int] = None,
+                kinds: Optional[Sequence[int]] = (KIND_TX, KIND_RX)) -> Iterator[CaptureRecord]:
+        """
+        按时间顺序遍历记录
+        :param channel: 只返回该通道的记录，None表示全部
+        :param kinds: 只返回这些类型的记录，None表示全部
+        """
+        data = self._map
+        if data is None:
+            return
+        channels = {}
+        offset = FILE_HEADER.size
+        end = len(data)
+        now_us = 0
+        while offset + RECORD_HEADER.size <= end:
+            delta, kind_byte, length = RECORD_HEADER.unpack_from(data, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > end:
+                self.truncated = True
+                break
+            now_us += delta
+            record_channel, kind = kind_byte >> 2, kind_byte & 0x3
+            if kind == KIND_OPEN:
+                port, _, baudrate = data[offset:offset + length].decode('utf-8', errors='replace').rpartition(' ')
+                channels[record_channel] = (port, int(baudrate) if baudrate.isdigit() else 0)
+            if (channel is None or record_channel == channel) and (kinds is None or kind in kinds):
+                yield CaptureRecord(now_us / 1e6, record_channel, kind, data[offset:offset + length])
+            offset += length
+        else:
+            self.truncated = offset != end
+        self._channels = channels
+
+def _format_chunk(data: bytes) -> str:
+    text = data.decode('ascii', errors='replace')
+    if all(32 <= byte < 127 or byte in (10, 13) for byte in data):
+        return repr(text)
+    return data.hex(' ')
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='查看串口抓包文件')
+    parser.add_argument('path', help='抓包文件')
+    parser.add_argument('--dump', action='store_true', help='逐条打印记录')
+    parser.add_argument('--port', default=None, help='只显示该串口的记录')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    reader = CaptureReader(args.path)
+    if not reader.open():
+        sys.exit(1)
+    with reader:
+        channel = None
+        if args.port is not None:
+            channel = reader.channel_of(args.port)
+            if channel is None:
+                print(f"错误: 抓包中没有串口{args.port}")
+                sys.exit(1)
+        totals: Dict[Tuple[int, int], list] = {}
+        last_time = 0.0
+        for record in reader.records(channel, kinds=None):
+            if record.kind in (KIND_TX, KIND_RX):
+                total = totals.setdefault((record.channel, record.kind), [0, 0])
+                total[0] += 1
+                total[1] += len(record.data)
+            last_time = record.time
+            if args.dump and record.kind != KIND_GAP:
+                print(f"{record.time:12.6f} ch{record.channel} {KIND_NAMES[record.kind]:4} {_format_chunk(record.data)}")
+
+        start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.start_time))
+        print(f"{args.path}: 开始于{start}, 时长{last_time:.3f}秒" + ("（末尾记录不完整）" if reader.truncated else ""))
+        for number, (port, baudrate) in sorted(reader.channels.items()):
+            if channel is not None and number != channel:
+                continue
+            tx = totals.get((number, KIND_TX), [0, 0])
+            rx = totals.get((number, KIND_RX), [0, 0])
+            print(f"  通道{number} {port} {baudrate}波特率: TX {tx[0]}次/{tx[1]}字节, RX {rx[0]}次/{rx[1]}字节")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from link_setup import PROBE
+from metrics import REGISTRY
+from protocol import CommunicationProtocol, RoundTripStats, frame_size
+
+PORT_UP = 'up'              # 已连接，最近的命令正常确认
+PORT_DEGRADED = 'degraded'  # 已连接，但最近有命令失败或超时
+PORT_DOWN = 'down'          # 未连接，后台重连中
+
+PORT_UP_GAUGE = REGISTRY.gauge('serial_port_up', '串口是否已连接（1/0）', ('port',))
+PORT_RECONNECTS = REGISTRY.counter('serial_port_reconnects_total', '串口重连成功次数', ('port',))
+PORT_LATENCY = REGISTRY.histogram('serial_port_latency_seconds', '命令从提交到确认的延迟（秒）', ('port',))
+
+def parse_routes(specs: Iterable[str]) -> Dict[str, str]:
+    """
+    解析路由规则
+    :param specs: ['COM4=A', 'COM5=B', ...]，等号右边为该端口负责的命令
+    :return: {端口: 命令集合字符串}
+    """
+    routes = {}
+    for spec in specs:
+        port, sep, commands = spec.partition('=')
+        if not sep or not port or not commands:
+            raise ValueError(f"无效的路由规则: {spec}（格式为 端口=命令，如 COM4=A）")
+        routes[port] = commands
+    return routes
+
+class SerialLink:
+    """
+    连接池中的单个串口：独立的CommunicationProtocol（自带写线程和读线程）和监控线程
+    - 连续失败达到max_failures次时断开，由监控线程按退避间隔重连，不影响其他端口
+    - 断开期间提交的命令直接丢弃，不排队
+    - 失败的状态命令在下一帧重发；仍无应答时按退避间隔继续重发，并用探测确认链路：
+      仅状态变化时ACK的固件（Inc/protocol.h）对开发板已显示的状态不回复，重发的超时不计入连续失败次数，
+      探测字节固件总会回复ERR（不改变状态），探测失败才计入
+    """
+
+    def __init__(self, port: str, baudrate: int = 115200, commands: Optional[str] = None,
+                 max_in_flight: int = 4, ack_timeout: float = 1.0, binary: bool = False,
+                 max_failures: int = 5, retry_interval: float = 1.0, max_retry_interval: float = 10.0,
+                 budget_bytes_per_s: float = 0.0, logger: Optional[logging.Logger] = None, capture=None):
+        """
+        :param port: 串口号
+        :param baudrate: 波特率
+        :param commands: 该端口负责的命令（如'A'），其他状态按'N'发送；None表示镜像全部状态
+        :param max_in_flight: 最多同时等待ACK的命令数
+        :param ack_timeout: 等待ACK的超时时间（秒）
+        :param binary: 是否使用二进制帧协议
+        :param max_failures: 连续失败多少次后判定断开并重连
+        :param retry_interval: 首次重连间隔（秒），失败后逐次加倍
+        :param max_retry_interval: 重连间隔上限（秒）
+        :param budget_bytes_per_s: 发送字节速率上限（按实测链路容量设置，见link_setup），0表示不限
+        :param capture: SerialCapture，记录该端口收发的所有字节（可多个端口共用），None表示不抓包
+        """
+        self.port = port
+        self.commands = commands
+        self.max_in_flight = max_in_flight
+        self.max_failures = max_failures
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.budget_bytes_per_s = budget_bytes_per_s
+        self.protocol = CommunicationProtocol(port=port, baudrate=baudrate, max_in_flight=max_in_flight,
+                                              ack_timeout=ack_timeout, binary=binary, capture=capture)
+        self.logger = logger or self.protocol.logger
+
+        self.state = PORT_DOWN
+        self.failures = 0
+        self.reconnects = 0
+        self.last_ack: Optional[float] = None
+        self.throttled = 0
+        self.probes = 0
+        self.stats = RoundTripStats()
+        self._next_send = 0.0
+        self._resend_at = 0.0   # 失败的状态命令下一次允许重发的时间
+        self._probe_future: Optional[Future] = None
+        self._probe_ok = False  # 上次发送状态命令之后探测已确认链路正常
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        尝试连接并启动监控线程；连接失败时由监控线程继续重连
+        :return: 首次是否连接成功
+        """
+        connected = self._connect()
+        self._monitor = threading.Thread(target=self._monitor_loop, name=f'serial-monitor-{self.port}',
+                                         daemon=True)
+        self._monitor.start()
+        return connected
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._monitor is not None:
+            self._monitor.join(2.0)
+        self.protocol.disconnect()
+        self._set_state(PORT_DOWN)
+
+    def route(self, state: str) -> str:
+        """把检测状态转换为该端口要发送的命令"""
+        if self.commands is None or state in self.commands:
+            return state
+        return CommunicationProtocol.CMD_NO_OBJECT
+
+    @property
+    def last_sent(self) -> Optional[str]:
+        """最近提交的状态命令"""
+        return self.protocol.last_state
+
+    def send_state(self, state: str, callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
+        """
+        按路由规则发送状态，命令与上次提交的相同时不发送；上次的命令失败后在下一帧重发，
+        重发仍失败时按retry_interval起逐次加倍（上限max_retry_interval）的间隔重发，期间探测链路
+        :param state: 'A' / 'B' / 'N'
+        :param callback: 命令确认或失败时调用，参数为Future（SerialPool包装成按端口的回调后传入）
+        :return: Future，未发送（含只发送了探测）或已丢弃时返回None
+        """
+        command = self.route(state)
+        protocol = self.protocol
+        retry = command == protocol.last_state
+        if retry:
+            if not protocol.state_failed:
+                return None
+            if protocol.state_retries > 0:
+                self._probe()
+                if time.monotonic() < self._resend_at:
+                    return None
+        # 重发的超时不计入连续失败：开发板可能已经显示该状态，只是固件不再回复
+        future = self._submit(lambda: protocol.send_state_async(command), len(command), counted=not retry)
+        if future is not None:
+            retries = protocol.state_retries
+            delay = min(self.retry_interval * 2 ** min(retries - 1, 16), self.max_retry_interval) if retries else 0.0
+            self._resend_at = time.monotonic() + delay
+            self._probe_ok = False
+            if callback is not None:
+                future.add_done_callback(callback)
+        return future
+
+    def send_detections(self, objects: Sequence) -> Optional[Future]:
+        """发送完整检测结果（二进制协议）；该端口在途命令已满时跳过，避免积压过期数据"""
+        if self.state != PORT_DOWN and self.protocol.backlog() >= self.max_in_flight:
+            return None
+        return self._submit(lambda: self.protocol.send_detections_async(objects), frame_size(len(objects)))
+
+    def health(self) -> Dict:
+        """端口健康状态与延迟统计"""
+        result = {
+            'state': self.state,
+            'failures': self.failures,
+            'reconnects': self.reconnects,
+            'throttled': self.throttled,
+            'probes': self.probes,
+            'last_ack_age_s': None if self.last_ack is None else round(time.monotonic() - self.last_ack, 3),
+            'backlog': self.protocol.backlog(),
+        }
+        result.update(self.stats.summary())
+        return result
+
+    def _probe(self):
+        """发送探测字节确认链路；上一个探测还在途或链路已确认时不发送"""
+        if self._probe_ok or self._probe_future is not None:
+            return
+        future = self._submit(lambda: self.protocol.send_probe_async(PROBE), len(PROBE))
+        if future is None:
+            return
+        self.probes += 1
+        self._probe_future = future
+        future.add_done_callback(self._on_probe_done)
+
+    def _on_probe_done(self, future: Future):
+        """探测收到应答时到下一次发送状态命令前不再探测；超时已在_on_done中计入连续失败，下一帧再次探测"""
+        with self._lock:
+            if future is self._probe_future:
+                self._probe_future = None
+                self._probe_ok = future.result()
+
+    def _submit(self, send: Callable[[], Optional[Future]], size: int, counted: bool = True) -> Optional[Future]:
+        if self.state == PORT_DOWN:
+            self.stats.dropped += 1
+            return None
+        if self.budget_bytes_per_s > 0:
+            # 按字节预算排布发送时间，超出预算的状态命令留到之后的帧，检测结果直接跳过
+            now = time.monotonic()
+            if now < self._next_send:
+                self.throttled += 1
+                return None
+            self._next_send = now + size / self.budget_bytes_per_s
+        submit_time = time.perf_counter()
+        future = send()
+        if future is None:
+            self.stats.dropped += 1
+            return None
+        self.stats.sent += 1
+        future.add_done_callback(lambda f: self._on_done(f, submit_time, counted))
+        return future
+
+    def _on_done(self, future: Future, submit_time: float, counted: bool = True):
+        """
+        命令结束时更新健康状态（在读写线程中调用，只做计数）
+        :param counted: 失败时是否计入连续失败次数
+        """
+        with self._lock:
+            if future.result():
+                latency = time.perf_counter() - submit_time
+                self.stats.acked += 1
+                self.stats.rtts.append(latency)
+                PORT_LATENCY.observe(latency, port=self.port)
+                self.failures = 0
+                self.last_ack = time.monotonic()
+                if self.state == PORT_DEGRADED:
+                    self._set_state(PORT_UP)
+                return
+            self.stats.errors += 1
+            if not counted:
+                return
+            self.failures += 1
+            if self.state == PORT_UP:
+                self._set_state(PORT_DEGRADED)
+            if self.failures >= self.max_failures:
+                # 断开和重连交给监控线程，避免在读写线程中等待它们自己退出
+                self._wake.set()
+
+    def _connect(self) -> bool:
+        if not self.protocol.connect() or not self.protocol.start_async():
+            self.protocol.disconnect()
+            return False
+        with self._lock:
+            self.failures = 0
+            # 重连后对端状态未知，下一次状态必须重新发送
+            self.protocol.reset_state()
+            self._resend_at = 0.0
+            self._probe_future = None
+            self._probe_ok = False
+            self._set_state(PORT_UP)
+        return True
+
+    def _monitor_loop(self):
+        interval = self.retry_interval
+        while not self._stop.is_set():
+            if self.state != PORT_DOWN:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                if self._stop.is_set() or self.failures < self.max_failures:
+                    continue
+                self.logger.warning(f"串口{self.port}连续{self.failures}次失败，断开后重连")
+                self._set_state(PORT_DOWN)
+                self.protocol.disconnect()
+                interval = self.retry_interval
+
+            if self._stop.wait(interval):
+                break
+            if self._connect():
+                self.reconnects += 1
+                PORT_RECONNECTS.inc(port=self.port)
+                self.logger.info(f"串口{self.port}已重新连接")
+                interval = self.retry_interval
+            else:
+                interval = min(interval * 2, self.max_retry_interval)
+
+    def _set_state(self, state: str):
+        self.state = state
+        PORT_UP_GAUGE.set(0 if state == PORT_DOWN else 1, port=self.port)
+
+class SerialPool:
+    """
+    串口连接池：一个检测程序同时驱动多块STM32
+    - 每个端口有独立的发送队列、写线程、读线程和监控线程，send_*只把命令放入各端口的队列，立即返回
+    - 路由规则：未配置的端口镜像全部状态，配置了命令的端口只显示自己负责的状态（其余按'N'发送）
+    - 某个端口变慢或被拔出只影响它自己：在途名额和队列按端口独立，断开的端口在后台重连
+    """
+
+    def __init__(self, ports: Sequence[str], baudrate: int = 115200, routes: Optional[Dict[str, str]] = None,
+                 max_in_flight: int = 4, ack_timeout: float = 1.0, binary: bool = False,
+                 max_failures: int = 5, retry_interval: float = 1.0, baudrates: Optional[Dict[str, int]] = None,
+                 budgets: Optional[Dict[str, float]] = None, capture=None):
+        """
+        :param ports: 串口号列表
+        :param baudrate: 波特率
+        :param routes: {端口: 负责的命令}，未列出的端口镜像全部状态，见parse_routes
+        :param max_in_flight: 每个端口最多同时等待ACK的命令数
+        :param ack_timeout: 等待ACK的超时时间（秒）
+        :param binary: 是否使用二进制帧协议
+        :param max_failures: 连续失败多少次后判定断开并重连
+        :param retry_interval: 首次重连间隔（秒）
+        :param baudrates: {端口: 波特率}，覆盖baudrate（如链路协商的结果）
+        :param budgets: {端口: 发送字节速率上限}，未列出的端口不限速
+        :param capture: SerialCapture，所有端口的收发写入同一个抓包文件（按端口分通道）
+        """
+        routes = routes or {}
+        baudrates = baudrates or {}
+        budgets = budgets or {}
+        unknown = set(routes) - set(ports)
+        if unknown:
+            raise ValueError(f"路由规则中的端口不在端口列表中: {', '.join(sorted(unknown))}")
+        self.links: List[SerialLink] = [
+            SerialLink(port, baudrates.get(port, baudrate), commands=routes.get(port), max_in_flight=max_in_flight,
+                       ack_timeout=ack_timeout, binary=binary, max_failures=max_failures,
+                       retry_interval=retry_interval, budget_bytes_per_s=budgets.get(port, 0.0), capture=capture)
+            for port in ports
+        ]
+
+    def start(self) -> bool:
+        """
+        并发连接所有端口，连接失败的端口在后台继续重连
+        :return: 是否至少有一个端口连接成功
+        """
+        results = {}
+        threads = [threading.Thread(target=lambda link=link: results.__setitem__(link.port, link.start()))
+                   for link in self.links]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for port, connected in results.items():
+            if not connected:
+                print(f"警告: 串口{port}连接失败，将在后台重连")
+        return any(results.values())
+
+    def close(self):
+        for link in self.links:
+            link.stop()
+
+    def send_state(self, state: str, callback: Optional[Callable[[str, Future], None]] = None) -> int:
+        """
+        按路由规则向各端口发送检测状态，每个端口只在自己的命令变化时发送，失败的命令重发一次
+        :param state: 'A' / 'B' / 'N'
+        :param callback: 某个端口的命令确认或失败时调用，参数为(端口, Future)
+        :return: 本次提交的端口数
+        """
+        submitted = 0
+        for link in self.links:
+            done = None if callback is None else (lambda f, port=link.port: callback(port, f))
+            if link.send_state(state, done) is not None:
+                submitted += 1
+        return submitted
+
+    def send_detections(self, objects: Sequence) -> int:
+        """
+        向所有端口广播完整检测结果（二进制协议），在途命令已满的端口跳过本帧
+        :return: 本次提交的端口数
+        """
+        objects = list(objects)
+        return sum(1 for link in self.links if link.send_detections(objects) is not None)
+
+    def health(self) -> Dict[str, Dict]:
+        """每个端口的健康状态与延迟统计"""
+        return {link.port: link.health() for link in self.links}
+
+    def latency_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """每个端口当前连接上按命令统计的往返延迟"""
+        return {link.port: link.protocol.latency_stats() for link in self.links}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
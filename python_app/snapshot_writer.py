@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+
+DROP_NEWEST = 'drop-newest'  # 队满时丢弃新提交的快照
+DROP_OLDEST = 'drop-oldest'  # 队满时丢弃最早排队的快照
+BLOCK = 'block'              # 队满时等待（会阻塞调用方）
+DROP_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+class SnapshotWriter:
+    """
+    后台快照写入器：检测循环只负责入队，JPEG编码和写盘由写线程完成
+    文件名带微秒时间戳和递增序号，同一秒内多次保存不会互相覆盖
+    """
+
+    def __init__(self, output_dir: str, workers: int = 2, queue_size: int = 16,
+                 drop_policy: str = DROP_OLDEST, batch_size: int = 1, jpeg_quality: int = 95,
+                 prefix: str = 'detection'):
+        """
+        :param output_dir: 输出目录
+        :param workers: 写线程数（cv2.imencode会释放GIL）
+        :param queue_size: 队列长度
+        :param drop_policy: 队满时的处理策略，见DROP_POLICIES
+        :param batch_size: 每个写线程一次最多取出并编码的快照数
+        :param jpeg_quality: JPEG质量
+        :param prefix: 文件名前缀
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"无效的丢弃策略: {drop_policy}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.drop_policy = drop_policy
+        self.batch_size = max(1, batch_size)
+        self.prefix = prefix
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+
+        self.saved = 0
+        self.dropped = 0
+        self.errors = 0
+        self.encode_time = 0.0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._worker, name=f'snapshot-writer-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, frame, copy: bool = False) -> Optional[str]:
+        """
+        提交一帧待保存，立即返回
+        :param frame: BGR图像
+        :param copy: 是否复制图像；调用方之后还会修改该帧时需设为True
+        :return: 将要写入的文件路径，被丢弃时返回None（drop-oldest策略下之后仍可能被更新的快照挤出）
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        filename = os.path.join(
+            self.output_dir, f"{self.prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{seq:06d}.jpg")
+        item = (filename, frame.copy() if copy else frame)
+
+        if self.drop_policy == BLOCK:
+            self._queue.put(item)
+            return filename
+        try:
+            self._queue.put_nowait(item)
+            return filename
+        except queue.Full:
+            pass
+
+        with self._lock:
+            self.dropped += 1
+        if self.drop_policy == DROP_NEWEST:
+            return None
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+            return filename
+        except queue.Full:
+            return None
+
+    def close(self, timeout: float = 5.0):
+        """等待队列中的快照写完后停止写线程"""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def metrics(self) -> Dict[str, float]:
+        """队列深度、保存/丢弃/失败计数及平均编码耗时"""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'saved': self.saved,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'encode_ms_avg': self.encode_time / self.saved * 1000 if self.saved else 0.0,
+        }
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                batch: List = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for filename, frame in batch:
+                self._write(filename, frame)
+
+    def _write(self, filename: str, frame):
+        start_time = time.perf_counter()
+        try:
+            ok, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+            if not ok:
+                raise RuntimeError("JPEG编码失败")
+            with open(filename, 'wb') as f:
+                f.write(buffer)
+            with self._lock:
+                self.saved += 1
+                self.encode_time += time.perf_counter() - start_time
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"错误: 无法保存检测结果: {e}")
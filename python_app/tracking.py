@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+class _TrackedBox:
+    """关键帧检测到的物体及其跟踪点"""
+    __slots__ = ('x', 'y', 'w', 'h', 'label', 'confidence', 'points')
+
+    def __init__(self, x, y, w, h, label, confidence, points):
+        self.x, self.y, self.w, self.h = float(x), float(y), float(w), float(h)
+        self.label = label
+        self.confidence = confidence
+        self.points = points
+
+    def as_detection(self):
+        return (int(self.x), int(self.y), int(self.w), int(self.h), self.label, self.confidence)
+
+class KeyframeTracker:
+    """
+    关键帧模式：每N帧运行一次完整检测，中间帧用稀疏Lucas-Kanade光流传播检测框
+    N根据实测推理耗时和画面运动自适应调整；跟踪点丢失过多或置信度衰减过低时立即重新检测
+    process() 与 YoloDetector.detect() 接口一致，可直接替换
+    """
+
+    def __init__(self, detector, interval: int = 5, adaptive: bool = True, target_fps: float = 30.0,
+                 min_interval: int = 1, max_interval: int = 30, min_confidence: float = 0.3,
+                 confidence_decay: float = 0.97, motion_threshold: float = 8.0, max_points: int = 20):
+        """
+        :param detector: YoloDetector
+        :param interval: 初始关键帧间隔N
+        :param adaptive: 是否根据推理耗时和运动自适应调整N
+        :param target_fps: 自适应时希望达到的输出帧率
+        :param min_interval: N的下限
+        :param max_interval: N的上限
+        :param min_confidence: 传播后的置信度低于该值时重新检测
+        :param confidence_decay: 每传播一帧置信度乘以的系数
+        :param motion_threshold: 每帧平均位移（像素）超过该值视为快速运动，缩短N
+        :param max_points: 每个框内最多跟踪的特征点数
+        """
+        self.detector = detector
+        self.interval = interval
+        self.adaptive = adaptive
+        self.target_fps = target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+        self.motion_threshold = motion_threshold
+        self.max_points = max_points
+
+        self.last_was_keyframe = False
+        self.keyframes = 0
+        self.tracked_frames = 0
+
+        self._boxes: List[_TrackedBox] = []
+        self._prev_gray: Optional[np.ndarray] = None
+        self._since_keyframe = 0
+        self._inference_ema: Optional[float] = None
+        self._track_ema: Optional[float] = None
+        self._motion_ema = 0.0
+
+    def process(self, frame):
+        """
+        处理一帧
+        :return: (detections, inference_time)，非关键帧的inference_time为光流跟踪耗时
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if self._needs_keyframe():
+            return self._keyframe(frame, gray)
+
+        start_time = time.perf_counter()
+        ok = self._propagate(gray)
+        elapsed = time.perf_counter() - start_time
+        if not ok:
+            return self._keyframe(frame, gray)
+
+        self._track_ema = self._ema(self._track_ema, elapsed)
+        self._prev_gray = gray
+        self._since_keyframe += 1
+        self.tracked_frames += 1
+        self.last_was_keyframe = False
+        return [box.as_detection() for box in self._boxes], elapsed
+
+    def _needs_keyframe(self) -> bool:
+        if self._prev_gray is None or self._since_keyframe + 1 >= self.interval:
+            return True
+        return any(box.confidence < self.min_confidence for box in self._boxes)
+
+    def _keyframe(self, frame, gray):
+        detections, inference_time = self.detector.detect(frame)
+        self._boxes = [_TrackedBox(x, y, w, h, label, confidence, self._select_points(gray, x, y, w, h))
+                       for x, y, w, h, label, confidence in detections]
+        self._prev_gray = gray
+        self._since_keyframe = 0
+        self.keyframes += 1
+        self.last_was_keyframe = True
+
+        self._inference_ema = self._ema(self._inference_ema, inference_time)
+        if self.adaptive:
+            self._adapt_interval()
+        return detections, inference_time
+
+    def _select_points(self, gray, x, y, w, h) -> np.ndarray:
+        """在框内选取角点，纹理不足时退化为均匀网格点"""
+        height, width = gray.shape
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            return np.empty((0, 1, 2), dtype=np.float32)
+
+        points = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1], self.max_points, 0.01, 3)
+        if points is None or len(points) < 4:
+            xs = np.linspace(x0 + (x1 - x0) * 0.25, x0 + (x1 - x0) * 0.75, 3)
+            ys = np.linspace(y0 + (y1 - y0) * 0.25, y0 + (y1 - y0) * 0.75, 3)
+            grid = np.array([[px, py] for py in ys for px in xs], dtype=np.float32)
+            return grid.reshape(-1, 1, 2)
+        return (points + np.array([x0, y0], dtype=np.float32)).astype(np.float32)
+
+    def _propagate(self, gray) -> bool:
+        """
+        用光流移动所有框
+        :return: 是否跟踪成功，失败时需要重新检测
+        """
+        if not self._boxes:
+            return True
+
+        counts = [len(box.points) for box in self._boxes]
+        if min(counts) == 0:
+            return False
+        all_points = np.concatenate([box.points for box in self._boxes])
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, all_points, None,
+                                                          winSize=(15, 15), maxLevel=2)
+        if next_points is None:
+            return False
+
+        status = status.reshape(-1).astype(bool)
+        motions = []
+        offset = 0
+        for box, count in zip(self._boxes, counts):
+            ok = status[offset:offset + count]
+            old = all_points[offset:offset + count][ok].reshape(-1, 2)
+            new = next_points[offset:offset + count][ok].reshape(-1, 2)
+            offset += count
+
+            # 超过一半的点丢失视为跟踪失败
+            if len(new) < max(2, count // 2):
+                return False
+
+            dx, dy = np.median(new - old, axis=0)
+            box.x += float(dx)
+            box.y += float(dy)
+            box.points = new.reshape(-1, 1, 2)
+            box.confidence *= self.confidence_decay * len(new) / count
+            motions.append(math.hypot(dx, dy))
+
+        self._motion_ema = 0.8 * self._motion_ema + 0.2 * float(np.mean(motions))
+        return True
+
+    def _adapt_interval(self):
+        """
+        按摊销耗时选择N：推理耗时/N + 跟踪耗时 <= 目标帧间隔；
+        运动较快时N减半，以免传播误差累积
+        """
+        frame_budget = 1.0 / self.target_fps
+        track_cost = self._track_ema or 0.0
+        spare = max(frame_budget - track_cost, frame_budget * 0.1)
+        interval = math.ceil(self._inference_ema / spare)
+        if self._motion_ema > self.motion_threshold:
+            interval = max(1, interval // 2)
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+
+    @staticmethod
+    def _ema(current: Optional[float], value: float, alpha: float = 0.2) -> float:
+        return value if current is None else (1 - alpha) * current + alpha * value
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""基准脚本公用工具：模拟帧与模型、视频/图片源、延迟统计、运行环境信息"""
+
+import os
+import sys
+import glob
+import platform
+import tempfile
+import subprocess
+from typing import Dict, Iterator, Optional
+
+import cv2
+import numpy as np
+
+PYTHON_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app')
+sys.path.insert(0, PYTHON_APP_DIR)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def make_synthetic_frame(width: int = 640, height: int = 480, seed: int = 0) -> np.ndarray:
+    """生成带若干矩形的噪声帧"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    for _ in range(4):
+        x, y = int(rng.integers(0, width // 2)), int(rng.integers(0, height // 2))
+        w, h = int(rng.integers(width // 10, width // 2)), int(rng.integers(height // 10, height // 2))
+        color = tuple(int(c) for c in rng.integers(64, 255, size=3))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+    return frame
+
+def write_synthetic_weights(path: Optional[str] = None, num_floats: int = 8_000_000) -> str:
+    """
+    写出随机Darknet权重文件，用于没有真实权重时测量网络结构的推理耗时
+    取值范围保证yolov4-tiny输出为有限值，检测结果本身没有意义
+    :return: 权重文件路径
+    """
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), 'yolo-synthetic.weights')
+    if os.path.isfile(path):
+        return path
+    with open(path, 'wb') as f:
+        np.array([0, 2, 5], dtype=np.int32).tofile(f)
+        np.array([0], dtype=np.int64).tofile(f)
+        np.random.default_rng(0).uniform(0.004, 0.014, num_floats).astype(np.float32).tofile(f)
+    return path
+
+def resolve_model_files(config: str, weights: str, names: str):
+    """
+    查找模型文件，相对路径同时在当前目录和python_app目录下查找
+    权重文件缺失时使用随机权重
+    :return: (config, weights, names, 是否为模拟权重)
+    """
+    def find(path):
+        if os.path.isfile(path):
+            return path
+        candidate = os.path.join(PYTHON_APP_DIR, path)
+        return candidate if os.path.isfile(candidate) else path
+
+    config, weights, names = find(config), find(weights), find(names)
+    if os.path.isfile(weights):
+        return config, weights, names, False
+    return config, write_synthetic_weights(), names, True
+
+def iter_frames(source: Optional[str], count: int = 100, width: int = 640,
+                height: int = 480) -> Iterator[np.ndarray]:
+    """
+    依次产生帧：视频文件、图片目录，或source为空时产生模拟帧
+    :param count: 最多产生的帧数
+    """
+    produced = 0
+    if source is None:
+        base = make_synthetic_frame(width, height)
+        while produced < count:
+            # 每帧平移，避免完全相同的输入
+            yield np.roll(base, produced * 4, axis=1)
+            produced += 1
+    elif os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, '*')) if p.lower().endswith(IMAGE_EXTENSIONS))
+        for path in paths[:count]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+    else:
+        cap = cv2.VideoCapture(source)
+        try:
+            while produced < count:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+                produced += 1
+        finally:
+            cap.release()
+
+def summarize(samples) -> Dict[str, float]:
+    """延迟样本（秒）的统计摘要，单位毫秒；吞吐量单位为每秒次数"""
+    if len(samples) == 0:
+        return {'count': 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    mean = float(values.mean())
+    return {
+        'count': int(len(values)),
+        'mean_ms': mean,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(values.max()),
+        'throughput_per_s': 1000.0 / mean if mean > 0 else 0.0,
+    }
+
+def machine_info() -> Dict[str, str]:
+    """运行环境信息，便于跨机器、跨提交比较结果"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = 'unknown'
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'commit': commit,
+    }
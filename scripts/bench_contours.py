@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""轮廓分类微基准：原有全分辨率逐轮廓实现 vs 金字塔缩小 + 向量化实现（480p/720p/1080p）"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from bench_common import make_synthetic_frame, machine_info
+from main import classify_objects
+
+RESOLUTIONS = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='轮廓分类微基准')
+    parser.add_argument('--iterations', type=int, default=100, help='每种实现、每种分辨率的重复次数')
+    parser.add_argument('--work-width', type=int, default=320, help='向量化实现的金字塔层最小宽度')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    return parser.parse_args()
+
+def detect_objects_legacy(frame):
+    """原有实现：全分辨率Canny，逐个轮廓判断，返回第一个满足条件的类型，作为对照"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > 1000:
+            x, y, w, h = cv2.boundingRect(contour)
+            ratio = w / float(h)
+            if 0.8 < ratio < 1.2:
+                return 'A'
+            elif ratio > 1.5:
+                return 'B'
+    return 'N'
+
+def time_per_frame(fn, frames, iterations):
+    """返回每帧平均耗时（毫秒）"""
+    fn(frames[0])
+    start_time = time.perf_counter()
+    for i in range(iterations):
+        fn(frames[i % len(frames)])
+    return (time.perf_counter() - start_time) / iterations * 1000
+
+def main():
+    args = parse_arguments()
+    report = {'machine': machine_info(), 'iterations': args.iterations, 'work_width': args.work_width,
+              'results': {}}
+
+    for name, (width, height) in RESOLUTIONS.items():
+        frames = [make_synthetic_frame(width, height, seed) for seed in range(8)]
+        legacy_ms = time_per_frame(detect_objects_legacy, frames, args.iterations)
+        vectorized_ms = time_per_frame(lambda f: classify_objects(f, args.work_width), frames, args.iterations)
+        report['results'][name] = {
+            'legacy_ms': round(legacy_ms, 3),
+            'vectorized_ms': round(vectorized_ms, 3),
+            'speedup': round(legacy_ms / vectorized_ms, 2),
+        }
+        print(f"{name:>6}: 原实现 {legacy_ms:.2f}ms/帧, 向量化 {vectorized_ms:.2f}ms/帧, "
+              f"加速 {legacy_ms / vectorized_ms:.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+if __name__ == '__main__':
+    main()
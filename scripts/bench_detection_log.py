@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检测日志基准：列式检测日志与逐帧JSONL（录像sidecar的写法）对比
+- 写入：检测循环中每帧append的耗时、磁盘占用
+- 查询：某时间段内某类别的全部检测（常见类别person和稀有类别），列式日志用mmap按块筛选，JSONL逐行解析
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from bench_common import machine_info, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from detection_log import DetectionLog, DetectionLogReader
+
+CLASSES = [f'class{i}' for i in range(80)]
+CLASSES[0], CLASSES[2] = 'person', 'car'
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='检测日志基准')
+    parser.add_argument('--frames', type=int, default=200000, help='模拟的帧数')
+    parser.add_argument('--fps', type=float, default=15.0, help='模拟的帧率（决定时间跨度）')
+    parser.add_argument('--block-frames', type=int, default=300, help='每块帧数')
+    parser.add_argument('--output', default=None, help='结果JSON文件，不指定时输出到标准输出')
+    return parser.parse_args()
+
+def make_frames(count, fps, seed=0):
+    """模拟检测结果：平均每帧2个物体，person和car占多数，少量稀有类别"""
+    rng = np.random.default_rng(seed)
+    start = time.time() - count / fps
+    probabilities = np.full(80, 0.1 / 78)
+    probabilities[0], probabilities[2] = 0.6, 0.3
+    frames = []
+    for i in range(count):
+        n = rng.poisson(2.0)
+        classes = rng.choice(80, size=n, p=probabilities)
+        boxes = rng.integers(0, 600, size=(n, 4))
+        confidences = rng.uniform(0.5, 1.0, size=n)
+        detections = [(int(b[0]), int(b[1]), int(b[2]), int(b[3]), CLASSES[c], float(p))
+                      for b, c, p in zip(boxes, classes, confidences)]
+        frames.append((i, start + i / fps, detections))
+    return frames
+
+def write_columnar(directory, frames, block_frames):
+    log = DetectionLog(directory, CLASSES, block_frames=block_frames, block_seconds=1e9, queue_size=1024)
+    if not log.start():
+        raise SystemExit(1)
+    samples = []
+    for frame_id, timestamp, detections in frames:
+        call_start = time.perf_counter()
+        log.append(frame_id, detections, timestamp)
+        samples.append(time.perf_counter() - call_start)
+    log.close(timeout=60.0)
+    return samples, log.metrics()
+
+def write_jsonl(path, frames):
+    samples = []
+    with open(path, 'w', encoding='utf-8') as f:
+        for frame_id, timestamp, detections in frames:
+            call_start = time.perf_counter()
+            record = {
+                'frame': frame_id,
+                'time': round(timestamp, 6),
+                'detections': [[x, y, w, h, label, round(confidence, 4)] for x, y, w, h, label, confidence in detections],
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            samples.append(time.perf_counter() - call_start)
+    return samples
+
+def query_jsonl(path, t0, t1, label):
+    hits = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if t0 <= record['time'] <= t1:
+                hits += sum(1 for detection in record['detections'] if detection[4] == label)
+    return hits
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def timed(fn, repeat=3):
+    """多次运行取最快一次（秒）和结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    args = parse_arguments()
+    frames = make_frames(args.frames, args.fps)
+    workdir = tempfile.mkdtemp(prefix='bench_detection_log_')
+    try:
+        log_dir = os.path.join(workdir, 'detections')
+        jsonl_path = os.path.join(workdir, 'detections.jsonl')
+        columnar_samples, log_metrics = write_columnar(log_dir, frames, args.block_frames)
+        jsonl_samples = write_jsonl(jsonl_path, frames)
+
+        # 查询中间10%的时间段
+        t_start, t_end = frames[0][1], frames[-1][1]
+        t0 = t_start + (t_end - t_start) * 0.45
+        t1 = t_start + (t_end - t_start) * 0.55
+        rare = CLASSES[57]
+
+        reader = DetectionLogReader(log_dir)
+        if not reader.open():
+            raise SystemExit(1)
+        queries = {}
+        for label in ('person', rare):
+            columnar_time, rows = timed(lambda: reader.query(t0, t1, [label]))
+            jsonl_time, hits = timed(lambda: query_jsonl(jsonl_path, t0, t1, label), repeat=1)
+            queries[label] = {
+                'hits': len(rows),
+                'hits_match': len(rows) == hits,
+                'blocks_read': int(len(reader.select_blocks(t0, t1, reader.class_ids([label])))),
+                'columnar_ms': round(columnar_time * 1000, 2),
+                'jsonl_ms': round(jsonl_time * 1000, 2),
+                'speedup': round(jsonl_time / max(columnar_time, 1e-9), 1),
+            }
+        all_time, rows = timed(lambda: reader.query(classes=['person']))
+        queries['person_all_time'] = {'hits': len(rows), 'columnar_ms': round(all_time * 1000, 2)}
+        reader.close()
+
+        columnar = summarize(columnar_samples)
+        jsonl = summarize(jsonl_samples)
+        report = {
+            'machine': machine_info(),
+            'frames': args.frames,
+            'detections': log_metrics['rows'],
+            'span_hours': round((t_end - t_start) / 3600, 2),
+            'write': {
+                'columnar_append_p50_us': round(columnar['p50_ms'] * 1000, 2),
+                'columnar_append_p99_us': round(columnar['p99_ms'] * 1000, 2),
+                'columnar_append_max_us': round(columnar['max_ms'] * 1000, 2),
+                'jsonl_write_p50_us': round(jsonl['p50_ms'] * 1000, 2),
+                'jsonl_write_p99_us': round(jsonl['p99_ms'] * 1000, 2),
+                'columnar_bytes': directory_bytes(log_dir),
+                'jsonl_bytes': os.path.getsize(jsonl_path),
+                'blocks': log_metrics['blocks'],
+                'dropped_blocks': log_metrics['dropped_blocks'],
+            },
+            'queries': queries,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"结果已写入: {args.output}")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
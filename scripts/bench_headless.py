@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+headless模式基准：同一检测循环在三种显示方式下的帧率
+- window：绘制检测框和状态文字 + imshow/waitKey（默认窗口模式）
+- overlay：headless但需要标注画面（--save/--record），只绘制不显示
+- headless：不绘制、不显示
+没有图形环境时跳过window模式
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from bench_common import iter_frames, machine_info, resolve_model_files, summarize
+from detector import YoloDetector
+from display import Display
+from object_detection import draw_detections, draw_status
+
+MODES = ('window', 'overlay', 'headless')
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='headless模式基准')
+    parser.add_argument('--source', default=None, help='视频文件或图片目录，不指定时使用模拟帧')
+    parser.add_argument('--frames', type=int, default=60, help='每种模式处理的帧数')
+    parser.add_argument('--width', type=int, default=640, help='模拟帧宽度')
+    parser.add_argument('--height', type=int, default=480, help='模拟帧高度')
+    parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
+    parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径，缺失时使用随机权重')
+    parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--no-detect', action='store_true', help='不运行检测，只测量绘制与显示的开销')
+    parser.add_argument('--output', default=None, help='结果JSON文件，不指定时输出到标准输出')
+    return parser.parse_args()
+
+def has_display() -> bool:
+    """Linux下没有X11/Wayland时创建窗口会直接终止进程，需要提前判断"""
+    if sys.platform.startswith('linux'):
+        return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return True
+
+def bench_mode(mode, detect, frames, colors):
+    """
+    运行一种显示方式
+    :return: (帧率, 每帧绘制+显示耗时样本)
+    """
+    display = Display("bench_headless", headless=mode != 'window')
+    annotate = mode != 'headless'
+    render_samples = []
+    try:
+        start_time = time.perf_counter()
+        for frame in frames:
+            frame = frame.copy()
+            detections, inference_time = detect(frame)
+
+            render_start = time.perf_counter()
+            if annotate:
+                frame = draw_detections(frame, detections, colors)
+                draw_status(frame, None, inference_time, len(detections))
+            display.show(frame)
+            render_samples.append(time.perf_counter() - render_start)
+        fps = len(frames) / (time.perf_counter() - start_time)
+    finally:
+        display.close()
+    return fps, render_samples
+
+def main():
+    args = parse_arguments()
+    frames = list(iter_frames(args.source, args.frames, args.width, args.height))
+    height, width = frames[0].shape[:2]
+
+    synthetic_model = None
+    if args.no_detect:
+        # 固定的检测框，保证绘制开销与有目标时相当
+        boxes = [(40 + 60 * i, 40 + 30 * i, 80, 120, 'person', 0.9) for i in range(5)]
+        detect = lambda frame: (boxes, 0.0)
+    else:
+        config, weights, names, synthetic_model = resolve_model_files(args.config, args.weights, args.names)
+        detector = YoloDetector.from_files(config, weights, names)
+        if detector is None:
+            raise SystemExit(1)
+        detector.detect(frames[0])
+        detect = detector.detect
+    colors = np.random.uniform(0, 255, size=(100, 3))
+
+    results = {}
+    for mode in MODES:
+        if mode == 'window' and not has_display():
+            results[mode] = {'skipped': '没有图形环境（DISPLAY/WAYLAND_DISPLAY未设置）'}
+            continue
+        try:
+            fps, render_samples = bench_mode(mode, detect, frames, colors)
+        except cv2.error as e:
+            results[mode] = {'skipped': f'无法创建窗口: {e}'}
+            continue
+        render = summarize(render_samples)
+        results[mode] = {
+            'fps': round(fps, 2),
+            'render_p50_ms': round(render['p50_ms'], 3),
+            'render_p95_ms': round(render['p95_ms'], 3),
+        }
+
+    baseline = results['window'].get('fps') or results['overlay']['fps']
+    for mode in MODES:
+        if 'fps' in results[mode]:
+            results[mode]['speedup'] = round(results[mode]['fps'] / baseline, 3)
+
+    report = {
+        'machine': machine_info(),
+        'synthetic_model': synthetic_model,
+        'detect': not args.no_detect,
+        'frames': len(frames),
+        'frame_size': [width, height],
+        'baseline': 'window' if results['window'].get('fps') else 'overlay',
+        'modes': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"结果已写入: {args.output}")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
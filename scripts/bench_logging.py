@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志开销基准：测量每条命令日志在调用线程上的耗时
+- sync：logging.basicConfig式的同步FileHandler，f-string消息（原sync_protocol.py的写法）
+- async：AsyncLogHandler，格式化与写文件在后台线程，不采样
+- sampled：AsyncLogHandler + 按类别限速（默认每类每秒1条）
+--slow-ms模拟慢存储（SD卡、网络盘）的单次写入耗时
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+from bench_common import machine_info, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from async_logging import DEFAULT_FORMAT, AsyncLogHandler, SamplingFilter
+
+MODES = ('sync', 'async', 'sampled')
+
+class SlowFileHandler(logging.FileHandler):
+    """每次写入额外等待一段时间，模拟慢存储"""
+
+    def __init__(self, path: str, delay: float):
+        super().__init__(path)
+        self.delay = delay
+
+    def emit(self, record):
+        super().emit(record)
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='日志开销基准')
+    parser.add_argument('--count', type=int, default=20000, help='每种方式记录的日志条数')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='每秒记录的条数（模拟命令速率），0表示连续记录')
+    parser.add_argument('--slow-ms', type=float, default=0.0, help='每次写入额外的耗时（毫秒）')
+    parser.add_argument('--capacity', type=int, default=10000, help='异步日志最多积压的条数')
+    parser.add_argument('--output', default=None, help='结果JSON文件，不指定时输出到标准输出')
+    return parser.parse_args()
+
+def make_logger(mode, path, args):
+    """
+    创建一种方式的logger
+    :return: (logger, AsyncLogHandler或None)
+    """
+    logger = logging.getLogger(f'bench_logging.{mode}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    target = SlowFileHandler(path, args.slow_ms / 1000.0)
+    target.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+    if mode == 'sync':
+        logger.addHandler(target)
+        return logger, None
+    sampler = SamplingFilter(1.0, 5) if mode == 'sampled' else None
+    handler = AsyncLogHandler([target], args.capacity, sampler, summary_interval=1.0)
+    logger.addHandler(handler)
+    return logger, handler
+
+def bench_mode(mode, args):
+    """运行一种方式，返回调用耗时统计和写出情况"""
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    logger, handler = make_logger(mode, path, args)
+    commands = ('A', 'B', 'N')
+    descriptions = {'A': '检测到物体A', 'B': '检测到物体B', 'N': '未检测到物体'}
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    samples = []
+    try:
+        start_time = time.perf_counter()
+        for i in range(args.count):
+            if interval:
+                # 按命令速率等待，后台线程有时间写出
+                while time.perf_counter() < start_time + i * interval:
+                    time.sleep(0.0002)
+            cmd = commands[i % 3]
+            call_start = time.perf_counter()
+            if mode == 'sync':
+                logger.info(f"发送命令: {cmd} ({descriptions[cmd]})")
+            else:
+                logger.info("发送命令: %s (%s)", cmd, descriptions[cmd], extra={'sample': 'send'})
+            samples.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start_time
+
+        drain_start = time.perf_counter()
+        if handler is not None:
+            handler.close(timeout=60.0)
+        drain = time.perf_counter() - drain_start
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = sum(1 for line in f if '发送命令' in line)
+    finally:
+        os.remove(path)
+
+    stats = summarize(samples)
+    return {
+        'call_p50_us': round(stats['p50_ms'] * 1000, 2),
+        'call_p99_us': round(stats['p99_ms'] * 1000, 2),
+        'call_max_us': round(stats['max_ms'] * 1000, 2),
+        'call_mean_us': round(stats['mean_ms'] * 1000, 2),
+        'calls_per_s': round(args.count / elapsed, 1),
+        'written': lines,
+        'dropped': handler.dropped if handler is not None else 0,
+        'drain_s': round(drain, 3),
+    }
+
+def main():
+    args = parse_arguments()
+    results = {mode: bench_mode(mode, args) for mode in MODES}
+    baseline = results['sync']['call_mean_us']
+    for mode in MODES:
+        results[mode]['speedup'] = round(baseline / max(results[mode]['call_mean_us'], 1e-3), 2)
+
+    report = {
+        'machine': machine_info(),
+        'count': args.count,
+        'rate': args.rate,
+        'slow_ms': args.slow_ms,
+        'capacity': args.capacity,
+        'modes': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"结果已写入: {args.output}")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线回放基准：无摄像头、无窗口，逐阶段测量检测流水线延迟
+阶段：采集/解码 -> 预处理(blobFromImage) -> 前向传播 -> 解码+NMS -> 绘制 -> JPEG保存
+结果以JSON输出，包含各阶段p50/p95/p99延迟与吞吐量
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+
+import cv2
+import numpy as np
+
+from bench_common import iter_frames, machine_info, resolve_model_files, summarize
+from detector import YoloDetector
+from object_detection import draw_detections
+
+STAGES = ('capture', 'preprocess', 'forward', 'decode_nms', 'draw', 'jpeg_save')
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='离线回放基准')
+    parser.add_argument('--source', default=None, help='视频文件或图片目录，不指定时使用模拟帧')
+    parser.add_argument('--frames', type=int, default=100, help='最多处理的帧数')
+    parser.add_argument('--warmup', type=int, default=3, help='不计入统计的预热帧数')
+    parser.add_argument('--width', type=int, default=640, help='模拟帧宽度')
+    parser.add_argument('--height', type=int, default=480, help='模拟帧高度')
+    parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
+    parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径，缺失时使用随机权重')
+    parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--confidence', type=float, default=0.5, help='置信度阈值')
+    parser.add_argument('--nms', type=float, default=0.4, help='非极大值抑制阈值')
+    parser.add_argument('--save-dir', default=None, help='JPEG保存目录，默认为临时目录（结束后删除）')
+    parser.add_argument('--output', default=None, help='结果JSON文件，不指定时输出到标准输出')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    config, weights, names, synthetic_model = resolve_model_files(args.config, args.weights, args.names)
+    detector = YoloDetector.from_files(config, weights, names,
+                                       confidence_threshold=args.confidence, nms_threshold=args.nms)
+    if detector is None:
+        raise SystemExit(1)
+
+    save_dir = args.save_dir or tempfile.mkdtemp(prefix='bench_pipeline_')
+    os.makedirs(save_dir, exist_ok=True)
+    colors = np.random.default_rng(0).uniform(0, 255, size=(100, 3))
+
+    samples = {stage: [] for stage in STAGES}
+    totals = []
+    detection_count = 0
+    frames = iter_frames(args.source, args.frames + args.warmup, args.width, args.height)
+    frame_index = 0
+    wall_start = None
+
+    try:
+        while True:
+            t0 = time.perf_counter()
+            frame = next(frames, None)
+            if frame is None:
+                break
+            t1 = time.perf_counter()
+            blob = detector.preprocess([frame])
+            t2 = time.perf_counter()
+            outs = detector.infer(blob)[0]
+            t3 = time.perf_counter()
+            height, width = frame.shape[:2]
+            detections = detector.postprocess(outs, width, height)
+            t4 = time.perf_counter()
+            draw_detections(frame, detections, colors)
+            t5 = time.perf_counter()
+            cv2.imwrite(os.path.join(save_dir, f"frame_{frame_index:06d}.jpg"), frame)
+            t6 = time.perf_counter()
+
+            frame_index += 1
+            if frame_index <= args.warmup:
+                continue
+            if wall_start is None:
+                wall_start = t0
+            for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+                samples[stage].append(elapsed)
+            totals.append(t6 - t0)
+            detection_count += len(detections)
+    finally:
+        # 没有指定--save-dir时JPEG只用于计时，测完删除临时目录
+        if args.save_dir is None:
+            shutil.rmtree(save_dir, ignore_errors=True)
+
+    measured = len(totals)
+    wall_time = (time.perf_counter() - wall_start) if wall_start is not None else 0.0
+    report = {
+        'machine': machine_info(),
+        'source': args.source or f'synthetic {args.width}x{args.height}',
+        'synthetic_model': synthetic_model,
+        'frames': measured,
+        'detections': detection_count,
+        'wall_time_s': wall_time,
+        'fps': measured / wall_time if wall_time > 0 else 0.0,
+        'stages': {stage: summarize(samples[stage]) for stage in STAGES},
+        'total': summarize(totals),
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"结果已保存到: {args.output}")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
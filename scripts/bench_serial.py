@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""串口协议吞吐量与延迟基准：在虚拟STM32开发板上比较同步发送、异步发送与二进制帧"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+from virtual_stm32 import VirtualBoard
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from protocol import CommunicationProtocol
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='串口协议吞吐量与延迟基准')
+    parser.add_argument('--baud', type=int, default=9600, help='模拟的波特率')
+    parser.add_argument('--count', type=int, default=60, help='每项测试发送的命令数')
+    parser.add_argument('--pattern', default='ABN', help='循环发送的命令序列，如"AAB"可观察仅变化才ACK的固件')
+    parser.add_argument('--in-flight', type=int, default=4, help='异步模式最多同时等待ACK的命令数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='应答随机延迟上限（秒）')
+    parser.add_argument('--drop', type=float, default=0.0, help='接收字节丢弃概率')
+    parser.add_argument('--ack-timeout', type=float, default=0.5, help='等待ACK的超时时间（秒）')
+    return parser.parse_args()
+
+def run_case(mode, args, send):
+    """
+    在指定固件模式下运行一项测试，返回结果摘要
+    速率按收到ACK的命令数计算；有命令因发送队列已满被丢弃时该项测试失败（ok为False）
+    """
+    with VirtualBoard(mode, args.baud, args.jitter, args.drop, seed=0) as board:
+        # 异步测试一次性提交全部命令，发送队列按命令数分配，避免队满丢弃
+        protocol = CommunicationProtocol(port=board.port, baudrate=args.baud, max_in_flight=args.in_flight,
+                                         ack_timeout=args.ack_timeout, binary=(mode == 'binary'),
+                                         queue_size=max(64, args.count))
+        protocol.logger.setLevel(logging.ERROR)
+        if not protocol.connect():
+            return None
+        try:
+            start_time = time.perf_counter()
+            acked = send(protocol)
+            elapsed = time.perf_counter() - start_time
+            latency = protocol.latency_stats()
+            dropped = sum(stats['dropped'] for stats in latency.values())
+            return {
+                'ok': dropped == 0,
+                'commands_per_s': acked / elapsed,
+                'sent': args.count,
+                'acked': acked,
+                'dropped': dropped,
+                'elapsed_s': elapsed,
+                'board': dict(board.stats),
+                'latency': latency,
+            }
+        finally:
+            protocol.disconnect()
+
+def main():
+    args = parse_arguments()
+    commands = [args.pattern[i % len(args.pattern)] for i in range(args.count)]
+    objects = [(0, 0.1, 0.2, 0.3, 0.4, 0.9), (2, 0.5, 0.5, 0.1, 0.1, 0.6)]
+
+    def send_sync(protocol):
+        return sum(protocol.send_object_detected(cmd) for cmd in commands)
+
+    def send_async(protocol):
+        futures = [protocol.send_object_detected_async(cmd) for cmd in commands]
+        return sum(future.result() for future in futures)
+
+    def send_binary(protocol):
+        futures = [protocol.send_detections_async(objects) for _ in range(args.count)]
+        return sum(future.result() for future in futures)
+
+    results = {}
+    for mode in ('always-ack', 'ack-on-change'):
+        results[f'{mode}/sync'] = run_case(mode, args, send_sync)
+        results[f'{mode}/async'] = run_case(mode, args, send_async)
+    results['binary/async'] = run_case('binary', args, send_binary)
+
+    print(json.dumps({'baud': args.baud, 'count': args.count, 'pattern': args.pattern, 'results': results},
+                     indent=2, ensure_ascii=False))
+
+    failed = [name for name, result in results.items() if result is None or not result['ok']]
+    if failed:
+        print(f"错误: 以下测试有命令未发送（连接失败或发送队列已满）: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
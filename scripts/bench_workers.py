@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程推理扩展性基准：单进程检测器 vs 1..N个推理进程（共享内存环形缓冲区）
+每种配置保持所有槽位都在推理，测量吞吐量（帧/秒）与相对单进程的加速比
+"""
+
+import os
+import json
+import time
+import argparse
+
+import cv2
+
+from bench_common import iter_frames, machine_info, resolve_model_files
+from detector import YoloDetector
+from inference_pool import InferencePool
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='多进程推理扩展性基准')
+    parser.add_argument('--source', default=None, help='视频文件或图片目录，不指定时使用模拟帧')
+    parser.add_argument('--frames', type=int, default=60, help='每种配置处理的帧数')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='最多测试的推理进程数')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='每个推理进程的OpenCV线程数')
+    parser.add_argument('--width', type=int, default=640, help='模拟帧宽度')
+    parser.add_argument('--height', type=int, default=480, help='模拟帧高度')
+    parser.add_argument('--config', default='yolov4-tiny.cfg', help='YOLO配置文件路径')
+    parser.add_argument('--weights', default='yolov4-tiny.weights', help='YOLO权重文件路径，缺失时使用随机权重')
+    parser.add_argument('--names', default='coco.names.txt', help='类别名称文件路径')
+    parser.add_argument('--output', default=None, help='结果JSON文件，不指定时输出到标准输出')
+    return parser.parse_args()
+
+def bench_single(detector, frames):
+    """单进程逐帧检测的吞吐量"""
+    detector.detect(frames[0])
+    start_time = time.perf_counter()
+    for frame in frames:
+        detector.detect(frame)
+    return len(frames) / (time.perf_counter() - start_time)
+
+def bench_pool(pool, frames):
+    """进程池吞吐量：槽位未满时持续提交，满了再按顺序取结果"""
+    # 最近一次get()返回的帧仍占用一个槽位
+    slots = pool.shape[0] - 1
+    expected_id = 1
+    start_time = time.perf_counter()
+    for frame in frames:
+        if pool.pending() >= slots:
+            packet = pool.get(timeout=None)
+            assert packet.frame_id == expected_id, "结果顺序错误"
+            expected_id += 1
+        pool.submit(frame, block=True)
+    while pool.pending():
+        packet = pool.get(timeout=None)
+        assert packet.frame_id == expected_id, "结果顺序错误"
+        expected_id += 1
+    return pool.completed / (time.perf_counter() - start_time)
+
+def main():
+    args = parse_arguments()
+    config, weights, names, synthetic_model = resolve_model_files(args.config, args.weights, args.names)
+    frames = list(iter_frames(args.source, args.frames, args.width, args.height))
+    height, width = frames[0].shape[:2]
+
+    detector = YoloDetector.from_files(config, weights, names)
+    if detector is None:
+        raise SystemExit(1)
+    single_fps = bench_single(detector, frames)
+    del detector
+
+    results = []
+    for workers in range(1, args.max_workers + 1):
+        pool = InferencePool(config, weights, names, workers=workers, width=width, height=height,
+                             threads_per_worker=args.threads_per_worker)
+        if not pool.start():
+            raise SystemExit(1)
+        try:
+            fps = bench_pool(pool, frames)
+        finally:
+            pool.close()
+        results.append({
+            'workers': workers,
+            'throughput_fps': round(fps, 2),
+            'speedup': round(fps / single_fps, 2),
+            'efficiency': round(fps / single_fps / workers, 2),
+            'dropped': pool.dropped,
+        })
+
+    report = {
+        'machine': machine_info(),
+        'synthetic_model': synthetic_model,
+        'frames': len(frames),
+        'frame_size': [width, height],
+        'threads_per_worker': args.threads_per_worker,
+        'single_process_threads': cv2.getNumThreads(),
+        'single_process_fps': round(single_fps, 2),
+        'workers': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"结果已写入: {args.output}")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
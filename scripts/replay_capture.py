@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重放串口抓包：按记录的时间间隔（可加速）把一个通道的TX字节重新发到串口或虚拟开发板，
+再把收到的应答与抓包中的RX逐字节比较，不一致时退出码为1
+  python scripts/replay_capture.py capture.scap --virtual ack-on-change --speed 10
+  python scripts/replay_capture.py capture.scap --port COM3
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+import serial
+
+from virtual_stm32 import MODES, VirtualBoard
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from serial_capture import KIND_TX, CaptureReader, SerialCapture
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='重放串口抓包')
+    parser.add_argument('capture', help='抓包文件')
+    parser.add_argument('--channel', default=None, help='要重放的抓包串口名，默认为第一个通道')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--port', default=None, help='重放到的串口')
+    target.add_argument('--virtual', choices=MODES, default=None, help='重放到虚拟开发板（指定固件行为）')
+    parser.add_argument('--baud', type=int, default=0, help='波特率，0表示使用抓包中记录的波特率')
+    parser.add_argument('--speed', type=float, default=1.0, help='重放速度倍数，0表示不等待、连续发送')
+    parser.add_argument('--settle', type=float, default=1.0, help='最后一次发送后等待应答的时间（秒）')
+    parser.add_argument('--record', default=None, help='把重放过程也写入抓包文件，便于与原抓包比较')
+    return parser.parse_args()
+
+def load_channel(reader: CaptureReader, name):
+    """
+    读出一个通道的收发记录
+    :return: (端口, 波特率, TX记录列表, RX记录列表)，通道不存在时返回None
+    """
+    channels = reader.channels
+    if not channels:
+        print("错误: 抓包中没有任何通道")
+        return None
+    channel = min(channels) if name is None else reader.channel_of(name)
+    if channel is None:
+        print(f"错误: 抓包中没有串口{name}，可选: {', '.join(port for port, _ in channels.values())}")
+        return None
+    port, baudrate = channels[channel]
+    tx, rx = [], []
+    for record in reader.records(channel):
+        (tx if record.kind == KIND_TX else rx).append(record)
+    return port, baudrate, tx, rx
+
+def replay(ser, tx_records, speed: float, settle: float):
+    """
+    按记录的时间间隔发送，同时在后台线程接收
+    :return: (收到的字节, [(相对时间, 字节数)], [发送的相对时间])
+    """
+    received = bytearray()
+    arrivals = []
+    stop = threading.Event()
+    start = time.perf_counter()
+
+    def read_loop():
+        while not stop.is_set():
+            data = ser.read(ser.in_waiting or 1)
+            if data:
+                arrivals.append((time.perf_counter() - start, len(data)))
+                received.extend(data)
+
+    reader = threading.Thread(target=read_loop, name='replay-reader', daemon=True)
+    reader.start()
+    sent_times = []
+    first = tx_records[0].time if tx_records else 0.0
+    for record in tx_records:
+        if speed > 0:
+            delay = start + (record.time - first) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        ser.write(record.data)
+        sent_times.append(time.perf_counter() - start)
+    time.sleep(settle)
+    stop.set()
+    reader.join(1.0)
+    return bytes(received), arrivals, sent_times
+
+def response_latencies(tx_times, rx_times):
+    """每次发送到下一次发送之前第一次收到数据的时间（秒），没有应答的发送不计入"""
+    latencies = []
+    j = 0
+    for i, sent in enumerate(tx_times):
+        next_sent = tx_times[i + 1] if i + 1 < len(tx_times) else float('inf')
+        while j < len(rx_times) and rx_times[j] < sent:
+            j += 1
+        if j < len(rx_times) and rx_times[j] < next_sent:
+            latencies.append(rx_times[j] - sent)
+    return latencies
+
+def first_mismatch(expected: bytes, received: bytes) -> int:
+    """第一个不同字节的位置，完全一致时返回-1"""
+    for index, (a, b) in enumerate(zip(expected, received)):
+        if a != b:
+            return index
+    return -1 if len(expected) == len(received) else min(len(expected), len(received))
+
+def _p50_ms(values):
+    return round(float(np.median(values)) * 1000, 3) if values else None
+
+def main():
+    args = parse_arguments()
+    reader = CaptureReader(args.capture)
+    if not reader.open():
+        sys.exit(1)
+    with reader:
+        loaded = load_channel(reader, args.channel)
+    if loaded is None:
+        sys.exit(1)
+    source_port, source_baud, tx_records, rx_records = loaded
+    baudrate = args.baud or source_baud or 115200
+    expected = b''.join(record.data for record in rx_records)
+    print(f"重放 {args.capture} 中 {source_port} 的 {len(tx_records)} 次发送"
+          f"（{sum(len(record.data) for record in tx_records)}字节），速度{'不等待' if args.speed <= 0 else f'x{args.speed:g}'}")
+
+    board = None
+    port = args.port
+    if args.virtual:
+        board = VirtualBoard(args.virtual, baudrate)
+        port = board.start()
+    capture = None
+    if args.record:
+        capture = SerialCapture(args.record)
+        if not capture.start():
+            capture = None
+    try:
+        ser = serial.Serial(port, baudrate, timeout=0.05)
+    except serial.SerialException as e:
+        print(f"错误: 无法打开串口{port}: {e}")
+        if board is not None:
+            board.stop()
+        sys.exit(1)
+    if capture is not None:
+        ser = capture.tap(ser, source_port, baudrate)
+    try:
+        received, arrivals, sent_times = replay(ser, tx_records, args.speed, args.settle)
+    finally:
+        ser.close()
+        if capture is not None:
+            capture.close()
+        if board is not None:
+            board.stop()
+
+    original = response_latencies([record.time for record in tx_records], [record.time for record in rx_records])
+    replayed = response_latencies(sent_times, [arrival for arrival, _ in arrivals])
+    mismatch = first_mismatch(expected, received)
+    print(f"应答: 抓包{len(expected)}字节, 重放{len(received)}字节, "
+          f"{'一致' if mismatch < 0 else f'从第{mismatch}字节起不一致'}")
+    if mismatch >= 0:
+        print(f"  抓包: {expected[max(0, mismatch - 8):mismatch + 24]!r}")
+        print(f"  重放: {received[max(0, mismatch - 8):mismatch + 24]!r}")
+    print(f"首个应答延迟p50: 抓包{_p50_ms(original)}ms, 重放{_p50_ms(replayed)}ms")
+    sys.exit(0 if mismatch < 0 else 1)
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,23 @@ import time
 import logging
 import sys
 import os
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Dict, Optional
 from dataclasses import dataclass
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("protocol_test.log"),
-        logging.StreamHandler()
-    ]
-)
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from metrics import REGISTRY, start_exporters, stop_exporters
+from link_setup import find_available_ports, load_link_profile
+from async_logging import setup_async_logging
+from serial_capture import SerialCapture
+
+# 配置日志：写文件和终端由后台线程完成，逐条命令的收发日志按类别限速
+LOG_HANDLER = setup_async_logging([
+    logging.FileHandler("protocol_test.log"),
+    logging.StreamHandler()
+])
 
 @dataclass
 class ProtocolCommand:
@@ -29,10 +34,22 @@ class ProtocolCommand:
 
 class ProtocolTester:
     """协议测试类"""
-    def __init__(self, port: str, baudrate: int = 115200):
+    MAX_BATCH = 64  # 负载测试中一次write最多合并的命令数
+    REPLY_BYTES = len(b"ACK_A\r\n")  # 每条单字节命令的应答长度，应答方向先于发送方向占满
+    MAX_UTILIZATION = 0.9  # 最大速率只用到应答方向线路速率的90%，满负荷时抖动会让应答一直排队
+    LATE_WINDOW = 10  # 超时的命令再保留timeout的这么多倍，期间到达的应答计为迟到
+
+    def __init__(self, port: str, baudrate: int = 115200, capture: Optional[SerialCapture] = None):
         self.port = port
         self.baudrate = baudrate
+        self.capture = capture
         self.ser: Optional[serial.Serial] = None
+        self.results = REGISTRY.counter('serial_commands_total', '串口命令按结果计数', ('command', 'result'))
+        self.response_time = REGISTRY.histogram('tester_response_seconds',
+                                                '测试工具从发送到收到响应的时间（秒，含测试中的等待间隔）',
+                                                ('command',))
+        self.load_rtt = REGISTRY.histogram('tester_load_rtt_seconds', '负载测试中命令的往返延迟（秒）', ('command',))
+        self._send_time = 0.0
         
         # 定义协议命令
         self.commands: Dict[str, ProtocolCommand] = {
@@ -49,6 +66,8 @@ class ProtocolTester:
                 baudrate=self.baudrate,
                 timeout=1
             )
+            if self.capture is not None:
+                self.ser = self.capture.tap(self.ser, self.port, self.baudrate)
             logging.info(f"成功连接到串口 {self.port}")
             return True
         except serial.SerialException as e:
@@ -69,7 +88,9 @@ class ProtocolTester:
         
         try:
             self.ser.write(cmd.encode())
-            logging.info(f"发送命令: {cmd} ({self.commands[cmd].description})")
+            self._send_time = time.perf_counter()
+            self.results.inc(command=cmd, result='sent')
+            logging.info("发送命令: %s (%s)", cmd, self.commands[cmd].description, extra={'sample': 'send'})
             return True
         except Exception as e:
             logging.error(f"发送命令失败: {e}")
@@ -86,13 +107,22 @@ class ProtocolTester:
             self.ser.timeout = timeout
             response = self.ser.readline().decode().strip()
             if response:
-                logging.info(f"收到响应: {response}")
+                logging.info("收到响应: %s", response, extra={'sample': 'response'})
                 return response
             return None
         except Exception as e:
             logging.error(f"读取响应失败: {e}")
             return None
 
+    def record_response(self, cmd: str, response: Optional[str]) -> bool:
+        """记录一次响应的结果和耗时，返回是否为ACK"""
+        if response and response.startswith("ACK_"):
+            self.results.inc(command=cmd, result='acked')
+            self.response_time.observe(time.perf_counter() - self._send_time, command=cmd)
+            return True
+        self.results.inc(command=cmd, result='errors' if response else 'timeouts')
+        return False
+
     def test_protocol(self) -> bool:
         """测试完整协议"""
         if not self.connect():
@@ -112,8 +142,9 @@ class ProtocolTester:
                 
                 # 读取STM32的响应
                 response = self.read_response()
+                acked = self.record_response(cmd.char, response)
                 if response:
-                    if response.startswith("ACK_"):
+                    if acked:
                         logging.info(f"命令 {cmd.char} 测试成功")
                     else:
                         logging.warning(f"命令 {cmd.char} 收到非预期响应: {response}")
@@ -151,7 +182,7 @@ class ProtocolTester:
                     
                     # 读取响应
                     response = self.read_response(timeout=0.5)
-                    if response and response.startswith("ACK_"):
+                    if self.record_response(cmd, response):
                         success_count += 1
                     else:
                         fail_count += 1
@@ -160,6 +191,9 @@ class ProtocolTester:
                     logging.info(f"完成 {i + 1} 个循环, 成功: {success_count}, 失败: {fail_count}")
             
             logging.info(f"压力测试完成, 总成功: {success_count}, 总失败: {fail_count}")
+            for cmd in ['A', 'B', 'N']:
+                logging.info(f"命令 {cmd} 响应时间: p50={self.response_time.quantile(0.5, command=cmd)*1000:.1f}ms, "
+                             f"p95={self.response_time.quantile(0.95, command=cmd)*1000:.1f}ms")
             return fail_count == 0
 
         except Exception as e:
@@ -169,6 +203,184 @@ class ProtocolTester:
         finally:
             self.disconnect()
 
+    def load_test(self, rate: float = 0.0, duration: float = 10.0, window: int = 8, pattern: str = 'ABN',
+                  timeout: float = 1.0) -> Optional[Dict]:
+        """
+        负载测试：按目标速率流水线发送命令，不等待上一条的响应
+        旧版协议的应答不带序号，按发送顺序匹配：ACK与最早的同名在途命令配对，
+        跳过更早的命令时计为乱序，超时未确认计为丢失；超时后才到达的应答与超时的命令配对，计为迟到
+        :param rate: 目标命令速率（条/秒），0表示按应答方向线路速率的90%（波特率/10/应答字节数 条/秒）发送
+        :param duration: 发送持续时间（秒），之后再等待timeout收取剩余响应
+        :param window: 最多同时在途的命令数，0表示不限制（开环发送）
+        :param pattern: 循环发送的命令序列，相邻命令不同时仅状态变化才ACK的固件也会逐条应答
+        :param timeout: 单条命令等待ACK的超时时间（秒）
+        :return: 测试报告，连接失败时返回None
+        """
+        if not self.connect():
+            return None
+
+        # 最大速率也按线路速率排布，超过线路速率的命令只会堆在驱动缓冲区，延迟里算进的是排队时间；
+        # 每条1字节的命令对应约7字节的应答，限制速率的是应答方向
+        rate = rate if rate > 0 else self.baudrate / 10.0 / self.REPLY_BYTES * self.MAX_UTILIZATION
+        interval = 1.0 / rate
+        pending = deque()   # (序号, 命令, 发送时间)
+        expired = deque()   # 已超时、应答可能迟到的命令 (序号, 命令, 发送时间)
+        rtts = []
+        counts = {'sent': 0, 'acked': 0, 'lost': 0, 'late': 0, 'errors': 0, 'out_of_order': 0, 'unexpected': 0,
+                  'window_full': 0}
+        buffer = bytearray()
+        try:
+            logging.info(f"\n开始负载测试: 目标速率={rate:.0f}条/秒, "
+                         f"时长={duration}秒, 窗口={window or '不限'}, 序列={pattern}")
+            self.ser.timeout = 0
+            self.ser.reset_input_buffer()
+            start = time.perf_counter()
+            send_end = start + duration
+            next_send = start
+            seq = 0
+
+            while True:
+                now = time.perf_counter()
+                if now >= send_end and not pending:
+                    break
+                if now >= send_end + timeout:
+                    break
+
+                # 到期的命令合并为一次write；窗口满时放弃这些时隙，不补发
+                if now < send_end and now >= next_send:
+                    due = int((now - next_send) / interval) + 1
+                    room = window - len(pending) if window else due
+                    batch = max(0, min(due, room, self.MAX_BATCH))
+                    if batch:
+                        cmds = [pattern[(seq + i) % len(pattern)] for i in range(batch)]
+                        self.ser.write(''.join(cmds).encode())
+                        for cmd in cmds:
+                            pending.append((seq, cmd, now))
+                            self.results.inc(command=cmd, result='sent')
+                            seq += 1
+                        counts['sent'] += batch
+                    if room < due:
+                        counts['window_full'] += due - batch
+                        next_send += due * interval
+                    else:
+                        next_send += batch * interval
+                    if next_send < now - self.MAX_BATCH * interval:
+                        # 循环被阻塞落后太多时从当前时间重新排布
+                        next_send = now
+
+                data = self.ser.read(self.ser.in_waiting or 0)
+                if data:
+                    buffer.extend(data)
+                    while b'\n' in buffer:
+                        line, _, rest = buffer.partition(b'\n')
+                        buffer = bytearray(rest)
+                        self._match_load_response(line.decode(errors='replace').strip(), pending, expired, rtts,
+                                                  counts, time.perf_counter())
+
+                # 超时未确认；保留一段时间，迟到的应答与它配对，不会错配给之后的同名命令
+                deadline = time.perf_counter() - timeout
+                while pending and pending[0][2] < deadline:
+                    entry = pending.popleft()
+                    expired.append(entry)
+                    counts['lost'] += 1
+                    self.results.inc(command=entry[1], result='timeouts')
+                forget = time.perf_counter() - timeout * self.LATE_WINDOW
+                while expired and expired[0][2] < forget:
+                    expired.popleft()
+
+                if not data:
+                    time.sleep(min(0.001, max(0.0, next_send - time.perf_counter())))
+
+            send_elapsed = min(duration, time.perf_counter() - start)
+            report = self._load_report(counts, rtts, send_elapsed)
+            self._log_load_report(report)
+            return report
+
+        except Exception as e:
+            logging.error(f"负载测试失败: {e}")
+            return None
+
+        finally:
+            self.disconnect()
+
+    def _match_load_response(self, line: str, pending: deque, expired: deque, rtts: list, counts: Dict[str, int],
+                             now: float):
+        """将一行响应与在途命令按顺序匹配；超时的命令比在途命令发送得早，先与它们匹配"""
+        if not line:
+            return
+        if line.startswith("ERR"):
+            # ERR不带命令，对应最早的未应答命令
+            counts['errors'] += 1
+            if expired:
+                expired.popleft()
+                counts['lost'] -= 1
+                counts['late'] += 1
+            elif pending:
+                _, cmd, _ = pending.popleft()
+                self.results.inc(command=cmd, result='errors')
+            return
+        if not line.startswith("ACK_"):
+            counts['unexpected'] += 1
+            return
+
+        acked = line[4:]
+        for index, (_, cmd, _) in enumerate(expired):
+            if cmd == acked:
+                # 迟到的应答：按顺序应答的开发板不会再应答更早的超时命令，一并移除
+                for _ in range(index + 1):
+                    expired.popleft()
+                counts['lost'] -= 1
+                counts['late'] += 1
+                return
+        for index, (_, cmd, send_time) in enumerate(pending):
+            if cmd == acked:
+                break
+        else:
+            counts['unexpected'] += 1
+            return
+        if index > 0:
+            # 更早的命令仍在等待，可能稍后应答，也可能超时计为丢失
+            counts['out_of_order'] += 1
+        del pending[index]
+        counts['acked'] += 1
+        rtt = now - send_time
+        rtts.append(rtt)
+        self.results.inc(command=acked, result='acked')
+        self.load_rtt.observe(rtt, command=acked)
+
+    @staticmethod
+    def _load_report(counts: Dict[str, int], rtts: list, elapsed: float) -> Dict:
+        """汇总负载测试结果，延迟单位为毫秒"""
+        report = dict(counts)
+        report['duration_s'] = round(elapsed, 3)
+        report['sent_per_s'] = round(counts['sent'] / elapsed, 1) if elapsed > 0 else 0.0
+        report['acked_per_s'] = round(counts['acked'] / elapsed, 1) if elapsed > 0 else 0.0
+        report['loss'] = round(counts['lost'] / counts['sent'], 4) if counts['sent'] else 0.0
+        if rtts:
+            values = np.asarray(rtts) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            report.update({'rtt_p50_ms': round(float(p50), 3), 'rtt_p95_ms': round(float(p95), 3),
+                           'rtt_p99_ms': round(float(p99), 3), 'rtt_max_ms': round(float(values.max()), 3)})
+            # 对数分桶的延迟直方图
+            edges = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+            histogram = np.histogram(values, bins=[0.0] + edges + [float('inf')])[0]
+            labels = [f"<{edge}ms" for edge in edges] + [f">={edges[-1]}ms"]
+            report['rtt_histogram'] = {label: int(n) for label, n in zip(labels, histogram) if n}
+        return report
+
+    @staticmethod
+    def _log_load_report(report: Dict):
+        logging.info(f"负载测试完成: 发送{report['sent']}条 ({report['sent_per_s']}条/秒), "
+                     f"确认{report['acked']}条 ({report['acked_per_s']}条/秒), 丢失{report['lost']}条 "
+                     f"({report['loss']*100:.2f}%), 迟到{report['late']}, ERR {report['errors']}, 乱序{report['out_of_order']}, "
+                     f"无法匹配{report['unexpected']}, 窗口满{report['window_full']}次")
+        if 'rtt_p50_ms' in report:
+            logging.info(f"往返延迟: p50={report['rtt_p50_ms']}ms, p95={report['rtt_p95_ms']}ms, "
+                         f"p99={report['rtt_p99_ms']}ms, max={report['rtt_max_ms']}ms")
+            total = sum(report['rtt_histogram'].values())
+            for label, n in report['rtt_histogram'].items():
+                logging.info(f"  {label:>9} {n:6d} {'#' * max(1, int(40 * n / total))}")
+
     def auto_test(self) -> bool:
         """自动测试模式"""
         if not self.connect():
@@ -212,16 +424,6 @@ class ProtocolTester:
         finally:
             self.disconnect()
 
-def find_available_ports() -> List[str]:
-    """查找可用的串口"""
-    import serial.tools.list_ports
-    
-    ports = []
-    for port in serial.tools.list_ports.comports():
-        ports.append(port.device)
-    
-    return ports
-
 def main():
     """主函数"""
     # 查找可用串口
@@ -241,19 +443,35 @@ def main():
     else:
         port = available_ports[0]  # 使用第一个可用串口
     
+    # 可选的第二个参数为Prometheus指标HTTP端口（0表示关闭）
+    exporters = start_exporters(int(sys.argv[2])) if len(sys.argv) > 2 else []
+    
+    # 可选的第三个参数为抓包文件，记录收发的全部字节（python_app/serial_capture.py查看，scripts/replay_capture.py重放）
+    capture = None
+    if len(sys.argv) > 3:
+        capture = SerialCapture(sys.argv[3])
+        if not capture.start():
+            capture = None
+    
+    # 有链路测量记录时使用协商出的波特率（python_app/link_setup.py）
+    profile = load_link_profile(port)
+    baudrate = profile.baudrate if profile is not None else 115200
+    
     print(f"\n可用串口: {', '.join(available_ports)}")
-    print(f"使用串口: {port}")
+    print(f"使用串口: {port}, 波特率: {baudrate}")
     
-    tester = ProtocolTester(port)
+    tester = ProtocolTester(port, baudrate, capture)
     
     print("\n=== STM32-PC 通信协议测试工具 ===")
     print("1. 基本协议测试")
     print("2. 压力测试")
     print("3. 自动测试")
-    print("4. 退出")
+    print("4. 负载测试（流水线发送，测量开发板的实际处理能力）")
+    print("5. 退出")
     
     while True:
-        choice = input("\n请选择测试类型 (1-4): ")
+        LOG_HANDLER.flush()
+        choice = input("\n请选择测试类型 (1-5): ")
         
         if choice == '1':
             tester.test_protocol()
@@ -263,7 +481,15 @@ def main():
         elif choice == '3':
             tester.auto_test()
         elif choice == '4':
+            rate = float(input("目标速率（条/秒，0表示最大速率）: ") or 0)
+            duration = float(input("持续时间（秒，默认10）: ") or 10)
+            window = int(input("最多在途命令数（0表示不限制，默认8）: ") or 8)
+            tester.load_test(rate, duration, window)
+        elif choice == '5':
             print("程序退出")
+            stop_exporters(exporters)
+            if capture is not None:
+                capture.close()
             break
         else:
             print("无效选择，请重试")
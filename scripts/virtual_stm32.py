@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于伪终端(PTY)的虚拟STM32开发板，无需硬件即可测试和压测串口协议
+
+支持的固件行为：
+  always-ack     Src/protocol.c：每条命令都回复ACK，无效命令回复"ERR"
+  ack-on-change  Inc/protocol.h：仅状态变化时回复ACK，无效命令回复"ERR:Invalid Command"
+  echo           Src/main.c：原样回显收到的字节
+  binary         二进制检测帧协议，每个有效帧回复2字节ACK
+"""
+
+import os
+import sys
+import tty
+import time
+import queue
+import random
+import select
+import logging
+import termios
+import argparse
+import threading
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_app'))
+from protocol import FRAME_ACK, FrameDecoder
+
+MODES = ('always-ack', 'ack-on-change', 'echo', 'binary')
+
+def _garble(byte: int) -> int:
+    """波特率不匹配时的字节错乱（循环左移一位，收发两次后仍不能还原）"""
+    return ((byte << 1) | (byte >> 7)) & 0xFF
+
+class VirtualBoard:
+    """虚拟STM32开发板，按配置的波特率模拟UART收发时序"""
+
+    def __init__(self, mode: str = 'always-ack', baudrate: int = 9600, jitter: float = 0.0,
+                 drop_rate: float = 0.0, processing_delay: float = 0.0, seed: Optional[int] = None,
+                 strict_baud: bool = False):
+        """
+        :param mode: 固件行为，见MODES
+        :param baudrate: 波特率，按8N1每字节10位计算传输时间
+        :param jitter: 每个应答附加的随机延迟上限（秒）
+        :param drop_rate: 每个接收字节被丢弃的概率
+        :param processing_delay: 固件处理每条命令的固定耗时（秒）
+        :param seed: 随机数种子
+        :param strict_baud: 模拟波特率不匹配：客户端设置的波特率与baudrate不同时收发的字节都变成乱码
+        """
+        if mode not in MODES:
+            raise ValueError(f"无效的固件模式: {mode}")
+        self.mode = mode
+        self.baudrate = baudrate
+        self.byte_time = 10.0 / baudrate
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.processing_delay = processing_delay
+        self.random = random.Random(seed)
+        self.strict_baud = strict_baud
+        self._speed = getattr(termios, f'B{baudrate}', None)
+
+        self.state = 'N'  # 当前LED/显示状态
+        self.stats: Dict[str, int] = {
+            'rx_bytes': 0, 'tx_bytes': 0, 'commands': 0, 'acks': 0, 'errors': 0, 'dropped': 0,
+        }
+
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self.port: Optional[str] = None
+        self._tx_queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_state = None
+        self._decoder = FrameDecoder()
+
+    def start(self) -> str:
+        """
+        打开伪终端并启动收发线程
+        :return: 供客户端连接的串口路径
+        """
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._rx_loop, name='board-rx', daemon=True),
+            threading.Thread(target=self._tx_loop, name='board-tx', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self.port
+
+    def stop(self):
+        """停止线程并关闭伪终端"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(1.0)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _rx_loop(self):
+        """接收线程：按波特率逐字节"到达"后交给固件逻辑处理"""
+        line_free = 0.0
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 256)
+            except OSError:
+                break
+
+            garbled = self._baud_mismatch()
+            start = max(time.perf_counter(), line_free)
+            for i, byte in enumerate(data):
+                arrival = start + (i + 1) * self.byte_time
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self.stats['rx_bytes'] += 1
+                if self.drop_rate and self.random.random() < self.drop_rate:
+                    self.stats['dropped'] += 1
+                    continue
+                self._handle_byte(_garble(byte) if garbled else byte)
+            line_free = start + len(data) * self.byte_time
+
+    def _tx_loop(self):
+        """发送线程：按波特率节奏写出应答字节"""
+        line_free = 0.0
+        while not self._stop.is_set():
+            try:
+                ready_time, data = self._tx_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            start = max(ready_time, line_free, time.perf_counter())
+            pos = 0
+            while pos < len(data) and not self._stop.is_set():
+                now = time.perf_counter()
+                done = min(len(data), int((now - start) / self.byte_time))
+                if done > pos:
+                    chunk = data[pos:done]
+                    if self._baud_mismatch():
+                        chunk = bytes(_garble(byte) for byte in chunk)
+                    try:
+                        os.write(self._master, chunk)
+                    except OSError:
+                        return
+                    self.stats['tx_bytes'] += done - pos
+                    pos = done
+                else:
+                    time.sleep(max(0.0, start + (pos + 1) * self.byte_time - now))
+            line_free = start + len(data) * self.byte_time
+
+    def _baud_mismatch(self) -> bool:
+        """客户端在伪终端上设置的波特率是否与开发板不同（仅strict_baud模式）"""
+        if not self.strict_baud:
+            return False
+        try:
+            return termios.tcgetattr(self._master)[4] != self._speed
+        except termios.error:
+            return False
+
+    def _respond(self, data: bytes):
+        """将应答放入发送队列，附加处理耗时与随机抖动"""
+        delay = self.processing_delay
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        self._tx_queue.put((time.perf_counter() + delay, data))
+
+    def _handle_byte(self, byte: int):
+        """模拟固件的Handle_Protocol"""
+        if self.mode == 'echo':
+            self._respond(bytes([byte]))
+            return
+
+        if self.mode == 'binary':
+            for frame in self._decoder.feed(bytes([byte])):
+                self.stats['commands'] += 1
+                self.stats['acks'] += 1
+                self.state = 'A' if frame.objects else 'N'
+                self._respond(bytes([FRAME_ACK, frame.seq]))
+            return
+
+        command = chr(byte)
+        self.stats['commands'] += 1
+        if command not in ('A', 'B', 'N'):
+            self.stats['errors'] += 1
+            if self.mode == 'always-ack':
+                self._respond(b"ERR\r\n")
+            else:
+                self._respond(b"ERR:Invalid Command\r\n")
+            return
+
+        self.state = command
+        if self.mode == 'ack-on-change' and command == self._last_state:
+            return
+        self._last_state = command
+        self.stats['acks'] += 1
+        self._respond(f"ACK_{command}\r\n".encode())
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='虚拟STM32开发板（PTY）')
+    parser.add_argument('--mode', choices=MODES, default='always-ack', help='固件行为')
+    parser.add_argument('--baud', type=int, default=9600, help='模拟的波特率')
+    parser.add_argument('--jitter', type=float, default=0.0, help='应答随机延迟上限（秒）')
+    parser.add_argument('--drop', type=float, default=0.0, help='接收字节丢弃概率')
+    parser.add_argument('--delay', type=float, default=0.0, help='固件处理每条命令的耗时（秒）')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子')
+    parser.add_argument('--strict-baud', action='store_true', help='模拟波特率不匹配：客户端波特率不同时收发乱码')
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    board = VirtualBoard(args.mode, args.baud, args.jitter, args.drop, args.delay, args.seed, args.strict_baud)
+    port = board.start()
+    logging.info(f"虚拟开发板已启动: {port} (模式={args.mode}, 波特率={args.baud})")
+    print(f"客户端请连接: {port}，按Ctrl+C退出")
+
+    try:
+        while True:
+            time.sleep(5)
+            logging.info(f"状态={board.state}, 统计={board.stats}")
+    except KeyboardInterrupt:
+        print("程序退出")
+    finally:
+        board.stop()
+
+if __name__ == "__main__":
+    main()